@@ -0,0 +1,720 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    cast,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import httpx
+import requests
+
+from .exceptions import ManifestNotFoundError, ManifestTypeError, RegistryAuthError
+from .quay_client import QuayClient, _sha256_digest
+from .types import ManifestList, Manifest
+
+from pytractions.utils import doc
+
+LOG = logging.getLogger("signtractions.resources.async_quay_client")
+
+T = TypeVar("T")
+
+
+def _to_requests_exception(exc: httpx.TransportError) -> requests.exceptions.RequestException:
+    """Convert httpx transport error to requests exception QuayClient callers handle."""
+    if isinstance(exc, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(exc))
+    if isinstance(exc, httpx.ReadTimeout):
+        return requests.exceptions.ReadTimeout(str(exc))
+    if isinstance(exc, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(exc))
+    if isinstance(exc, (httpx.NetworkError, httpx.ProxyError)):
+        return requests.exceptions.ConnectionError(str(exc))
+    return requests.exceptions.RequestException(str(exc))
+
+
+def _to_requests_response(response: httpx.Response) -> requests.Response:
+    """Convert httpx response to requests response so callers can handle errors uniformly."""
+    ret = requests.Response()
+    ret.status_code = response.status_code
+    ret.headers = requests.structures.CaseInsensitiveDict(response.headers)
+    ret.url = str(response.url)
+    ret.reason = response.reason_phrase
+    ret._content = response.content
+    return ret
+
+
+class AsyncQuayClient(QuayClient):
+    """Asyncio based client for Docker HTTP API and Quay API operations.
+
+    All requests are multiplexed over single connection pool (HTTP/2 if the registry supports it)
+    running in a dedicated event loop thread. Coroutine methods are prefixed with `async_`,
+    methods with the same names as in QuayClient are blocking facade over them, so the client
+    can be used as a drop-in replacement of QuayClient in tractions running in any executor.
+
+    Bearer tokens are kept in the same BearerTokenCache as QuayClient uses, so tokens obtained
+    by preauthorize or shared with set_token_cache are used by the async requests too.
+
+    Transport errors are raised as requests exceptions and manifest cache disk reads and writes
+    run in worker threads, so they don't block the event loop. BulkPopulateContainerDigest
+    resolves and fetches manifests of all references at once when given this client.
+
+    Following methods aren't multiplexed and use inherited blocking implementation with
+    per-thread requests sessions: upload_manifest and preauthorize.
+    """
+
+    max_connections: int = 20
+    max_concurrency: int = 200
+    http2: bool = True
+    retries: int = 3
+    backoff_factor: int = 2
+
+    d_max_connections: str = doc("Maximum number of connections kept in the connection pool.")
+    d_max_concurrency: str = doc("Maximum number of requests in flight.")
+    d_http2: str = doc("Use HTTP/2 when registry supports it.")
+    d_retries: str = doc("Number of retries of requests failed with 5xx status code.")
+    d_backoff_factor: str = doc("Backoff factor to apply between retries.")
+
+    def __post_init__(self, *args, **kwargs):
+        """Post init for async quay client."""
+        super().__post_init__(*args, **kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._auth_locks: Dict[Tuple[str, ...], asyncio.Lock] = {}
+
+    def _run_sync(self, coro: Awaitable[T]) -> T:
+        """Run coroutine in the client event loop and wait for its result."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="async-quay-client", daemon=True
+                )
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _iter_sync(self, agenerator: AsyncGenerator[T, None]) -> Iterator[T]:
+        """
+        Iterate over async generator running in the client event loop.
+
+        If the iteration is abandoned, the generator is closed in the event loop,
+        so its pending requests are finished before the iterator is discarded.
+        """
+        exhausted = False
+        try:
+            while True:
+                try:
+                    yield self._run_sync(agenerator.__anext__())
+                except StopAsyncIteration:
+                    exhausted = True
+                    return
+        finally:
+            if not exhausted:
+                self._run_sync(agenerator.aclose())
+
+    def close(self) -> None:
+        """Close connection pool and stop the event loop."""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            if self._client is not None:
+                asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._client = None
+            self._semaphore = None
+            self._auth_locks = {}
+
+    def _make_client(self) -> httpx.AsyncClient:
+        """Create httpx client with bounded keep-alive connection pool."""
+        transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            # retries of failed connection attempts, status codes are retried in _send
+            retries=self.retries,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        return httpx.AsyncClient(transport=transport, timeout=10)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return httpx client. Must be called from the client event loop."""
+        if self._client is None:
+            self._client = self._make_client()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _api_url(self, api: str, endpoint: str) -> str:
+        """
+        Generate full url of the API endpoint.
+
+        Args:
+            api (str):
+                Which API url to construct. Supported values: 'docker', 'quay'
+            endpoint (str)
+                API specific endpoint for the request.
+        Returns:
+            str: Full URL of the endpoint.
+        """
+        if api == "docker":
+            schema = "{0}{1}/v2/{2}"
+        else:
+            schema = "{0}{1}/api/v1/{2}"
+
+        if "http://" not in self.host and "https://" not in self.host:
+            return schema.format("https://", self.host.rstrip("/"), endpoint)
+        else:
+            return schema.format("", self.host.rstrip("/"), endpoint)
+
+    async def _send(
+        self, method: str, url: str, headers: Dict[str, str], **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send request and retry it when server responds with 5xx status code.
+
+        Transport errors are raised as requests exceptions, as QuayClient raises them.
+        """
+        client = self.client
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                try:
+                    response = await client.request(method, url, headers=headers, **kwargs)
+                except httpx.TransportError as e:
+                    raise _to_requests_exception(e) from e
+            if response.status_code < 500 or response.status_code > 511:
+                break
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff_factor * (2**attempt))
+        return response
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        """Raise requests HTTPError for error responses as QuayClient does."""
+        if response.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                "{0} Error: {1} for url: {2}".format(
+                    response.status_code, response.reason_phrase, response.url
+                ),
+                response=_to_requests_response(response),
+            )
+
+    async def _async_request_quay(
+        self,
+        method: str,
+        endpoint: str,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Perform a Docker HTTP API request on Quay registry. Handle authentication.
+
+        Token obtained for the repository of the endpoint is looked up in the token cache,
+        as concurrent requests can target different repositories.
+
+        Args:
+            method (str):
+                REST API method of the request (GET, HEAD, POST, PUT, DELETE).
+            endpoint (str):
+                Endpoint of the request.
+            headers (dict):
+                Additional headers of the request.
+        Returns (Response):
+            httpx Response object.
+        Raises:
+            HTTPError: When the request returned an error status.
+        """
+        url = self._api_url("docker", endpoint)
+        _headers = dict(headers or {})
+        hint = self._token_hint(endpoint)
+        token = self._token_cache.get_by_hint(hint) if hint else None
+        if token:
+            _headers["Authorization"] = "Bearer {0}".format(token)
+        r = await self._send(method, url, _headers, **kwargs)
+        if r.status_code == 401:
+            LOG.debug("Unauthorized request, attempting to authenticate.")
+            token = await self._async_authenticate_quay(r.headers, token)
+            if hint:
+                self._token_cache.set_hint(hint, self._token_key(r.headers))
+            _headers["Authorization"] = "Bearer {0}".format(token)
+            r = await self._send(method, url, _headers, **kwargs)
+        self._raise_for_status(r)
+        return r
+
+    async def _async_authenticate_quay(
+        self, headers: httpx.Headers, stale_token: Optional[str]
+    ) -> str:
+        """
+        Obtain bearer token from registry's authentication server.
+
+        Only one token request per token key is in flight, other requests
+        which received 401 meanwhile reuse the obtained token.
+
+        Args:
+            headers (dict):
+                Headers of the 401 response received from the registry.
+            stale_token (str):
+                Token which was rejected by the registry.
+        Returns (str):
+            Bearer token.
+        Raises:
+            RegistryAuthError:
+                When there's an issue with the authentication procedure.
+        """
+        if "WWW-Authenticate" not in headers:
+            raise RegistryAuthError(
+                "'WWW-Authenticate' is not in the 401 response's header. "
+                "Authentication cannot continue."
+            )
+        if "Bearer " not in headers["WWW-Authenticate"]:
+            raise RegistryAuthError(
+                "Different than the Bearer authentication type was requested. "
+                "Only Bearer is supported."
+            )
+        key = self._token_key(headers)
+        lock = self._auth_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            token = self._token_cache.get(key)
+            if token and token != stale_token:
+                return token
+
+            params = self._parse_auth_challenge(headers)
+            host = params.pop("realm")
+            r = await self._send(
+                "GET",
+                host,
+                {},
+                params=params,
+                auth=(self.username or "", self.password or ""),
+                timeout=11,
+            )
+            self._raise_for_status(r)
+            if "token" not in r.json():
+                raise RegistryAuthError("Authentication server response doesn't contain a token.")
+            self._token_cache.put(key, r.json()["token"], r.json().get("expires_in"))
+            return cast(str, r.json()["token"])
+
+    async def _async_request_quay_oauth(
+        self, method: str, endpoint: str, **kwargs: Any
+    ) -> httpx.Response:
+        """Perform a Quay API request authenticated with Quay oauth token."""
+        headers = {}
+        if self.token:
+            headers["Authorization"] = "Bearer {0}".format(self.token)
+        r = await self._send(method, self._api_url("quay", endpoint), headers, **kwargs)
+        self._raise_for_status(r)
+        return r
+
+    async def async_get_manifest(
+        self,
+        image: str,
+        raw: bool = False,
+        media_type: str | None = None,
+        return_headers: bool = False,
+    ) -> ManifestList | Manifest | str:
+        """
+        Get manifest of given media type.
+
+        See QuayClient.get_manifest for description of arguments and return value.
+        """
+        repo, ref = self._parse_and_validate_image_url(image)
+        endpoint = "{0}/manifests/{1}".format(repo, ref)
+
+        cached = await self._async_get_cached_manifest(repo, ref, endpoint, media_type)
+        if cached is not None:
+            content_type, manifest = cached
+            LOG.debug("Using cached manifest for %s", image)
+            if raw:
+                if not return_headers:
+                    return manifest
+                return (
+                    manifest,
+                    requests.structures.CaseInsensitiveDict({"Content-Type": content_type}),
+                )
+            return cast(ManifestList, json.loads(manifest))
+
+        response = await self._async_request_manifest("GET", endpoint, image, media_type)
+        await self._async_cache(self._cache_manifest, repo, response, ref)
+        if raw:
+            if media_type and return_headers:
+                return (response.text, response.headers)
+            return response.text
+        return cast(ManifestList, response.json())
+
+    async def _async_get_cached_manifest(
+        self, repo: str, ref: str, endpoint: str, media_type: str | None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Look up manifest in the manifest cache.
+
+        Tag references are revalidated with HEAD request(s). See QuayClient._get_cached_manifest.
+        """
+        if self._manifest_cache is None:
+            return None
+
+        if ref.startswith("sha256:"):
+            digest = ref
+        elif await self._async_cache(self._manifest_cache.get_tag, repo, ref) is None:
+            return None
+        else:
+            try:
+                digest = await self._async_revalidate_tag(endpoint, media_type)
+            except requests.exceptions.HTTPError:
+                LOG.debug("Cannot revalidate %s, fetching full manifest", endpoint, exc_info=True)
+                return None
+            if not digest:
+                return None
+
+        cached = await self._async_cache(self._manifest_cache.get, repo, digest)
+        if cached is None:
+            return None
+        content_type = cached[0]
+        if media_type and content_type != media_type and "text/plain" not in content_type:
+            return None
+        return cached
+
+    async def _async_revalidate_tag(self, endpoint: str, media_type: str | None) -> Optional[str]:
+        """
+        Get digest of manifest the tag points to without downloading the manifest.
+
+        See QuayClient._revalidate_tag.
+        """
+        if media_type:
+            accepts = [media_type]
+        elif self.manifest_negotiation:
+            accepts = [self._manifest_accept_header()]
+        else:
+            accepts = list(self._MANIFEST_TYPES_PREFERENCE)
+        for accept in accepts:
+            response = await self._async_request_quay("HEAD", endpoint, headers={"Accept": accept})
+            if response.headers.get("Docker-Content-Digest"):
+                return cast(str, response.headers["Docker-Content-Digest"])
+        return None
+
+    async def _async_cache(self, func: Callable[..., T], *args: Any) -> T:
+        """Call manifest cache function, in a worker thread if the cache reads the disk."""
+        if self._manifest_cache is not None and self._manifest_cache.cache_dir:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def _async_request_manifest(
+        self, method: str, endpoint: str, image: Optional[str], media_type: str | None
+    ) -> httpx.Response:
+        """
+        Request manifest of given media type or of the most preferred type if not specified.
+
+        See QuayClient._request_manifest and QuayClient._request_manifest_any_type.
+
+        Args:
+            method (str):
+                GET or HEAD.
+            endpoint (str):
+                Manifest endpoint of the image.
+            image (str):
+                Image address used in error messages.
+            media_type (str):
+                Requested media type or None.
+        Returns (Response):
+            httpx Response object.
+        Raises:
+            ManifestTypeError:
+                When the image doesn't return the requested manifest type.
+        """
+        if media_type:
+            response = await self._async_request_quay(
+                method, endpoint, headers={"Accept": media_type}
+            )
+            # text/plain may be returned for V2S1 by our CDN
+            content_type = response.headers.get("Content-Type", "")
+            if content_type != media_type and "text/plain" not in content_type:
+                raise ManifestTypeError(
+                    "Image {0} doesn't have a {1} manifest".format(image or endpoint, media_type)
+                )
+            return response
+
+        if self.manifest_negotiation:
+            response = await self._async_request_quay(
+                method, endpoint, headers={"Accept": self._manifest_accept_header()}
+            )
+            if response.headers.get("Content-Type") in self._MANIFEST_TYPES_PREFERENCE[:-1]:
+                return response
+            LOG.debug(
+                "Unexpected content type %s for negotiated manifest request %s, "
+                "trying manifest types one by one",
+                response.headers.get("Content-Type"),
+                endpoint,
+            )
+        for manifest_type in self._MANIFEST_TYPES_PREFERENCE:
+            response = await self._async_request_quay(
+                method, endpoint, headers={"Accept": manifest_type}
+            )
+            if response.headers.get("Content-Type") == manifest_type:
+                break
+        return response
+
+    async def async_resolve_manifest_digest(
+        self, image: str, media_type: str | None = None
+    ) -> Tuple[str, str]:
+        """
+        Resolve manifest digest of the specified image without downloading the manifest.
+
+        See QuayClient.resolve_manifest_digest.
+        """
+        repo, ref = self._parse_and_validate_image_url(image)
+        endpoint = "{0}/manifests/{1}".format(repo, ref)
+        try:
+            response = await self._async_request_manifest("HEAD", endpoint, image, media_type)
+            content_type = response.headers.get("Content-Type", "")
+            if (
+                "Docker-Content-Digest" in response.headers
+                and "text/plain" not in content_type
+                and content_type != self._MANIFEST_V2S1_TYPE
+            ):
+                return (response.headers["Docker-Content-Digest"], content_type)
+
+            LOG.debug("Cannot resolve digest of %s from headers, fetching manifest", image)
+            response = await self._async_request_manifest("GET", endpoint, image, media_type)
+        except requests.exceptions.HTTPError as exc:
+            if exc.response.status_code == 404:
+                raise ManifestNotFoundError()
+            else:
+                raise exc
+        await self._async_cache(self._cache_manifest, repo, response, ref)
+        return (_sha256_digest(response.text), response.headers.get("Content-Type", ""))
+
+    async def async_resolve_manifest_digests(
+        self, images: List[str], media_type: str | None = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Resolve manifest digests of multiple images concurrently.
+
+        Args:
+            images (list):
+                Images to resolve digests for.
+            media_type (str):
+                Requested media type. See QuayClient.resolve_manifest_digest.
+        Returns (list):
+            Tuples of (manifest digest, content type) in the same order as the images.
+        """
+        return await asyncio.gather(
+            *[self.async_resolve_manifest_digest(image, media_type=media_type) for image in images]
+        )
+
+    async def async_get_blob(self, image: str) -> bytes:
+        """
+        Get content of a blob.
+
+        See QuayClient.get_blob.
+        """
+        repo, digest = self._parse_and_validate_image_url(image)
+        endpoint = "{0}/blobs/{1}".format(repo, digest)
+        return (await self._async_request_quay("GET", endpoint)).content
+
+    async def async_get_manifests(
+        self, images: List[str], raw: bool = False, media_type: str | None = None
+    ) -> List[ManifestList | Manifest | str]:
+        """
+        Get manifests of multiple images concurrently.
+
+        Args:
+            images (list):
+                Images to get manifests for.
+            raw (bool):
+                Whether to return the manifests as raw JSON.
+            media_type (str):
+                Requested media type. See QuayClient.get_manifest.
+        Returns (list):
+            Manifests in the same order as the images.
+        """
+        return await asyncio.gather(
+            *[self.async_get_manifest(image, raw=raw, media_type=media_type) for image in images]
+        )
+
+    async def async_get_repository_tags(
+        self, repository: str, raw: bool = False
+    ) -> str | Dict[str, List[str]]:
+        """
+        Get tags of a provided repository.
+
+        See QuayClient.get_repository_tags for description of arguments and return value.
+        """
+        tags: Dict[str, Any] = {}
+        async for page in self._async_iter_repository_tags_pages(repository):
+            if not tags:
+                tags = page
+            else:
+                tags["tags"].extend(page["tags"])
+
+        if raw:
+            return json.dumps(tags)
+        else:
+            return cast(Dict[str, List[str]], tags)
+
+    async def async_iter_repository_tags(self, repository: str) -> AsyncGenerator[str, None]:
+        """
+        Iterate over tags of a provided repository.
+
+        See QuayClient.iter_repository_tags.
+        """
+        async for page in self._async_iter_repository_tags_pages(repository):
+            for tag in page["tags"]:
+                yield tag
+
+    async def _async_iter_repository_tags_pages(
+        self, repository: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over pages of tags list of a provided repository."""
+        endpoint = "{0}/tags/list".format(repository)
+        response = await self._async_request_quay("GET", endpoint)
+        yield response.json()
+
+        while "Link" in response.headers:
+            response = await self._async_request_quay(
+                "GET", self._next_page_endpoint(response.headers)
+            )
+            yield response.json()
+
+    async def async_get_quay_repositories(self, namespace: str) -> List[Any]:
+        """
+        Get all repositories in a namespace.
+
+        See QuayClient.get_quay_repositories.
+        """
+        return [repo async for repo in self.async_iter_quay_repositories(namespace)]
+
+    async def async_iter_quay_repositories(self, namespace: str) -> AsyncGenerator[Any, None]:
+        """
+        Iterate over repositories in a namespace.
+
+        See QuayClient.iter_quay_repositories.
+        """
+        next_page = ""
+        while True:
+            endpoint = f"repository?namespace={namespace}&next_page={next_page}"
+            response = await self._async_request_quay_oauth("GET", endpoint)
+            ret = response.json()
+            for repo in ret["repositories"]:
+                yield repo
+            if "next_page" not in ret or not ret["next_page"]:
+                break
+            next_page = ret["next_page"]
+
+    async def async_get_quay_repository_tags(
+        self, repo: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Get all tags for a repository.
+
+        See QuayClient.get_quay_repository_tags.
+        """
+        return [tag async for tag in self.async_iter_quay_repository_tags(repo, limit, window)]
+
+    async def async_iter_quay_repository_tags(
+        self, repo: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Iterate over tags of a repository.
+
+        Window of pages is requested concurrently, tags up to the first empty page
+        are yielded. See QuayClient.iter_quay_repository_tags.
+        """
+        limit = self.tag_page_limit if limit is None else limit
+        window = max(self.tag_page_window if window is None else window, 1)
+        page = 0
+        while True:
+            responses = await asyncio.gather(
+                *[
+                    self._async_request_quay_oauth(
+                        "GET", self._quay_repository_tags_endpoint(repo, number, limit)
+                    )
+                    for number in range(page, page + window)
+                ]
+            )
+            for response in responses:
+                ret = response.json()
+                if not ret["tags"]:
+                    return
+                for tag in ret["tags"]:
+                    yield tag
+                if ret.get("has_additional") is False:
+                    return
+            page += window
+
+    def get_manifest(
+        self,
+        image: str,
+        raw: bool = False,
+        media_type: str | None = None,
+        return_headers: bool = False,
+    ) -> ManifestList | Manifest | str:
+        """Get manifest of given media type. Blocking version of async_get_manifest."""
+        return self._run_sync(
+            self.async_get_manifest(
+                image, raw=raw, media_type=media_type, return_headers=return_headers
+            )
+        )
+
+    def resolve_manifest_digest(self, image: str, media_type: str | None = None) -> Tuple[str, str]:
+        """Resolve manifest digest of the image. Blocking version."""
+        return self._run_sync(self.async_resolve_manifest_digest(image, media_type=media_type))
+
+    def resolve_manifest_digests(
+        self, images: List[str], media_type: str | None = None
+    ) -> List[Tuple[str, str]]:
+        """Resolve manifest digests of multiple images concurrently. Blocking version."""
+        return self._run_sync(self.async_resolve_manifest_digests(images, media_type=media_type))
+
+    def get_blob(self, image: str) -> bytes:
+        """Get content of a blob. Blocking version of async_get_blob."""
+        return self._run_sync(self.async_get_blob(image))
+
+    def get_manifests(
+        self, images: List[str], raw: bool = False, media_type: str | None = None
+    ) -> List[ManifestList | Manifest | str]:
+        """Get manifests of multiple images concurrently. Blocking version."""
+        return self._run_sync(self.async_get_manifests(images, raw=raw, media_type=media_type))
+
+    def get_repository_tags(self, repository: str, raw: bool = False) -> str | Dict[str, List[str]]:
+        """Get tags of a provided repository. Blocking version of async_get_repository_tags."""
+        return self._run_sync(self.async_get_repository_tags(repository, raw=raw))
+
+    def get_quay_repositories(self, namespace):
+        """Get all repositories in a namespace. Blocking version."""
+        return self._run_sync(self.async_get_quay_repositories(namespace))
+
+    def get_quay_repository_tags(
+        self, repo, limit: Optional[int] = None, window: Optional[int] = None
+    ):
+        """Get all tags for a repository. Blocking version."""
+        return self._run_sync(self.async_get_quay_repository_tags(repo, limit, window))
+
+    def iter_repository_tags(self, repository: str) -> Iterator[str]:
+        """Iterate over tags of a provided repository. Blocking version."""
+        return self._iter_sync(self.async_iter_repository_tags(repository))
+
+    def iter_quay_repositories(self, namespace: str) -> Iterator[Any]:
+        """Iterate over repositories in a namespace. Blocking version."""
+        return self._iter_sync(self.async_iter_quay_repositories(namespace))
+
+    def iter_quay_repository_tags(
+        self, repo: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> Iterator[Any]:
+        """Iterate over tags of a repository. Blocking version."""
+        return self._iter_sync(self.async_iter_quay_repository_tags(repo, limit, window))
@@ -0,0 +1,151 @@
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+LOG = logging.getLogger("signtractions.resources.chunking")
+
+T = TypeVar("T")
+
+
+class LatencyStats:
+    """Exponentially weighted moving average of per-entry latency of an operation."""
+
+    def __init__(self, smoothing: float = 0.3):
+        """
+        Initialize empty statistics.
+
+        Args:
+            smoothing (float):
+                Weight of the newest measurement in the average.
+        """
+        self.smoothing = smoothing
+        self._per_entry: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def per_entry(self) -> Optional[float]:
+        """Return average seconds spent per entry or None if nothing was measured."""
+        return self._per_entry
+
+    def record(self, entries: int, seconds: float) -> None:
+        """
+        Record duration of operation processing the entries.
+
+        Args:
+            entries (int):
+                Number of entries processed.
+            seconds (float):
+                Duration of the operation.
+        """
+        if entries <= 0:
+            return
+        with self._lock:
+            measured = seconds / entries
+            if self._per_entry is None:
+                self._per_entry = measured
+            else:
+                self._per_entry += self.smoothing * (measured - self._per_entry)
+
+
+_latencies: Dict[Tuple[str, str], LatencyStats] = {}
+_latencies_lock = threading.Lock()
+
+
+def signer_latency(label: str, operation: str) -> LatencyStats:
+    """
+    Return latency statistics of signer operation shared by all users in the process.
+
+    Args:
+        label (str):
+            Label of the signer wrapper.
+        operation (str):
+            Measured operation, e.g. sign or store.
+    Returns (LatencyStats):
+        Latency statistics.
+    """
+    with _latencies_lock:
+        return _latencies.setdefault((label, operation), LatencyStats())
+
+
+def clear_signer_latencies() -> None:
+    """Forget latency statistics of all signer operations."""
+    with _latencies_lock:
+        _latencies.clear()
+
+
+class AdaptiveChunkSizer:
+    """
+    Choose chunk sizes so processing of one chunk takes about the target duration.
+
+    Without measurements chunks start small and grow geometrically. Once per-entry latency
+    is known, chunk size follows target duration divided by the latency. Size never grows
+    by more than the growth factor between consecutive chunks.
+    """
+
+    def __init__(
+        self,
+        latencies: Sequence[LatencyStats],
+        target_duration: float,
+        max_size: int,
+        initial_size: int = 10,
+        growth: float = 2,
+    ):
+        """
+        Initialize the sizer.
+
+        Args:
+            latencies (list):
+                Latency statistics of operations every chunk goes through.
+            target_duration (float):
+                Desired seconds spent processing one chunk.
+            max_size (int):
+                Upper bound of chunk size.
+            initial_size (int):
+                Size of the first chunk if latency isn't known yet.
+            growth (float):
+                Maximum ratio of two consecutive chunk sizes.
+        """
+        self.latencies = latencies
+        self.target_duration = target_duration
+        self.max_size = max(max_size, 1)
+        self.initial_size = initial_size
+        self.growth = growth
+        self._last_size: Optional[int] = None
+
+    def _per_entry(self) -> Optional[float]:
+        measured = [x.per_entry for x in self.latencies if x.per_entry is not None]
+        return sum(measured) if measured else None
+
+    def next_size(self) -> int:
+        """Return size of the next chunk."""
+        per_entry = self._per_entry()
+        if per_entry:
+            size = int(self.target_duration / per_entry)
+        elif self._last_size is None:
+            size = self.initial_size
+        else:
+            size = self.max_size
+        if self._last_size is not None:
+            size = min(size, int(self._last_size * self.growth))
+        size = min(max(size, 1), self.max_size)
+        self._last_size = size
+        return size
+
+    def chunks(self, entries: List[T]) -> Iterator[List[T]]:
+        """
+        Split entries into chunks sized by next_size.
+
+        Sizes are chosen lazily, so latencies measured while processing already yielded
+        chunks affect size of the following ones.
+
+        Args:
+            entries (list):
+                Entries to split.
+        Returns (iterator):
+            Chunks of entries.
+        """
+        start = 0
+        while start < len(entries):
+            size = self.next_size()
+            yield entries[start : start + size]  # noqa: E203
+            start += size
@@ -1,11 +1,34 @@
+import base64
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import dataclasses
+import functools
+import hashlib
+import json
 import logging
+import os
 import subprocess
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from pytractions.base import Base, TList
+import requests
+
+from .exceptions import ManifestNotFoundError, ManifestTypeError, RegistryAuthError
+
+try:
+    from cryptography.exceptions import InvalidSignature, UnsupportedAlgorithm
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+except ImportError:
+    serialization = None
+    UnsupportedAlgorithm = ValueError
 
 LOG = logging.getLogger("signtractions.resources.cosign")
 
+SIGNATURE_ANNOTATION = "dev.cosignproject.cosign/signature"
+CERTIFICATE_ANNOTATION = "dev.sigstore.cosign/certificate"
+BUNDLE_ANNOTATION = "dev.sigstore.cosign/bundle"
+SIGNATURE_MANIFEST_TYPE = "application/vnd.oci.image.manifest.v1+json"
+
 
 class VerifitcationFailed(Exception):
     """Verification failed exception."""
@@ -13,6 +36,391 @@ class VerifitcationFailed(Exception):
     pass
 
 
+class VerificationResult(NamedTuple):
+    """Result of cosign verification of a reference."""
+
+    verified: bool
+    stdout: str
+    stderr: str
+
+
+def _cosign_verify(
+    key_file: str, references: Sequence[str], env: Optional[Dict[str, str]] = None
+) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["cosign", "verify", "--key", key_file] + list(references),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+
+
+# Ratio of failed references above which failing batches aren't bisected anymore
+BISECT_FAILURE_RATIO = 0.5
+
+
+class _Split:
+    """Halves of a failed batch, failed halves wait until the other half is verified."""
+
+    def __init__(self) -> None:
+        self.remaining = 2
+        self.failures = 0
+        self.unresolved: List[List[str]] = []
+
+
+def verify_batched(
+    key_file: str,
+    references: Sequence[str],
+    batch_size: int = 50,
+    rekor_public_key_file: Optional[str] = None,
+    max_workers: int = 1,
+) -> Dict[str, VerificationResult]:
+    """
+    Verify signatures of many references with as few cosign invocations as possible.
+
+    References are verified in batches with one cosign process per batch. Cosign fails
+    whole invocation if any of the references fails verification, so failed batch is
+    split in halves and each half is verified again until failing references are found.
+
+    Bisection pays off only if failures are rare. If both halves of a failed batch fail,
+    or most of the references verified so far failed, references of the failed batch are
+    verified one by one instead.
+
+    Environment of cosign processes is passed to each process, environment of the current
+    process isn't changed, so verifications can run concurrently.
+
+    Args:
+        key_file (str):
+            Public key file to verify signatures with.
+        references (list):
+            References to verify. Duplicates are verified only once.
+        batch_size (int):
+            Maximum number of references verified by one cosign invocation. Batches are
+            made smaller if there wouldn't be enough of them to keep all workers busy.
+        rekor_public_key_file (str):
+            Rekor public key file set as SIGSTORE_REKOR_PUBLIC_KEY for cosign.
+        max_workers (int):
+            Maximum number of cosign processes running at the same time.
+    Returns (dict):
+        Verification result of each reference. Output of verified references is output
+        of the whole batch they were verified in.
+    """
+    env = None
+    if rekor_public_key_file:
+        env = dict(os.environ, SIGSTORE_REKOR_PUBLIC_KEY=rekor_public_key_file)
+    unique = list(dict.fromkeys(references))
+    max_workers = max(max_workers, 1)
+    batch_size = max(min(batch_size, -(-len(unique) // max_workers)), 1)
+    batches = [unique[i : i + batch_size] for i in range(0, len(unique), batch_size)]  # noqa: E203
+    results: Dict[str, VerificationResult] = {}
+    # number of failed and all references with known result
+    counts = {"failed": 0, "resolved": 0}
+    Task = Tuple[List[str], Optional[_Split]]
+
+    def mostly_failing() -> bool:
+        return counts["failed"] > BISECT_FAILURE_RATIO * counts["resolved"] > 0
+
+    def one_by_one(batch: List[str]) -> List[Task]:
+        return [([reference], None) for reference in batch]
+
+    def divide(batch: List[str]) -> List[Task]:
+        if mostly_failing():
+            return one_by_one(batch)
+        split = _Split()
+        return [(batch[: len(batch) // 2], split), (batch[len(batch) // 2 :], split)]  # noqa: E203
+
+    def process(task: Task, p: subprocess.CompletedProcess) -> List[Task]:
+        """Record results of the batch and return batches to verify again."""
+        batch, split = task
+        failed = p.returncode != 0
+        if not failed or len(batch) == 1:
+            for reference in batch:
+                results[reference] = VerificationResult(not failed, p.stdout, p.stderr)
+            counts["resolved"] += len(batch)
+            counts["failed"] += len(batch) if failed else 0
+        elif split is None:
+            LOG.info("Verification of %d references failed, bisecting", len(batch))
+            return divide(batch)
+        if split is None:
+            return []
+        split.remaining -= 1
+        split.failures += failed
+        if failed and len(batch) > 1:
+            split.unresolved.append(batch)
+        if split.remaining:
+            return []
+        if split.failures == 2:
+            LOG.info("Both halves of failed batch failed, verifying references one by one")
+            return [task for batch in split.unresolved for task in one_by_one(batch)]
+        return [task for batch in split.unresolved for task in divide(batch)]
+
+    def run(task: Task) -> subprocess.CompletedProcess:
+        return _cosign_verify(key_file, task[0], env)
+
+    if max_workers == 1:
+        # stack of batches to verify, first batch on top
+        pending: List[Task] = [(batch, None) for batch in batches[::-1]]
+        while pending:
+            task = pending.pop()
+            if task[1] is None and len(task[0]) > 1 and mostly_failing():
+                pending.extend(one_by_one(task[0])[::-1])
+                continue
+            pending.extend(process(task, run(task))[::-1])
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, (b, None)): (b, None) for b in batches}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = futures.pop(future)
+                for new_task in process(task, future.result()):
+                    futures[executor.submit(run, new_task)] = new_task
+    return results
+
+
+def native_verification_available() -> bool:
+    """Return True if signatures can be verified without cosign CLI."""
+    return serialization is not None
+
+
+@functools.lru_cache(maxsize=None)
+def load_public_key(key_file: str) -> Any:
+    """
+    Load PEM encoded public key. Parsed keys are cached for the process lifetime.
+
+    Args:
+        key_file (str):
+            Public key file.
+    Returns (object):
+        Public key object.
+    """
+    with open(key_file, "rb") as f:
+        return serialization.load_pem_public_key(f.read())
+
+
+def verify_signature(public_key: Any, signature: bytes, payload: bytes) -> bool:
+    """
+    Verify signature of the payload the way cosign verifies signatures made with a key.
+
+    Args:
+        public_key (object):
+            Public key object returned by load_public_key.
+        signature (bytes):
+            Raw signature.
+        payload (bytes):
+            Signed payload.
+    Returns (bool):
+        True if the signature is valid.
+    """
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature, payload, padding.PKCS1v15(), hashes.SHA256())
+        elif isinstance(public_key, ed25519.Ed25519PublicKey):
+            public_key.verify(signature, payload)
+        else:
+            public_key.verify(signature, payload, ec.ECDSA(hashes.SHA256()))
+    except InvalidSignature:
+        return False
+    return True
+
+
+def _public_key_der(public_key: Any) -> bytes:
+    return public_key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def verify_bundle(
+    rekor_key: Any, public_key: Any, bundle: Dict[str, Any], signature: bytes, payload: bytes
+) -> Optional[bool]:
+    """
+    Verify transparency log bundle of the signature the way cosign verifies it offline.
+
+    Signed entry timestamp has to be signature of the canonicalized bundle payload made
+    with the rekor key, and the logged entry has to record the signature, digest of the
+    payload and the public key.
+
+    Args:
+        rekor_key (object):
+            Public key of the transparency log returned by load_public_key.
+        public_key (object):
+            Public key the signature was verified with.
+        bundle (dict):
+            Parsed bundle annotation of the signature.
+        signature (bytes):
+            Raw signature.
+        payload (bytes):
+            Signed payload.
+    Returns (bool):
+        True if the bundle is valid for the signature, None if the logged entry kind
+        isn't supported.
+    """
+    rekor_payload = bundle["Payload"]
+    canonical = json.dumps(rekor_payload, sort_keys=True, separators=(",", ":"))
+    signed_entry_timestamp = base64.b64decode(bundle["SignedEntryTimestamp"])
+    if not verify_signature(rekor_key, signed_entry_timestamp, canonical.encode("utf-8")):
+        return False
+    body = json.loads(base64.b64decode(rekor_payload["body"]))
+    if body.get("kind") != "hashedrekord":
+        return None
+    spec = body["spec"]
+    logged_key = serialization.load_pem_public_key(
+        base64.b64decode(spec["signature"]["publicKey"]["content"])
+    )
+    return (
+        spec["data"]["hash"]["algorithm"] == "sha256"
+        and spec["data"]["hash"]["value"] == hashlib.sha256(payload).hexdigest()
+        and base64.b64decode(spec["signature"]["content"]) == signature
+        and _public_key_der(logged_key) == _public_key_der(public_key)
+    )
+
+
+def signature_tag(digest: str) -> str:
+    """Return tag cosign stores signatures of the digest under."""
+    algorithm, hex_digest = digest.split(":", 1)
+    return f"{algorithm}-{hex_digest}.sig"
+
+
+def _repository(reference: str) -> str:
+    name = reference.split("@", 1)[0]
+    if ":" in name.rsplit("/", 1)[-1]:
+        name = name.rsplit(":", 1)[0]
+    return name
+
+
+def signature_reference(reference: str, digest: str) -> str:
+    """
+    Return reference of cosign signature tag of the digest.
+
+    Args:
+        reference (str):
+            Reference of the image, signature tag is in its repository.
+        digest (str):
+            Manifest digest.
+    Returns (str):
+        Reference of the signature tag.
+    """
+    return f"{_repository(reference)}:{signature_tag(digest)}"
+
+
+def digest_reference(reference: str, digest: str) -> str:
+    """
+    Return reference of the digest in repository of the reference.
+
+    Args:
+        reference (str):
+            Reference of the image, e.g. with a tag.
+        digest (str):
+            Manifest digest.
+    Returns (str):
+        Reference of the manifest by digest.
+    """
+    return f"{_repository(reference)}@{digest}"
+
+
+# Errors of fetching signatures and parsing keys, manifests, payloads and bundles
+_NATIVE_VERIFICATION_ERRORS = (
+    requests.exceptions.RequestException,
+    ManifestNotFoundError,
+    ManifestTypeError,
+    RegistryAuthError,
+    OSError,
+    ValueError,
+    KeyError,
+    TypeError,
+    AttributeError,
+    UnsupportedAlgorithm,
+)
+
+
+class NativeCosignVerifier:
+    """
+    Verify cosign signatures made with a key in-process.
+
+    Signature manifest and payloads are fetched with the quay client, so registry
+    authentication is shared with other operations. Signatures are verified the way cosign
+    CLI verifies signatures with a transparency log bundle offline: signed entry timestamp
+    of the bundle is verified with the rekor public key and the logged entry has to match
+    the signature. Keyless signatures (with a certificate), signatures without bundle and
+    bundles of unsupported entry kinds are left for cosign CLI.
+    """
+
+    def __init__(self, quay_client: Any, key_file: str, rekor_key_file: str):
+        """
+        Initialize the verifier.
+
+        Args:
+            quay_client (QuayClient):
+                Client used to fetch signature manifests and payloads.
+            key_file (str):
+                Public key file to verify signatures with.
+            rekor_key_file (str):
+                Public key file of the transparency log to verify bundles with.
+        """
+        self.quay_client = quay_client
+        self.key_file = key_file
+        self.rekor_key_file = rekor_key_file
+
+    def verify(self, reference: str, digest: str) -> Optional[VerificationResult]:
+        """
+        Verify signature of the manifest digest.
+
+        Args:
+            reference (str):
+                Reference of the image, its repository is searched for the signatures.
+            digest (str):
+                Manifest digest signatures have to be made for.
+        Returns (VerificationResult):
+            Verification result or None if the signatures can't be verified natively.
+        """
+        if not native_verification_available() or not self.rekor_key_file:
+            return None
+        repository = _repository(reference)
+        try:
+            public_key = load_public_key(self.key_file)
+            rekor_key = load_public_key(self.rekor_key_file)
+            manifest = self.quay_client.get_manifest(
+                signature_reference(reference, digest), media_type=SIGNATURE_MANIFEST_TYPE
+            )
+            unsupported = False
+            for layer in manifest.get("layers", []):
+                annotations = layer.get("annotations", {})
+                if SIGNATURE_ANNOTATION not in annotations:
+                    continue
+                if CERTIFICATE_ANNOTATION in annotations or BUNDLE_ANNOTATION not in annotations:
+                    unsupported = True
+                    continue
+                payload = self.quay_client.get_blob(f"{repository}@{layer['digest']}")
+                if "sha256:" + hashlib.sha256(payload).hexdigest() != layer["digest"]:
+                    continue
+                signature = base64.b64decode(annotations[SIGNATURE_ANNOTATION])
+                if not verify_signature(public_key, signature, payload):
+                    continue
+                bundle_valid = verify_bundle(
+                    rekor_key,
+                    public_key,
+                    json.loads(annotations[BUNDLE_ANNOTATION]),
+                    signature,
+                    payload,
+                )
+                if bundle_valid is None:
+                    unsupported = True
+                    continue
+                if not bundle_valid:
+                    continue
+                signed = json.loads(payload)["critical"]["image"]["docker-manifest-digest"]
+                if signed == digest:
+                    return VerificationResult(True, payload.decode("utf-8"), "")
+        except _NATIVE_VERIFICATION_ERRORS:
+            LOG.debug("Native verification of %s failed", reference, exc_info=True)
+            return None
+        if unsupported:
+            return None
+        return VerificationResult(False, "", f"no matching signatures for {reference} {digest}")
+
+
 class CosignClient(Base):
     """Class for performing Docker HTTP API operations with the Quay registry."""
 
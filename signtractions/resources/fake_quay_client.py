@@ -1,4 +1,6 @@
-from typing import cast
+from typing import cast, Iterator, Optional, Tuple
+import dataclasses
+import hashlib
 import json
 import logging
 
@@ -9,7 +11,6 @@ from .quay_client import QuayClient, ManifestTypeError, ManifestNotFoundError
 from .types import ManifestList, Manifest
 from ..models.quay import QuayRepo, QuayTag
 
-
 LOG = logging.getLogger()
 logging.basicConfig()
 LOG.setLevel(logging.INFO)
@@ -21,8 +22,10 @@ class FakeQuayClient(QuayClient):
     fake_manifests: TDict[str, TDict[str, str]]
     fake_repositories: TDict[str, TDict[str, QuayRepo]]
     fake_tags: TDict[str, TDict[str, TList[QuayTag]]]
+    fake_blobs: TDict[str, str] = dataclasses.field(default_factory=TDict[str, str])
 
     d_fake_manifests: str = doc("Fake manifests for testing.")
+    d_fake_blobs: str = doc("Fake blobs for testing.")
 
     def __post_init__(self):
         """Fake quay client post init."""
@@ -37,6 +40,10 @@ class FakeQuayClient(QuayClient):
         self.fake_manifests.setdefault(image, TDict[str, str]({}))
         self.fake_manifests[image][media_type] = manifest
 
+    def populate_blob(self, image: str, blob: str):
+        """Populate fake quay client with blob."""
+        self.fake_blobs[image] = blob
+
     def populate_repository(self, namespace: str, repository: str, repo_data: QuayRepo):
         """Populate fake quay client with repository."""
         self.fake_repositories.setdefault(namespace, TDict[str, QuayRepo]({}))[
@@ -49,6 +56,10 @@ class FakeQuayClient(QuayClient):
             repository, TList[QuayTag]([])
         ).extend(tags)
 
+    def preauthorize(self, repositories, batch_size: int = 50) -> None:
+        """Fake client doesn't need any authentication."""
+        pass
+
     def get_repositories(self, namespace: str) -> TList[QuayRepo]:
         """Get list of repositories for given namespace."""
         return TList[QuayRepo](
@@ -126,6 +137,23 @@ class FakeQuayClient(QuayClient):
             else:
                 raise ManifestNotFoundError(image)
 
+    def resolve_manifest_digest(self, image: str, media_type: str | None = None) -> Tuple[str, str]:
+        """Resolve manifest digest of the specified image.
+
+        Returns (tuple):
+            Tuple of (manifest digest, content type of the manifest).
+        """
+        for manifest_type in (media_type,) if media_type else self._MANIFEST_TYPES_PREFERENCE:
+            if image in self.fake_manifests and manifest_type in self.fake_manifests[image]:
+                hasher = hashlib.sha256()
+                hasher.update(self.fake_manifests[image][manifest_type].encode("utf-8"))
+                return ("sha256:" + hasher.hexdigest(), manifest_type)
+        if image in self.fake_manifests and media_type:
+            raise ManifestTypeError(
+                "Image {0} doesn't have a {1} manifest".format(image, media_type)
+            )
+        raise ManifestNotFoundError(image)
+
     def upload_manifest(self, manifest: ManifestList | str, image: str, raw: bool = False) -> None:
         """
         Upload manifest to a specified image.
@@ -151,12 +179,30 @@ class FakeQuayClient(QuayClient):
                 manifest, sort_keys=True
             )
 
+    def get_blob(self, image: str) -> bytes:
+        """Get content of a blob."""
+        if image not in self.fake_blobs:
+            raise ValueError("Blob {0} not found".format(image))
+        return self.fake_blobs[image].encode("utf-8")
+
     def get_repository_tags(self, repository: str):
         """Get list of tags for given repository."""
         namespace, repository = repository.split("/")
         return {"tags": [tag.name for tag in self.fake_tags.get(namespace, {}).get(repository, [])]}
 
-    def get_quay_repository_tags(self, repository: str) -> TList[QuayTag]:
+    def get_quay_repository_tags(
+        self, repository: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> TList[QuayTag]:
         """Get list of tags for given repository."""
         namespace, repository = repository.split("/")
         return TList[QuayTag](self.fake_tags.get(namespace, {}).get(repository, []))
+
+    def iter_repository_tags(self, repository: str) -> Iterator[str]:
+        """Iterate over tags of given repository."""
+        yield from self.get_repository_tags(repository)["tags"]
+
+    def iter_quay_repository_tags(
+        self, repository: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> Iterator[QuayTag]:
+        """Iterate over tags of given repository."""
+        yield from self.get_quay_repository_tags(repository)
@@ -14,3 +14,7 @@ class FakeSigstore(Base):
     def get_signatures(self, image, digest):
         """Get signatures for an image and digest."""
         return self.signatures.get(image, {}).get(digest, [])
+
+    def close(self):
+        """Fake sigstore doesn't hold any resources."""
+        pass
@@ -0,0 +1,225 @@
+from concurrent.futures import Future
+import logging
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+LOG = logging.getLogger("signtractions.resources.gpg")
+
+
+class DecryptionFailed(Exception):
+    """Signature blob couldn't be decrypted or its signature isn't valid."""
+
+    def __init__(self, stdout: bytes, stderr: bytes):
+        """
+        Initialize the exception.
+
+        Args:
+            stdout (bytes):
+                Output of gpg.
+            stderr (bytes):
+                Error output of gpg.
+        """
+        super().__init__("Decryption failed")
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class DecryptedFiles(NamedTuple):
+    """Result of gpg invocation decrypting multiple blobs."""
+
+    returncode: int
+    outputs: List[Optional[bytes]]
+    stderr: bytes
+
+
+def decrypt(content: bytes) -> bytes:
+    """
+    Decrypt and verify signature blob with gpg.
+
+    Args:
+        content (bytes):
+            Signed blob.
+    Returns (bytes):
+        Signed content.
+    Raises:
+        DecryptionFailed:
+            If the blob can't be decrypted or verified.
+    """
+    p = subprocess.Popen(
+        ["gpg", "-d"], stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    stdout, stderr = p.communicate(content)
+    if p.returncode != 0:
+        raise DecryptionFailed(stdout, stderr)
+    return stdout
+
+
+def decrypt_files(contents: Sequence[bytes]) -> DecryptedFiles:
+    """
+    Decrypt and verify signature blobs with one gpg invocation.
+
+    Blobs are written to a temporary directory and decrypted with gpg --decrypt-files.
+    Gpg fails if any of the blobs fails, outputs of the other blobs are still returned.
+
+    Args:
+        contents (list):
+            Signed blobs.
+    Returns (DecryptedFiles):
+        Return code of gpg, signed content of each blob (None if gpg didn't write it)
+        and error output.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = [os.path.join(tmpdir, f"{n}.gpg") for n in range(len(contents))]
+        for path, content in zip(paths, contents):
+            with open(path, "wb") as f:
+                f.write(content)
+        p = subprocess.run(
+            ["gpg", "--batch", "--yes", "--decrypt-files"] + paths,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        outputs: List[Optional[bytes]] = []
+        for path in paths:
+            output = path[: -len(".gpg")]
+            if os.path.exists(output):
+                with open(output, "rb") as f:
+                    outputs.append(f.read())
+            else:
+                outputs.append(None)
+    return DecryptedFiles(p.returncode, outputs, p.stderr)
+
+
+class BatchDecryptor:
+    """
+    Decrypt signature blobs submitted from many threads with one gpg invocation per batch.
+
+    Worker threads collect submitted blobs into batches. Worker waits for more blobs
+    shortly after the first one arrives, so blobs submitted at about the same time share
+    the gpg invocation and its keyring initialization. Gpg fails the whole invocation if
+    any of the blobs fails, so failed batch is split in halves and each half is decrypted
+    again until failing blobs are found.
+
+    Worker threads run until the decryptor is closed, decryptor can be used as a context
+    manager which closes it on exit.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, batch_size: int = 50, workers: int = 1, linger: float = 0.05):
+        """
+        Initialize the decryptor. Worker threads are started with the first submitted blob.
+
+        Args:
+            batch_size (int):
+                Maximum number of blobs decrypted by one gpg invocation.
+            workers (int):
+                Number of gpg invocations running at the same time.
+            linger (float):
+                Seconds worker waits for more blobs before it decrypts incomplete batch.
+        """
+        self.batch_size = max(batch_size, 1)
+        self.workers = max(workers, 1)
+        self.linger = linger
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self) -> "BatchDecryptor":
+        """Return the decryptor."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Close the decryptor."""
+        self.close()
+
+    def close(self) -> None:
+        """
+        Decrypt blobs submitted so far and stop worker threads.
+
+        Blobs can't be submitted after the decryptor is closed.
+        """
+        with self._lock:
+            self._closed = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(self._CLOSE)
+        for thread in threads:
+            thread.join()
+
+    def submit(self, content: bytes) -> Future:
+        """
+        Submit signature blob to decrypt.
+
+        Args:
+            content (bytes):
+                Signed blob.
+        Returns (Future):
+            Future of signed content. It raises DecryptionFailed if the blob fails.
+        Raises:
+            RuntimeError:
+                If the decryptor is closed.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit blobs to closed decryptor")
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            future: Future = Future()
+            # queued under the lock, so the blob can't end up behind stop markers of close
+            self._queue.put((content, future))
+        return future
+
+    def _collect(self) -> Tuple[List[Tuple[bytes, Future]], bool]:
+        """Return next batch and whether the worker should stop after decrypting it."""
+        batch: List[Tuple[bytes, Future]] = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.linger
+        while item is not self._CLOSE:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _work(self) -> None:
+        closing = False
+        while not closing:
+            items, closing = self._collect()
+            batch = [item for item in items if item[1].set_running_or_notify_cancel()]
+            if batch:
+                self._decrypt(batch)
+
+    def _decrypt(self, batch: List[Tuple[bytes, Future]]) -> None:
+        # stack of batches to decrypt, first batch on top
+        pending = [batch]
+        while pending:
+            items = pending.pop()
+            try:
+                result = decrypt_files([content for content, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            if result.returncode == 0:
+                for (_, future), output in zip(items, result.outputs):
+                    if output is None:
+                        # gpg succeeded, but didn't write the output, blob can't be trusted
+                        future.set_exception(DecryptionFailed(b"", result.stderr))
+                    else:
+                        future.set_result(output)
+            elif len(items) == 1:
+                items[0][1].set_exception(DecryptionFailed(result.outputs[0] or b"", result.stderr))
+            else:
+                LOG.info("Decryption of %d signatures failed, bisecting", len(items))
+                pending.extend([items[len(items) // 2 :], items[: len(items) // 2]])  # noqa: E203
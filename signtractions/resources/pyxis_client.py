@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+from urllib3.util.retry import Retry
+
+LOG = logging.getLogger("signtractions.resources.pyxis_client")
+
+
+class PyxisSignatureClient:
+    """
+    In-process client of Pyxis container signatures API.
+
+    One HTTP session with client certificate authentication is shared by all calls
+    (and threads) of the client, so the connections are reused.
+    """
+
+    PAGE_SIZE: int = 100
+
+    def __init__(
+        self,
+        server: str,
+        cert_file: Optional[str] = None,
+        key_file: Optional[str] = None,
+        ca_file: Optional[str] = None,
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff_factor: float = 2,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            server (str):
+                Pyxis server URL or hostname.
+            cert_file (str):
+                Client certificate file used for authentication.
+            key_file (str):
+                Client key file used for authentication.
+            ca_file (str):
+                Certificate Authority bundle used to verify the server.
+            pool_size (int):
+                Maximum number of connections kept open to the server.
+            retries (int):
+                Number of retries of failed requests.
+            backoff_factor (float):
+                Backoff factor between retries.
+        """
+        if "://" not in server:
+            server = "https://" + server
+        self.server = server.rstrip("/")
+        self.session = requests.Session()
+        if cert_file and key_file:
+            self.session.cert = (cert_file, key_file)
+        if ca_file:
+            self.session.verify = ca_file
+        # Only idempotent methods are retried after the request was sent. Retrying signature
+        # upload which timed out after the server stored it would create duplicate signature,
+        # so uploads are retried only when connection to the server fails.
+        retry = Retry(
+            total=retries,
+            read=retries,
+            connect=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=set(range(500, 512)),
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _url(self, endpoint: str) -> str:
+        return "{0}/v1/{1}".format(self.server, endpoint)
+
+    def get_signatures(self, manifest_digests: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get all signatures of the manifest digests.
+
+        Args:
+            manifest_digests (list):
+                Manifest digests to get signatures for.
+        Returns (list):
+            Signatures stored in Pyxis.
+        """
+        if not manifest_digests:
+            return []
+        params: Dict[str, Any] = {
+            "filter": "manifest_digest=in=({0})".format(",".join(manifest_digests)),
+            "page_size": self.PAGE_SIZE,
+            "page": 0,
+        }
+        signatures: List[Dict[str, Any]] = []
+        while True:
+            r = self.session.get(self._url("signatures"), params=params)
+            r.raise_for_status()
+            data = r.json()["data"]
+            signatures.extend(data)
+            if len(data) < self.PAGE_SIZE:
+                return signatures
+            params["page"] += 1
+
+    def upload_signatures(self, signatures: List[Dict[str, Any]], threads: int = 1) -> None:
+        """
+        Upload signatures to Pyxis.
+
+        Args:
+            signatures (list):
+                Signatures to upload. Each of them has manifest_digest, reference, repository,
+                sig_key_id and signature_data fields.
+            threads (int):
+                Number of signatures uploaded at the same time.
+        """
+
+        def upload(signature: Dict[str, Any]) -> None:
+            r = self.session.post(self._url("signatures"), json=signature)
+            r.raise_for_status()
+
+        self._run_threaded(upload, signatures, threads)
+
+    def delete_signatures(self, signature_ids: List[str], threads: int = 1) -> None:
+        """
+        Delete signatures from Pyxis.
+
+        Args:
+            signature_ids (list):
+                Pyxis IDs of signatures to delete.
+            threads (int):
+                Number of signatures deleted at the same time.
+        """
+
+        def delete(signature_id: str) -> None:
+            r = self.session.delete(self._url("signatures/id/{0}".format(signature_id)))
+            r.raise_for_status()
+
+        self._run_threaded(delete, signature_ids, threads)
+
+    @staticmethod
+    def _run_threaded(func: Any, items: List[Any], threads: int) -> None:
+        if threads <= 1 or len(items) <= 1:
+            for item in items:
+                func(item)
+            return
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            # Consume results to raise the first error
+            list(executor.map(func, items))
+
+
+_clients: Dict[Any, PyxisSignatureClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_pyxis_signature_client(
+    server: str,
+    cert_file: Optional[str] = None,
+    key_file: Optional[str] = None,
+    ca_file: Optional[str] = None,
+    pool_size: int = 10,
+) -> PyxisSignatureClient:
+    """
+    Return client shared by all callers with the same configuration in the process.
+
+    Args:
+        server (str):
+            Pyxis server URL or hostname.
+        cert_file (str):
+            Client certificate file used for authentication.
+        key_file (str):
+            Client key file used for authentication.
+        ca_file (str):
+            Certificate Authority bundle used to verify the server.
+        pool_size (int):
+            Maximum number of connections kept open to the server.
+    Returns (PyxisSignatureClient):
+        Pyxis client.
+    """
+    key = (server, cert_file, key_file, ca_file, pool_size)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = PyxisSignatureClient(
+                server, cert_file=cert_file, key_file=key_file, ca_file=ca_file, pool_size=pool_size
+            )
+        return _clients[key]
@@ -1,12 +1,16 @@
+import collections
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import hashlib
 import json
 import logging
+import os
 import requests
 import re
 from urllib3.util.retry import Retry
 from urllib import request
 import threading
-from typing import Any, cast, Dict, List, Optional
+import time
+from typing import Any, Callable, cast, Dict, Iterator, List, Optional, Tuple
 
 from .exceptions import ManifestTypeError, RegistryAuthError, ManifestNotFoundError
 from .quay_session import QuaySession
@@ -15,10 +19,288 @@ from .types import ManifestList, Manifest
 from pytractions.base import Base
 from pytractions.utils import doc
 
-
 LOG = logging.getLogger("signtractions.resources.quay_client")
 
 
+class ManifestCache(object):
+    """Cache of digest addressed manifests.
+
+    Manifests referenced by digest are immutable, so once fetched they can be served
+    from the cache. Entries are kept in an in-memory LRU and optionally persisted
+    in a content-addressed directory layout (<cache_dir>/<repo>/<algorithm>/<hex>.json)
+    which survives between runs.
+
+    Digest last seen for each tag is remembered too (<cache_dir>/<repo>/tags/<tag>),
+    so tags which were never fetched aren't revalidated.
+    """
+
+    def __init__(self, max_size: int = 1024, cache_dir: Optional[str] = None) -> None:
+        """
+        Initialize.
+
+        Args:
+            max_size (int):
+                Maximum number of manifests kept in memory.
+            cache_dir (str):
+                Directory of the on-disk store. If None, only in-memory cache is used.
+        """
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries: collections.OrderedDict[str, Tuple[str, str]] = collections.OrderedDict()
+        self._tags: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(repo: str, digest: str) -> str:
+        """Return cache key for given repository and digest."""
+        return "{0}@{1}".format(repo, digest)
+
+    def get(self, repo: str, digest: str) -> Optional[Tuple[str, str]]:
+        """
+        Get cached manifest.
+
+        Args:
+            repo (str):
+                Repository of the manifest (namespace/repo).
+            digest (str):
+                Digest of the manifest.
+        Returns (tuple|None):
+            Tuple of (content type, raw manifest) or None if manifest isn't cached.
+        """
+        key = self.key(repo, digest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        entry = self._load(repo, digest)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, repo: str, digest: str, content_type: str, manifest: str) -> None:
+        """
+        Store manifest in the cache.
+
+        Args:
+            repo (str):
+                Repository of the manifest (namespace/repo).
+            digest (str):
+                Digest of the manifest.
+            content_type (str):
+                Content type the manifest was served with.
+            manifest (str):
+                Raw manifest.
+        """
+        entry = (content_type, manifest)
+        self._remember(self.key(repo, digest), entry)
+        self._store(repo, digest, entry)
+
+    def get_tag(self, repo: str, tag: str) -> Optional[str]:
+        """
+        Get digest the tag pointed to when it was last fetched.
+
+        Args:
+            repo (str):
+                Repository of the tag (namespace/repo).
+            tag (str):
+                Tag name.
+        Returns (str|None):
+            Digest or None if the tag wasn't seen.
+        """
+        key = "{0}:{1}".format(repo, tag)
+        with self._lock:
+            if key in self._tags:
+                self._tags.move_to_end(key)
+                return self._tags[key]
+        path = self._tag_path(repo, tag)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            LOG.warning("Cannot read cached tag %s", path, exc_info=True)
+            return None
+        return digest or None
+
+    def put_tag(self, repo: str, tag: str, digest: str) -> None:
+        """
+        Remember digest the tag points to.
+
+        Args:
+            repo (str):
+                Repository of the tag (namespace/repo).
+            tag (str):
+                Tag name.
+            digest (str):
+                Digest of the manifest the tag points to.
+        """
+        key = "{0}:{1}".format(repo, tag)
+        with self._lock:
+            if self._tags.get(key) == digest:
+                return
+            self._tags[key] = digest
+            self._tags.move_to_end(key)
+            while len(self._tags) > self.max_size:
+                self._tags.popitem(last=False)
+        path = self._tag_path(repo, tag)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f:
+            f.write(digest)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key: str, entry: Tuple[str, str]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _path(self, repo: str, digest: str) -> Optional[str]:
+        if not self.cache_dir or ":" not in digest:
+            return None
+        algorithm, hexdigest = digest.split(":", 1)
+        return os.path.join(self.cache_dir, repo, algorithm, hexdigest + ".json")
+
+    def _tag_path(self, repo: str, tag: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, repo, "tags", tag)
+
+    def _load(self, repo: str, digest: str) -> Optional[Tuple[str, str]]:
+        path = self._path(repo, digest)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            manifest, content_type = data["manifest"], data["content_type"]
+            # Content addressed store - don't trust entries which don't match their digest
+            if _sha256_digest(manifest) != digest:
+                LOG.warning("Cached manifest %s doesn't match its digest, ignoring", path)
+                return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            LOG.warning("Cannot read cached manifest %s", path, exc_info=True)
+            return None
+        return (content_type, manifest)
+
+    def _store(self, repo: str, digest: str, entry: Tuple[str, str]) -> None:
+        path = self._path(repo, digest)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to temporary file first so concurrent readers never see partial manifest
+        tmp_path = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump({"content_type": entry[0], "manifest": entry[1]}, f)
+        os.replace(tmp_path, path)
+
+
+class BearerTokenCache(object):
+    """Thread safe cache of registry bearer tokens.
+
+    Tokens are keyed by (realm, service, scope, username) taken from the registry's
+    authentication challenge and are kept until they expire. Only one token request
+    per key is in flight, other threads asking for the same key wait for its result.
+    """
+
+    def __init__(self, default_expires_in: int = 60, expiry_margin: int = 10) -> None:
+        """
+        Initialize.
+
+        Args:
+            default_expires_in (int):
+                Lifetime of tokens in seconds if authentication server doesn't provide it.
+            expiry_margin (int):
+                Number of seconds before expiration when token isn't used anymore.
+        """
+        self.default_expires_in = default_expires_in
+        self.expiry_margin = expiry_margin
+        self._tokens: Dict[Tuple[str, ...], Tuple[str, float]] = {}
+        self._hints: Dict[str, Tuple[str, ...]] = {}
+        self._locks: Dict[Tuple[str, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, ...]) -> Optional[str]:
+        """Return valid token for given key or None."""
+        with self._lock:
+            entry = self._tokens.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def get_by_hint(self, hint: str) -> Optional[str]:
+        """Return valid token for key previously associated with the hint or None."""
+        with self._lock:
+            key = self._hints.get(hint)
+        if key is None:
+            return None
+        return self.get(key)
+
+    def set_hint(self, hint: str, key: Tuple[str, ...]) -> None:
+        """Associate hint (e.g. repository) with token key so token can be used in advance."""
+        with self._lock:
+            self._hints[hint] = key
+
+    def get_or_fetch(
+        self,
+        key: Tuple[str, ...],
+        fetch: Callable[[], Dict[str, Any]],
+        stale_token: Optional[str] = None,
+    ) -> str:
+        """
+        Return cached token or fetch new one.
+
+        Args:
+            key (tuple):
+                Token key.
+            fetch (callable):
+                Function returning authentication server response.
+            stale_token (str):
+                Token which was rejected by the registry and mustn't be returned.
+        Returns (str):
+            Bearer token.
+        """
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            token = self.get(key)
+            if token and token != stale_token:
+                return token
+            data = fetch()
+            self.put(key, data["token"], data.get("expires_in"))
+            return data["token"]
+
+    def put(self, key: Tuple[str, ...], token: str, expires_in: Optional[int] = None) -> None:
+        """
+        Store token in the cache.
+
+        Args:
+            key (tuple):
+                Token key.
+            token (str):
+                Bearer token.
+            expires_in (int):
+                Lifetime of the token in seconds.
+        """
+        expires_in = expires_in or self.default_expires_in
+        with self._lock:
+            self._tokens[key] = (
+                token,
+                time.monotonic() + max(expires_in - self.expiry_margin, 0),
+            )
+
+
+def _sha256_digest(manifest: str) -> str:
+    """Return sha256 digest of raw manifest."""
+    hasher = hashlib.sha256()
+    hasher.update(manifest.encode("utf-8"))
+    return "sha256:{0}".format(hasher.hexdigest())
+
+
 class QuayClient(Base):
     """Class for performing Docker HTTP API operations with the Quay registry."""
 
@@ -27,11 +309,24 @@ class QuayClient(Base):
     _MANIFEST_V2S1_TYPE: str = "application/vnd.docker.distribution.manifest.v1+json"
     _MANIFEST_OCI_LIST_TYPE: str = "application/vnd.oci.image.index.v1+json"
     _MANIFEST_OCI_V2S2_TYPE: str = "application/vnd.oci.image.manifest.v1+json"
+    # Order in which manifest types are preferred when media type is not specified
+    _MANIFEST_TYPES_PREFERENCE: Tuple[str, ...] = (
+        _MANIFEST_LIST_TYPE,
+        _MANIFEST_V2S2_TYPE,
+        _MANIFEST_OCI_LIST_TYPE,
+        _MANIFEST_OCI_V2S2_TYPE,
+        _MANIFEST_V2S1_TYPE,
+    )
 
     username: str
     password: str
     host: str
     token: Optional[str] = None
+    manifest_cache_size: int = 0
+    manifest_cache_dir: Optional[str] = None
+    manifest_negotiation: bool = False
+    tag_page_limit: int = 0
+    tag_page_window: int = 1
 
     d_username: str = doc("Username for Quay registry.")
     d_password: str = doc("Password for Quay registry.")
@@ -40,10 +335,53 @@ class QuayClient(Base):
         "Quay oauth token for quay specific queries. "
         + "It's not same as bearer token obtained from docker user-pass auth."
     )
+    d_manifest_cache_size: str = doc(
+        "Number of digest addressed manifests kept in memory. "
+        + "Cache is disabled if 0 and manifest_cache_dir is not set."
+    )
+    d_manifest_cache_dir: str = doc(
+        "Directory used to persist digest addressed manifests between runs."
+    )
+    d_manifest_negotiation: str = doc(
+        "Request manifest of unspecified media type with single request carrying weighted "
+        + "Accept header instead of trying each media type one by one."
+    )
+    d_tag_page_limit: str = doc(
+        "Number of tags requested per page from Quay API. Server default is used if 0."
+    )
+    d_tag_page_window: str = doc(
+        "Number of Quay API tag pages fetched concurrently. Pages are fetched one by one if 1."
+    )
 
     def __post_init__(self, *args, **kwargs):
         """Post init for quay client."""
         self._thread_local = threading.local()
+        self._token_cache = BearerTokenCache()
+        self._manifest_cache: Optional[ManifestCache] = None
+        if self.manifest_cache_size or self.manifest_cache_dir:
+            self._manifest_cache = ManifestCache(
+                max_size=self.manifest_cache_size, cache_dir=self.manifest_cache_dir
+            )
+
+    def set_manifest_cache(self, manifest_cache: Optional[ManifestCache]) -> None:
+        """
+        Set manifest cache used by get_manifest.
+
+        Args:
+            manifest_cache (ManifestCache):
+                Cache instance or None to disable caching.
+        """
+        self._manifest_cache = manifest_cache
+
+    def set_token_cache(self, token_cache: BearerTokenCache) -> None:
+        """
+        Set bearer token cache, e.g. to share tokens between multiple clients.
+
+        Args:
+            token_cache (BearerTokenCache):
+                Cache instance.
+        """
+        self._token_cache = token_cache
 
     @property
     def session(self) -> Any | QuaySession:
@@ -96,6 +434,21 @@ class QuayClient(Base):
         repo, ref = self._parse_and_validate_image_url(image)
         endpoint = "{0}/manifests/{1}".format(repo, ref)
 
+        cached = self._get_cached_manifest(repo, ref, endpoint, media_type)
+        if cached is not None:
+            content_type, manifest = cached
+            LOG.debug("Using cached manifest for %s", image)
+            if raw:
+                if not return_headers:
+                    return manifest
+                else:
+                    return (
+                        manifest,
+                        requests.structures.CaseInsensitiveDict({"Content-Type": content_type}),
+                    )
+            else:
+                return cast(ManifestList, json.loads(manifest))
+
         if media_type:
             kwargs = {"headers": {"Accept": media_type}}
             response = self._request_quay("GET", endpoint, kwargs)
@@ -108,6 +461,7 @@ class QuayClient(Base):
                 raise ManifestTypeError(
                     "Image {0} doesn't have a {1} manifest".format(image, media_type)
                 )
+            self._cache_manifest(repo, response, ref)
             if raw:
                 if not return_headers:
                     return str(response.text)
@@ -116,25 +470,144 @@ class QuayClient(Base):
             else:
                 return cast(ManifestList, response.json())
 
+        response = self._request_manifest_any_type("GET", endpoint)
+        self._cache_manifest(repo, response, ref)
+        if raw:
+            return response.text
+        else:
+            return cast(ManifestList, response.json())
+
+    def _get_cached_manifest(
+        self, repo: str, ref: str, endpoint: str, media_type: str | None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Look up manifest in the manifest cache.
+
+        Digest references are served directly from the cache. Tag references are
+        revalidated with HEAD request(s) reading Docker-Content-Digest header, so
+        only the manifest body transfer is saved for them. Tags which weren't fetched
+        before aren't revalidated, as their manifest can't be cached.
+
+        Args:
+            repo (str):
+                Repository of the image.
+            ref (str):
+                Tag or digest of the image.
+            endpoint (str):
+                Manifest endpoint of the image.
+            media_type (str):
+                Requested media type or None.
+        Returns (tuple|None):
+            Tuple of (content type, raw manifest) or None if the manifest isn't cached.
+        """
+        if self._manifest_cache is None:
+            return None
+
+        if ref.startswith("sha256:"):
+            digest = ref
+        elif self._manifest_cache.get_tag(repo, ref) is None:
+            return None
+        else:
+            try:
+                digest = self._revalidate_tag(endpoint, media_type)
+            except requests.exceptions.HTTPError:
+                LOG.debug("Cannot revalidate %s, fetching full manifest", endpoint, exc_info=True)
+                return None
+            if not digest:
+                return None
+
+        cached = self._manifest_cache.get(repo, digest)
+        if cached is None:
+            return None
+        content_type = cached[0]
+        if media_type and content_type != media_type and "text/plain" not in content_type:
+            return None
+        return cached
+
+    def _revalidate_tag(self, endpoint: str, media_type: str | None) -> Optional[str]:
+        """
+        Get digest of manifest the tag points to without downloading the manifest.
+
+        Without media type, manifest types are requested in order of preference until
+        the registry provides the digest.
+
+        Args:
+            endpoint (str):
+                Manifest endpoint of the image.
+            media_type (str):
+                Requested media type or None.
+        Returns (str|None):
+            Digest of the manifest or None if registry didn't provide it.
+        """
+        if media_type:
+            accepts = [media_type]
+        elif self.manifest_negotiation:
+            accepts = [self._manifest_accept_header()]
+        else:
+            accepts = list(self._MANIFEST_TYPES_PREFERENCE)
+        for accept in accepts:
+            response = self._request_quay("HEAD", endpoint, {"headers": {"Accept": accept}})
+            if response.headers.get("Docker-Content-Digest"):
+                return cast(str, response.headers["Docker-Content-Digest"])
+        return None
+
+    def _request_manifest_any_type(self, method: str, endpoint: str) -> requests.Response:
+        """
+        Request manifest of the most preferred type the image has.
+
+        With manifest_negotiation enabled, single request with weighted Accept header is sent
+        first. If registry responds with type which wasn't asked for, or with V2S1 manifest
+        (registries which don't understand multiple types in Accept header fall back to it),
+        each type is requested one by one in order of preference.
+
+        Args:
+            method (str):
+                GET or HEAD.
+            endpoint (str):
+                Manifest endpoint of the image.
+        Returns (Response):
+            Request library's Response object.
+        """
+        if self.manifest_negotiation:
+            kwargs = {"headers": {"Accept": self._manifest_accept_header()}}
+            response = self._request_quay(method, endpoint, kwargs)
+            if response.headers.get("Content-Type") in self._MANIFEST_TYPES_PREFERENCE[:-1]:
+                return response
+            LOG.debug(
+                "Unexpected content type %s for negotiated manifest request %s, "
+                "trying manifest types one by one",
+                response.headers.get("Content-Type"),
+                endpoint,
+            )
+
         # If type is not specified, try to get manifests in this order
         # If somehow none of these match, we'll accept whatever we got
-        for manifest_type in (
-            QuayClient._MANIFEST_LIST_TYPE,
-            QuayClient._MANIFEST_V2S2_TYPE,
-            QuayClient._MANIFEST_OCI_LIST_TYPE,
-            QuayClient._MANIFEST_OCI_V2S2_TYPE,
-            QuayClient._MANIFEST_V2S1_TYPE,
-        ):
+        for manifest_type in self._MANIFEST_TYPES_PREFERENCE:
             kwargs = {"headers": {"Accept": manifest_type}}
-            response = self._request_quay("GET", endpoint, kwargs)
+            response = self._request_quay(method, endpoint, kwargs)
 
-            if response.headers["Content-Type"] == manifest_type:
+            if response.headers.get("Content-Type") == manifest_type:
                 break
+        return response
 
-        if raw:
-            return response.text
-        else:
-            return cast(ManifestList, response.json())
+    def _manifest_accept_header(self) -> str:
+        """Return Accept header listing all manifest types weighted by preference."""
+        return ", ".join(
+            "{0};q={1:.1f}".format(manifest_type, 1 - 0.1 * i)
+            for i, manifest_type in enumerate(self._MANIFEST_TYPES_PREFERENCE)
+        )
+
+    def _cache_manifest(
+        self, repo: str, response: requests.Response, ref: Optional[str] = None
+    ) -> None:
+        """Store fetched manifest in the manifest cache under its content digest and tag."""
+        if self._manifest_cache is None:
+            return
+        manifest = str(response.text)
+        digest = _sha256_digest(manifest)
+        self._manifest_cache.put(repo, digest, response.headers["Content-Type"], manifest)
+        if ref and not ref.startswith("sha256:"):
+            self._manifest_cache.put_tag(repo, ref, digest)
 
     def get_manifest_digest(self, image: str, media_type: str | None = None) -> str:
         """
@@ -163,6 +636,85 @@ class QuayClient(Base):
 
         return "sha256:{0}".format(digest)
 
+    def resolve_manifest_digest(self, image: str, media_type: str | None = None) -> Tuple[str, str]:
+        """
+        Resolve manifest digest of the specified image without downloading the manifest.
+
+        HEAD request is sent and digest is read from Docker-Content-Digest header.
+        Manifest is downloaded and hashed only when the header is missing or when
+        the manifest is V2S1 (possibly served as text/plain), as digest of signed V2S1
+        manifest provided by registry doesn't match hash of the manifest content.
+
+        Args:
+            image (str):
+                Image address for which to resolve the digest.
+            media_type (str):
+                Requested manifest type. If None, manifest types are preferred in the same
+                order as in get_manifest.
+        Returns (tuple):
+            Tuple of (manifest digest, content type of the manifest).
+        Raises:
+            ManifestTypeError:
+                When the image doesn't return the requested manifest type.
+            ManifestNotFoundError:
+                When the image doesn't exist.
+        """
+        repo, ref = self._parse_and_validate_image_url(image)
+        endpoint = "{0}/manifests/{1}".format(repo, ref)
+        try:
+            response = self._request_manifest("HEAD", endpoint, image, media_type)
+            content_type = response.headers.get("Content-Type", "")
+            if (
+                "Docker-Content-Digest" in response.headers
+                and "text/plain" not in content_type
+                and content_type != self._MANIFEST_V2S1_TYPE
+            ):
+                return (response.headers["Docker-Content-Digest"], content_type)
+
+            LOG.debug("Cannot resolve digest of %s from headers, fetching manifest", image)
+            response = self._request_manifest("GET", endpoint, image, media_type)
+        except requests.exceptions.HTTPError as exc:
+            if exc.response.status_code == 404:
+                raise ManifestNotFoundError()
+            else:
+                raise exc
+        self._cache_manifest(repo, response, ref)
+        return (_sha256_digest(str(response.text)), response.headers.get("Content-Type", ""))
+
+    def _request_manifest(
+        self, method: str, endpoint: str, image: str, media_type: str | None
+    ) -> requests.Response:
+        """
+        Request manifest of given media type or of the most preferred type if not specified.
+
+        Args:
+            method (str):
+                GET or HEAD.
+            endpoint (str):
+                Manifest endpoint of the image.
+            image (str):
+                Image address used in error messages.
+            media_type (str):
+                Requested media type or None.
+        Returns (Response):
+            Request library's Response object.
+        Raises:
+            ManifestTypeError:
+                When the image doesn't return the requested manifest type.
+        """
+        if not media_type:
+            return self._request_manifest_any_type(method, endpoint)
+
+        kwargs = {"headers": {"Accept": media_type}}
+        response = self._request_quay(method, endpoint, kwargs)
+        # text/plain may be returned for V2S1 by our CDN
+        content_type = response.headers.get("Content-Type", "")
+        if content_type != media_type and "text/plain" not in content_type:
+            raise ManifestTypeError(
+                "Image {0} doesn't have a {1} manifest".format(image, media_type)
+            )
+        return response
+
     def upload_manifest(self, manifest: ManifestList | str, image: str, raw: bool = False) -> None:
         """
         Upload manifest to a specified image.
@@ -196,6 +748,20 @@ class QuayClient(Base):
             }
         self._request_quay("PUT", endpoint, kwargs)
 
+    def get_blob(self, image: str) -> bytes:
+        """
+        Get content of a blob.
+
+        Args:
+            image (str):
+                Blob address in the form <registry>/<repository>@<digest>.
+        Returns (bytes):
+            Content of the blob.
+        """
+        repo, digest = self._parse_and_validate_image_url(image)
+        endpoint = "{0}/blobs/{1}".format(repo, digest)
+        return self._request_quay("GET", endpoint).content
+
     def get_repository_tags(self, repository: str, raw: bool = False) -> str | Dict[str, List[str]]:
         """
         Get tags of a provided repository.
@@ -208,27 +774,62 @@ class QuayClient(Base):
         Returns (list):
             Tags which the repository contains.
         """
-        endpoint = "{0}/tags/list".format(repository)
-        response = self._request_quay("GET", endpoint)
-        tags = response.json()
-
-        while "Link" in response.headers:
-            # next page response has format '</v2/....>; rel="next"'
-            matches = re.findall('</v2/(.+?)>; rel="next"', response.headers["Link"])
-            if len(matches) != 1:
-                raise ValueError(
-                    "Could not extract next page URL from response '{0}'".format(
-                        response.headers["Link"]
-                    )
-                )
-            response = self._request_quay("GET", matches[0])
-            tags["tags"].extend(response.json()["tags"])
+        tags: Dict[str, Any] = {}
+        for page in self._iter_repository_tags_pages(repository):
+            if not tags:
+                tags = page
+            else:
+                tags["tags"].extend(page["tags"])
 
         if raw:
             return json.dumps(tags)
         else:
             return cast(Dict[str, List[str]], tags)
 
+    def iter_repository_tags(self, repository: str) -> Iterator[str]:
+        """
+        Iterate over tags of a provided repository.
+
+        Tags are yielded page by page as the pages are fetched.
+
+        Args:
+            repository (str):
+                Repository whose tags should be gathered (expected format namespce/repo).
+        Returns (iterator):
+            Tags which the repository contains.
+        """
+        for page in self._iter_repository_tags_pages(repository):
+            yield from page["tags"]
+
+    def _iter_repository_tags_pages(self, repository: str) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over pages of tags list of a provided repository.
+
+        Args:
+            repository (str):
+                Repository whose tags should be gathered (expected format namespce/repo).
+        Returns (iterator):
+            Parsed responses of tags list endpoint.
+        """
+        endpoint = "{0}/tags/list".format(repository)
+        response = self._request_quay("GET", endpoint)
+        yield response.json()
+
+        while "Link" in response.headers:
+            response = self._request_quay("GET", self._next_page_endpoint(response.headers))
+            yield response.json()
+
+    @staticmethod
+    def _next_page_endpoint(headers: Any) -> str:
+        """Extract endpoint of the next page from Link header of paginated response."""
+        # next page response has format '</v2/....>; rel="next"'
+        matches = re.findall('</v2/(.+?)>; rel="next"', headers["Link"])
+        if len(matches) != 1:
+            raise ValueError(
+                "Could not extract next page URL from response '{0}'".format(headers["Link"])
+            )
+        return cast(str, matches[0])
+
     def _request_quay(
         self, method: str, endpoint: str, kwargs: dict[Any, Any] = {}
     ) -> requests.Response:
@@ -247,6 +848,13 @@ class QuayClient(Base):
         Raises:
             HTTPError: When the request returned an error status.
         """
+        # Use token obtained for the repository by any thread, if there's one
+        hint = self._token_hint(endpoint)
+        token = self._token_cache.get_by_hint(hint) if hint else None
+        if token and token != getattr(self._thread_local, "token", None):
+            self.session.set_auth_token(token)
+            self._thread_local.token = token
+
         r = self.session.request(method, endpoint, **kwargs)
         # 401 is tolerated as Bearer token might need to be generated
         if r.status_code >= 400 and r.status_code < 600 and r.status_code != 401:
@@ -254,6 +862,8 @@ class QuayClient(Base):
         if r.status_code == 401:
             LOG.debug("Unauthorized request, attempting to authenticate.")
             self._authenticate_quay(r.headers)
+            if hint and "WWW-Authenticate" in r.headers:
+                self._token_cache.set_hint(hint, self._token_key(r.headers))
         else:
             return r
 
@@ -311,32 +921,118 @@ class QuayClient(Base):
                 "Only Bearer is supported."
             )
 
-        # parse header to get a dictionary
-        params = request.parse_keqv_list(
-            request.parse_http_list(headers["WWW-Authenticate"][len("Bearer ") :])  # noqa: E203
-        )
+        params = self._parse_auth_challenge(headers)
         host = params.pop("realm")
-        session = requests.Session()
-        retry = Retry(
-            total=3,
-            read=3,
-            connect=3,
-            backoff_factor=2,
-            status_forcelist=set(range(500, 512)),
+
+        def fetch_token() -> Dict[str, Any]:
+            # Make an authentication request to the specified realm with the provided REST
+            # parameters. Basic username + password authentication is expected.
+            r = self.auth_session.get(
+                host, params=params, auth=(self.username or "", self.password or ""), timeout=11
+            )
+            r.raise_for_status()
+
+            if "token" not in r.json():
+                raise RegistryAuthError("Authentication server response doesn't contain a token.")
+            return cast(Dict[str, Any], r.json())
+
+        token = self._token_cache.get_or_fetch(
+            self._token_key(headers),
+            fetch_token,
+            stale_token=getattr(self._thread_local, "token", None),
+        )
+        self.session.set_auth_token(token)
+        self._thread_local.token = token
+
+    def preauthorize(self, repositories: List[str], batch_size: int = 50) -> None:
+        """
+        Obtain pull tokens for repositories in advance.
+
+        Registry's authentication realm is discovered from the API version check endpoint,
+        then one token with pull scopes of whole batch of repositories is requested per batch.
+        The token is stored for each repository of the batch, so the first request to
+        the repository is sent with it instead of failing with 401.
+
+        Args:
+            repositories (list):
+                Repositories (namespace/repo) to obtain tokens for.
+            batch_size (int):
+                Number of repositories covered by one token.
+        """
+        r = self.session.request("GET", "")
+        if r.status_code != 401 or "Bearer " not in r.headers.get("WWW-Authenticate", ""):
+            LOG.info("Registry doesn't require bearer token, skipping pre-authorization.")
+            return
+        params = self._parse_auth_challenge(r.headers)
+        realm, service = params["realm"], params.get("service", "")
+
+        for batch_start in range(0, len(repositories), batch_size):
+            batch = repositories[batch_start : batch_start + batch_size]  # noqa: E203
+            scopes = ["repository:{0}:pull".format(repo) for repo in batch]
+            r = self.auth_session.get(
+                realm,
+                params={"service": service, "scope": scopes},
+                auth=(self.username or "", self.password or ""),
+                timeout=11,
+            )
+            r.raise_for_status()
+            if "token" not in r.json():
+                raise RegistryAuthError("Authentication server response doesn't contain a token.")
+            for repo, scope in zip(batch, scopes):
+                key = (realm, service, scope, self.username or "")
+                self._token_cache.put(key, r.json()["token"], r.json().get("expires_in"))
+                self._token_cache.set_hint(self._repository_token_hint(repo), key)
+            LOG.info("Pre-authorized %d repositories", len(batch))
+
+    @property
+    def auth_session(self) -> requests.Session:
+        """Create requests session used for authentication requests per thread."""
+        if not hasattr(self._thread_local, "auth_session"):
+            session = requests.Session()
+            retry = Retry(
+                total=3,
+                read=3,
+                connect=3,
+                backoff_factor=2,
+                status_forcelist=set(range(500, 512)),
+            )
+            adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._thread_local.auth_session = session
+        return self._thread_local.auth_session
+
+    @staticmethod
+    def _parse_auth_challenge(
+        headers: dict[Any, Any] | requests.structures.CaseInsensitiveDict[Any],
+    ) -> Dict[str, str]:
+        """Parse parameters of Bearer WWW-Authenticate header into a dictionary."""
+        return request.parse_keqv_list(
+            request.parse_http_list(headers["WWW-Authenticate"][len("Bearer ") :])  # noqa: E203
         )
-        adapter = requests.adapters.HTTPAdapter(max_retries=retry)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        # Make an authentication request to the specified realm with the provided REST parameters.
-        # Basic username + password authentication is expected.
-        r = session.get(
-            host, params=params, auth=(self.username or "", self.password or ""), timeout=11
+
+    def _token_key(
+        self, headers: dict[Any, Any] | requests.structures.CaseInsensitiveDict[Any]
+    ) -> Tuple[str, ...]:
+        """Return token cache key for authentication challenge in the headers."""
+        params = self._parse_auth_challenge(headers)
+        return (
+            params.get("realm", ""),
+            params.get("service", ""),
+            params.get("scope", ""),
+            self.username or "",
         )
-        r.raise_for_status()
 
-        if "token" not in r.json():
-            raise RegistryAuthError("Authentication server response doesn't contain a token.")
-        self.session.set_auth_token(r.json()["token"])
+    def _token_hint(self, endpoint: str) -> Optional[str]:
+        """Return identifier of repository of Docker HTTP API endpoint used to look up token."""
+        match = re.match("(.+?)/(manifests|tags|blobs)/", endpoint)
+        if not match:
+            return None
+        return self._repository_token_hint(match.group(1))
+
+    def _repository_token_hint(self, repository: str) -> str:
+        """Return identifier of repository used to look up cached token."""
+        return "{0}|{1}|{2}".format(self.host, self.username or "", repository)
 
     def _parse_and_validate_image_url(self, image: str) -> tuple[str, str]:
         """
@@ -373,44 +1069,156 @@ class QuayClient(Base):
         Returns (list):
             List of repositories in the namespace.
         """
+        return list(self.iter_quay_repositories(namespace))
+
+    def iter_quay_repositories(self, namespace: str) -> Iterator[Any]:
+        """
+        Iterate over repositories in a namespace.
+
+        Repositories are yielded page by page as the pages are fetched.
+
+        Args:
+            namespace (str):
+                Namespace to get repositories from.
+        Returns (iterator):
+            Repositories in the namespace.
+        """
         next_page = ""
         endpoint = f"repository?namespace={namespace}&next_page={next_page}"
         # kwargs = {"data": {"namespace": namespace}}
         kwargs = {"data": {}}
-        repos = []
         while True:
             response = self._request_quay_oauth("GET", endpoint, token=self.token, kwargs=kwargs)
             ret = response.json()
-            repos.extend(ret["repositories"])
+            yield from ret["repositories"]
             if "next_page" not in ret or not ret["next_page"]:
                 break
             next_page = ret["next_page"]
             endpoint = f"repository?namespace={namespace}&next_page={next_page}"
             # kwargs["data"]["next_page"] = ret["next_page"]
-        return repos
 
-    def get_quay_repository_tags(self, repo):
+    def get_quay_repository_tags(
+        self, repo, limit: Optional[int] = None, window: Optional[int] = None
+    ):
         """
         Get all tags for a repository.
 
         Args:
             repo (str):
                 Repository to get tags from.
+            limit (int):
+                Number of tags per page. tag_page_limit is used if not set.
+            window (int):
+                Number of pages fetched concurrently. tag_page_window is used if not set.
         Returns (list):
             List of tags in the repository.
         """
+        return list(self.iter_quay_repository_tags(repo, limit=limit, window=window))
+
+    def iter_quay_repository_tags(
+        self, repo: str, limit: Optional[int] = None, window: Optional[int] = None
+    ) -> Iterator[Any]:
+        """
+        Iterate over tags of a repository.
+
+        Tags are yielded page by page as the pages are fetched. With window greater than 1,
+        pages are fetched ahead concurrently and yielded in page order.
+
+        Args:
+            repo (str):
+                Repository to get tags from.
+            limit (int):
+                Number of tags per page. tag_page_limit is used if not set.
+            window (int):
+                Number of pages fetched concurrently. tag_page_window is used if not set.
+        Returns (iterator):
+            Tags in the repository.
+        """
+        limit = self.tag_page_limit if limit is None else limit
+        window = self.tag_page_window if window is None else window
+        if window > 1:
+            yield from self._iter_quay_repository_tags_parallel(repo, limit, window)
+            return
         page = 0
         # endpoint = f"repository/{repo}/tag?page={page}"
         # kwargs = {"data": {"page": page}}
         kwargs = {}
-        tags = []
         while True:
-            endpoint = f"repository/{repo}/tag?page={page}"
+            endpoint = self._quay_repository_tags_endpoint(repo, page, limit)
             response = self._request_quay_oauth("GET", endpoint, token=self.token, kwargs=kwargs)
             ret = response.json()
             if not ret["tags"]:
                 break
-            tags.extend(ret["tags"])
+            yield from ret["tags"]
             # kwargs['data']["page"] += 1
             page += 1
-        return tags
+
+    @staticmethod
+    def _quay_repository_tags_endpoint(repo: str, page: int, limit: int) -> str:
+        endpoint = f"repository/{repo}/tag?page={page}"
+        if limit:
+            endpoint += f"&limit={limit}"
+        return endpoint
+
+    def _iter_quay_repository_tags_parallel(
+        self, repo: str, limit: int, window: int
+    ) -> Iterator[Any]:
+        """
+        Iterate over tags of a repository fetching window of pages concurrently.
+
+        Pages are requested speculatively ahead. Once the first empty page (or page
+        marked as the last one) is known, no further pages are requested. Tags are
+        yielded in page order as soon as all preceding pages are fetched.
+
+        Args:
+            repo (str):
+                Repository to get tags from.
+            limit (int):
+                Number of tags per page. Server default is used if 0.
+            window (int):
+                Maximum number of pages fetched at the same time.
+        Returns (iterator):
+            Tags in the repository.
+        """
+
+        def fetch_page(page: int) -> Dict[str, Any]:
+            endpoint = self._quay_repository_tags_endpoint(repo, page, limit)
+            return self._request_quay_oauth("GET", endpoint, token=self.token).json()
+
+        pages: Dict[int, List[Any]] = {}
+        # Number of the first page which doesn't contain tags
+        end: Optional[int] = None
+        next_page = 0
+        next_yielded = 0
+        futures: Dict[Any, int] = {}
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            try:
+                while True:
+                    while end is None and len(futures) < window:
+                        futures[executor.submit(fetch_page, next_page)] = next_page
+                        next_page += 1
+                    while next_yielded in pages and (end is None or next_yielded < end):
+                        yield from pages.pop(next_yielded)
+                        next_yielded += 1
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        page = futures.pop(future)
+                        ret = future.result()
+                        if not ret["tags"]:
+                            page_end = page
+                        else:
+                            pages[page] = ret["tags"]
+                            page_end = page + 1 if ret.get("has_additional") is False else None
+                        if page_end is not None and (end is None or page_end < end):
+                            end = page_end
+                    if end is not None:
+                        for future, page in list(futures.items()):
+                            if page >= end:
+                                future.cancel()
+                                del futures[future]
+            finally:
+                # Iteration may be abandoned, don't fetch pages nobody asks for
+                for future in futures:
+                    future.cancel()
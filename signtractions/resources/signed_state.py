@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Set, Tuple
+
+LOG = logging.getLogger("signtractions.resources.signed_state")
+
+# (manifest_digest, reference, sig_key_id)
+SignatureKey = Tuple[str, str, str]
+
+
+class SignedStateIndex:
+    """
+    Local append-only index of signatures known to exist in a sigstore.
+
+    Index is stored as file with one JSON record per line. State of the index is result
+    of replaying all records in order:
+
+    - ``signature`` record marks signature (digest, reference, signing key) as existing.
+    - ``fetched`` record marks all signatures of the digest were fetched from sigstore at
+      given time, so index holds complete list of signatures of the digest since then.
+    - ``invalidate`` record drops everything known about the digest.
+
+    Records are appended, once the file holds more than ``COMPACT_RATIO`` times as many
+    records as needed to describe the current state (and at least ``COMPACT_MIN_RECORDS``),
+    it's rewritten from the state held in memory on load or after a write.
+    """
+
+    COMPACT_MIN_RECORDS: ClassVar[int] = 1000
+    COMPACT_RATIO: ClassVar[int] = 2
+
+    _instances: ClassVar[Dict[str, "SignedStateIndex"]] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, path: str):
+        """
+        Initialize the index and load records stored in the file.
+
+        Args:
+            path (str):
+                Path of the index file. Created on first write if it doesn't exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Set[Tuple[str, str]]] = {}
+        self._fetched: Dict[str, float] = {}
+        # number of records (lines) in the file
+        self._records = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    self._records += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partially written line of interrupted run
+                        LOG.warning("Skipping malformed record in %s", path)
+                        continue
+                    self._apply(record)
+        with self._lock:
+            self._compact_if_needed()
+            self._mtime = self._file_mtime()
+
+    @classmethod
+    def open(cls, path: str) -> "SignedStateIndex":
+        """
+        Return index for the path shared by all users in the process.
+
+        Index is cached for the process lifetime and loaded again only when the file was
+        modified by someone else (e.g. another process) since the index last loaded or
+        wrote it.
+        """
+        with cls._instances_lock:
+            index = cls._instances.get(path)
+            if index is None or index._modified_externally():
+                index = cls._instances[path] = cls(path)
+            return index
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _modified_externally(self) -> bool:
+        with self._lock:
+            return self._file_mtime() != self._mtime
+
+    def _state_records(self) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        for digest, signatures in self._signatures.items():
+            records += [
+                {"op": "signature", "manifest_digest": digest, "reference": r, "sig_key_id": k}
+                for r, k in sorted(signatures)
+            ]
+        records += [
+            {"op": "fetched", "manifest_digest": digest, "timestamp": timestamp}
+            for digest, timestamp in self._fetched.items()
+        ]
+        return records
+
+    def _compact_if_needed(self) -> None:
+        live = sum(len(signatures) for signatures in self._signatures.values())
+        live += len(self._fetched)
+        if self._records < max(self.COMPACT_MIN_RECORDS, live * self.COMPACT_RATIO):
+            return
+        records = self._state_records()
+        LOG.info("Compacting %s from %d to %d records", self.path, self._records, len(records))
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        os.replace(tmp_path, self.path)
+        self._records = len(records)
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        digest = record["manifest_digest"]
+        if record["op"] == "signature":
+            self._signatures.setdefault(digest, set()).add(
+                (record["reference"], record["sig_key_id"])
+            )
+        elif record["op"] == "fetched":
+            self._fetched[digest] = record["timestamp"]
+        elif record["op"] == "invalidate":
+            self._signatures.pop(digest, None)
+            self._fetched.pop(digest, None)
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            self._records += len(records)
+            for record in records:
+                self._apply(record)
+            self._compact_if_needed()
+            self._mtime = self._file_mtime()
+
+    def complete_digests(self, digests: Iterable[str], max_age: float) -> Set[str]:
+        """
+        Return digests whose signatures were fetched from sigstore recently enough.
+
+        Args:
+            digests (iterable):
+                Digests to check.
+            max_age (float):
+                Maximum age in seconds of the last fetch of the digest.
+        Returns (set):
+            Digests for which the index holds complete list of signatures.
+        """
+        now = time.time()
+        with self._lock:
+            return {
+                digest
+                for digest in digests
+                if digest in self._fetched and now - self._fetched[digest] <= max_age
+            }
+
+    def signatures(self, digests: Iterable[str]) -> Set[SignatureKey]:
+        """
+        Return known signatures of the digests.
+
+        Args:
+            digests (iterable):
+                Digests to get signatures for.
+        Returns (set):
+            (manifest_digest, reference, sig_key_id) tuples.
+        """
+        with self._lock:
+            return {
+                (digest, reference, key)
+                for digest in digests
+                for reference, key in self._signatures.get(digest, ())
+            }
+
+    def add_signatures(self, signatures: Iterable[SignatureKey]) -> None:
+        """
+        Record signatures as existing in sigstore.
+
+        Args:
+            signatures (iterable):
+                (manifest_digest, reference, sig_key_id) tuples.
+        """
+        records = [
+            {"op": "signature", "manifest_digest": d, "reference": r, "sig_key_id": k}
+            for d, r, k in signatures
+        ]
+        if records:
+            self._append(records)
+
+    def add_fetched(
+        self,
+        digests: Iterable[str],
+        signatures: Iterable[SignatureKey],
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """
+        Record result of fetching all signatures of the digests from sigstore.
+
+        Args:
+            digests (iterable):
+                Digests which were fetched.
+            signatures (iterable):
+                Fetched (manifest_digest, reference, sig_key_id) tuples.
+            timestamp (float):
+                Time of the fetch. Current time is used if not set.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        digests = list(digests)
+        # Fetched signatures replace whatever was known about the digests before
+        records: List[Dict[str, Any]] = [
+            {"op": "invalidate", "manifest_digest": digest} for digest in digests
+        ]
+        records += [
+            {"op": "signature", "manifest_digest": d, "reference": r, "sig_key_id": k}
+            for d, r, k in signatures
+        ]
+        records += [
+            {"op": "fetched", "manifest_digest": digest, "timestamp": timestamp}
+            for digest in digests
+        ]
+        if records:
+            self._append(records)
+
+    def invalidate(self, digests: Iterable[str]) -> None:
+        """
+        Forget everything known about the digests.
+
+        Args:
+            digests (iterable):
+                Digests to forget.
+        """
+        records = [{"op": "invalidate", "manifest_digest": digest} for digest in digests]
+        if records:
+            self._append(records)
@@ -1,22 +1,32 @@
 import abc
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
 import dataclasses
+import functools
 import logging
-import importlib
 import tempfile
+import time
 import json
 
-from typing import Optional, List, Dict, Any, Tuple, Generator, Literal
+from typing import Optional, List, Dict, Any, Tuple, Generator, Literal, Callable
 
 from pytractions.base import Base
 from pytractions.utils import doc
 
 from .utils.misc import (
+    ENTRY_POINTS,
+    capture_stdout,
+    load_entry_point,
+    shutdown_entry_point_process_pool,
     run_entrypoint,
+    run_entrypoint_isolated,
+    setup_entry_point_cli,
 )
+from .pyxis_client import PyxisSignatureClient, get_pyxis_signature_client
+from .chunking import LatencyStats, signer_latency
+from .signed_state import SignedStateIndex
 from ..models.signing import SignEntry
 
-
 LOG = logging.getLogger("signing_wrapper")
 
 
@@ -29,7 +39,9 @@ class SigningError(Exception):
 class SignerWrapperSettings(Base):
     """Signer wrapper settings."""
 
-    pass
+    max_chunk_size: Optional[int] = None
+
+    d_max_chunk_size: str = doc("Maximum number of entries signed in one request.")
 
 
 class SignerWrapper(Base):
@@ -38,23 +50,55 @@ class SignerWrapper(Base):
     label: str = dataclasses.field(default="unused", init=False)
     pre_push: bool = dataclasses.field(default=False, init=False)
     _entry_point_conf = ["signer", "group", "signer"]
+    _entry_point_groups = ["modules"]
     config_file: Optional[str] = "/etc/pubtools-sign/config.json"
+    entry_points_file: Optional[str] = None
     settings: SignerWrapperSettings
     _ep: Optional[Any] = None
 
     d_config_file: str = doc("Path to pubtools-sign config file.")
+    d_entry_points_file: str = doc(
+        "Path to entry_points.txt file pre-populating entry point registry. Installed"
+        + " distributions aren't scanned for entry point groups listed in the file."
+    )
+
+    def __post_init__(self, *args, **kwargs):
+        """Pre-populate entry point registry from entry points file."""
+        if self.entry_points_file:
+            ENTRY_POINTS.load_file(self.entry_points_file)
+
+    def close(self) -> None:
+        """Shut down entrypoint worker processes started by the signer."""
+        shutdown_entry_point_process_pool()
 
     @property
     def entry_point(self) -> Any:
         """Load and return entry point for pubtools-sign project."""
         if self._ep is None:
-            self._ep = list(
-                importlib.metadata.entry_points(
-                    group=self._entry_point_conf[1], name=self._entry_point_conf[2]
-                )
-            )[0].load()
+            conf = self._entry_point_conf
+            self._warm_entry_points()
+            self._ep = load_entry_point((conf[0], conf[1], conf[2]))
         return self._ep
 
+    def _warm_entry_points(self) -> None:
+        """Register entry points of all groups the wrapper runs with one lookup per group."""
+        ENTRY_POINTS.warm(self._entry_point_groups)
+
+    @property
+    def max_chunk_size(self) -> Optional[int]:
+        """Return maximum number of entries signed in one request declared in settings."""
+        return self.settings.max_chunk_size
+
+    @property
+    def sign_latency(self) -> LatencyStats:
+        """Return per-entry signing latency measured in the process."""
+        return signer_latency(self.label, "sign")
+
+    @property
+    def store_latency(self) -> LatencyStats:
+        """Return per-entry latency of storing signatures measured in the process."""
+        return signer_latency(self.label, "store")
+
     def remove_signatures(
         self,
         signatures: List[Tuple[str, str, str]],
@@ -89,7 +133,12 @@ class SignerWrapper(Base):
             signatures (dict): Signatures to store.
         """
         LOG.debug("Storing signatures %s", signatures)
+        start = time.monotonic()
         self._run_store_signed(signatures)
+        if isinstance(signatures, dict) and "operation" in signatures:
+            self.store_latency.record(
+                len(signatures["operation"]["references"]), time.monotonic() - start
+            )
 
     def sign_container_opt_args(
         self, sign_entry: SignEntry, task_id: Optional[str] = None
@@ -118,11 +167,87 @@ class SignerWrapper(Base):
         return to_sign_entries  # pragma: no cover
 
     def _sign_entries(self, sign_entries, task_id: Optional[str] = None):
+        """Sign entries with their signing keys.
+
+        Entries are partitioned by signing key and each partition is signed with separate
+        signer call. Partitions are signed concurrently and their results are merged.
+
+        Args:
+            sign_entries (List[SignEntry]): Entries to sign.
+            task_id (str): Task ID to identify the signing task if needed.
+        Returns:
+            dict: Signer result. Merged result of multiple signing keys holds signing key
+                of each reference in signing_keys field.
+        """
         if not sign_entries:
             return {}
+        by_key: Dict[str, List[SignEntry]] = {}
+        for sign_entry in sign_entries:
+            by_key.setdefault(sign_entry.signing_key, []).append(sign_entry)
+        if len(by_key) == 1:
+            return self._sign_entries_with_key(sign_entries, task_id)
+
+        LOG.info("Signing entries with %d signing keys", len(by_key))
+        with ThreadPoolExecutor(max_workers=len(by_key)) as executor:
+            results = list(
+                executor.map(
+                    lambda entries: self._sign_entries_with_key(entries, task_id),
+                    by_key.values(),
+                )
+            )
+        return self._merge_signed(results)
+
+    @staticmethod
+    def _merge_signed(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge signer results of multiple signing keys into one result.
+
+        Lists in operation and operation results are concatenated. Signing key of each
+        reference is in signing_keys list, scalar signing key is set only when all results
+        were signed with the same key.
+
+        Args:
+            results (List[Dict[str, Any]]): Signer results to merge.
+        Returns:
+            dict: Merged signer result.
+        """
+        signing_keys = {result.get("signing_key") for result in results}
+        merged: Dict[str, Any] = {
+            "signer_result": results[0]["signer_result"],
+            "operation": {},
+            "operation_results": [],
+            "signing_key": next(iter(signing_keys)) if len(signing_keys) == 1 else None,
+            "signing_keys": [],
+        }
+        for result in results:
+            operation = result.get("operation", {})
+            for key, value in operation.items():
+                if isinstance(value, list):
+                    merged["operation"].setdefault(key, []).extend(value)
+                else:
+                    merged["operation"].setdefault(key, value)
+            merged["operation_results"].extend(result.get("operation_results", []))
+            merged["signing_keys"].extend(
+                [result.get("signing_key")] * len(operation.get("references", []))
+            )
+        if len(signing_keys) != 1:
+            merged["operation"].pop("signing_key", None)
+        return merged
+
+    def _sign_entries_with_key(
+        self, sign_entries: List[SignEntry], task_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Sign entries sharing signing key with one signer call.
+
+        Args:
+            sign_entries (List[SignEntry]): Entries to sign.
+            task_id (str): Task ID to identify the signing task if needed.
+        Returns:
+            dict: Signer result.
+        """
         sign_entry = sign_entries[0]
         opt_args = self.sign_container_opt_args(sign_entry, task_id)
 
+        start = time.monotonic()
         signed = self.entry_point(
             config_file=self.config_file,
             signing_key=sign_entry.signing_key,
@@ -132,6 +257,7 @@ class SignerWrapper(Base):
         )
         if signed["signer_result"]["status"] != "ok":
             raise SigningError(signed["signer_result"]["error_message"])
+        self.sign_latency.record(len(sign_entries), time.monotonic() - start)
         return signed
 
     def sign_containers(
@@ -191,12 +317,54 @@ class MsgSignerSettings(Base):
     pyxis_ssl_key_file: Optional[str]
     pyxis_ca_file: Optional[str]
     num_thread_pyxis: int = 7
+    signed_state_index_file: Optional[str] = None
+    signed_state_reconcile_interval: int = 86400
+    pyxis_search_threads: int = 1
+    max_manifest_digests_per_search_request: Optional[int] = None
+    pyxis_direct: bool = False
+    entry_point_processes: int = 0
+    max_chunk_size: Optional[int] = None
 
     d_pyxis_server: str = doc("Pyxis server URL.")
     d_pyxis_ssl_crt_file: str = doc("Pyxis SSL client certificate file.")
     d_pyxis_ssl_key_file: str = doc("Pyxis SSL client key file.")
     d_pyxis_ssl_ca_file: str = doc("Pyxis SSL Certificate Authority file.")
     d_num_thread_pyxis: str = doc("Number of threads to use for Pyxis requests.")
+    d_signed_state_index_file: str = doc(
+        "Path to local index of signatures stored in Pyxis. Signatures of digests found "
+        + "in the index aren't fetched from Pyxis. Index isn't used if not set."
+    )
+    d_signed_state_reconcile_interval: str = doc(
+        "Number of seconds after which signatures of a digest are fetched from Pyxis again "
+        + "even if they are in the signed state index."
+    )
+    d_pyxis_search_threads: str = doc(
+        "Number of chunks of manifest digests searched for signatures in Pyxis concurrently."
+    )
+    d_max_manifest_digests_per_search_request: str = doc(
+        "Maximum number of manifest digests searched for signatures in one Pyxis request. "
+        + "MsgSignerWrapper.MAX_MANIFEST_DIGESTS_PER_SEARCH_REQUEST is used if not set."
+    )
+    d_pyxis_direct: str = doc(
+        "Call Pyxis signatures API directly in the process instead of running "
+        + "pubtools-pyxis entrypoints."
+    )
+    d_entry_point_processes: str = doc(
+        "Number of worker processes running pubtools-pyxis entrypoints. Each entrypoint "
+        + "gets its own environment and output in the worker, so concurrent calls don't "
+        + "interfere. Entrypoints run in this process if set to 0."
+    )
+    d_max_chunk_size: str = doc("Maximum number of entries signed in one request.")
+
+    def pyxis_client(self) -> PyxisSignatureClient:
+        """Return Pyxis client for the settings shared by all users in the process."""
+        return get_pyxis_signature_client(
+            self.pyxis_server,
+            cert_file=self.pyxis_ssl_crt_file,
+            key_file=self.pyxis_ssl_key_file,
+            ca_file=self.pyxis_ca_file,
+            pool_size=int(max(self.num_thread_pyxis, self.pyxis_search_threads, 1)),
+        )
 
 
 class MsgSignerWrapper(SignerWrapper):
@@ -207,11 +375,33 @@ class MsgSignerWrapper(SignerWrapper):
     settings: MsgSignerSettings
 
     _entry_point_conf = ["pubtools-sign", "modules", "pubtools-sign-msg-container-sign"]
+    _entry_point_groups = ["modules", "mod"]
     MAX_MANIFEST_DIGESTS_PER_SEARCH_REQUEST: int = 50
 
+    @property
+    def signed_state_index(self) -> Optional[SignedStateIndex]:
+        """Return signed state index if configured in settings."""
+        if not self.settings.signed_state_index_file:
+            return None
+        return SignedStateIndex.open(self.settings.signed_state_index_file)
+
     def _filter_to_sign(self, to_sign_entries: List[SignEntry]) -> List[SignEntry]:
-        to_sign_digests = [x.digest for x in to_sign_entries]
-        existing_signatures = [esig for esig in self._fetch_signatures(to_sign_digests)]
+        # Entries of the same manifest share digest, look up each digest only once
+        to_sign_digests = list(dict.fromkeys(x.digest for x in to_sign_entries))
+        index = self.signed_state_index
+        if index:
+            known_digests = index.complete_digests(
+                to_sign_digests, self.settings.signed_state_reconcile_interval
+            )
+            fetch_digests = [x for x in to_sign_digests if x not in known_digests]
+            LOG.info(
+                "Signatures of %d digests found in signed state index, fetching %d",
+                len(known_digests),
+                len(fetch_digests),
+            )
+        else:
+            fetch_digests = to_sign_digests
+        existing_signatures = [esig for esig in self._fetch_signatures(fetch_digests)]
         try:
             LOG.info("Existing signatures: %d", len(existing_signatures))
         except Exception as e:  # noqa: F841
@@ -219,6 +409,9 @@ class MsgSignerWrapper(SignerWrapper):
         existing_signatures_drk = {
             (x["manifest_digest"], x["reference"], x["sig_key_id"]) for x in existing_signatures
         }
+        if index:
+            index.add_fetched(fetch_digests, existing_signatures_drk)
+            existing_signatures_drk |= index.signatures(known_digests)
         ret = []
         for tse in to_sign_entries:
             if (
@@ -259,45 +452,127 @@ class MsgSignerWrapper(SignerWrapper):
             signature_file.flush()
             yield signature_file
 
+    def _entrypoint_runner(self) -> Callable[..., Any]:
+        """Return function running pubtools-pyxis entrypoints as configured in settings."""
+        self._warm_entry_points()
+        if self.settings.entry_point_processes:
+            return functools.partial(
+                run_entrypoint_isolated, max_workers=self.settings.entry_point_processes
+            )
+        return run_entrypoint
+
+    def _search_chunk_size(self, digests_count: int) -> int:
+        """Return number of digests searched in one request.
+
+        Chunks are made smaller than the maximum if there wouldn't be enough of them
+        to keep all search threads busy.
+
+        Args:
+            digests_count (int): Number of digests to search.
+        Returns:
+            int: Number of digests per chunk.
+        """
+        max_chunk_size = (
+            self.settings.max_manifest_digests_per_search_request
+            or self.MAX_MANIFEST_DIGESTS_PER_SEARCH_REQUEST
+        )
+        threads = max(self.settings.pyxis_search_threads, 1)
+        return max(min(max_chunk_size, -(-digests_count // threads)), 1)
+
     def _fetch_signatures(
         self, manifest_digests: List[str]
     ) -> Generator[dict[str, Any], None, None]:
         """Fetch signatures from sigstore.
 
+        With more than one search thread configured, chunks are searched concurrently.
+        With pyxis_direct or entry_point_processes set, signatures are yielded as the chunks
+        complete. Otherwise the entry point is set up in this process and all chunks are
+        fetched before the first signature is yielded.
+
         Args:
             manifest_digests (list): Manifest digests to fetch signatures for.
         Returns:
             List[Dict[str, Any]]: List of fetched signatures.
         """
-        cert, key = self.settings.pyxis_ssl_crt_file, self.settings.pyxis_ssl_key_file
-        chunk_size = self.MAX_MANIFEST_DIGESTS_PER_SEARCH_REQUEST
         manifest_digests = [x for x in sorted(list(set(manifest_digests))) if x]
+        chunk_size = self._search_chunk_size(len(manifest_digests))
+        chunks = [
+            manifest_digests[chunk_start : chunk_start + chunk_size]  # noqa: E203
+            for chunk_start in range(0, len(manifest_digests), chunk_size)
+        ]
+
+        if self.settings.pyxis_search_threads <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield from self._fetch_signatures_chunk(chunk)
+            return
+
+        if self.settings.pyxis_direct or self.settings.entry_point_processes:
+            with ThreadPoolExecutor(max_workers=self.settings.pyxis_search_threads) as executor:
+                futures = [executor.submit(self._fetch_signatures_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    yield from future.result()
+            return
 
-        for chunk_start in range(0, len(manifest_digests), chunk_size):
-            chunk = manifest_digests[chunk_start : chunk_start + chunk_size]  # noqa: E203
+        env_vars: dict[Any, Any] = {"REQUESTS_CA_BUNDLE": self.settings.pyxis_ca_file}
+        self._warm_entry_points()
+        # Entry point setup swaps process wide environment, so it's done only once
+        # for all the workers instead of for each chunk.
+        with setup_entry_point_cli(
+            ("pubtools-pyxis", "mod", "pubtools-pyxis-get-signatures"),
+            "pubtools-pyxis-get-signatures",
+            [],
+            env_vars,
+        ) as entry_func:
+            with ThreadPoolExecutor(max_workers=self.settings.pyxis_search_threads) as executor:
+                futures = [
+                    executor.submit(self._fetch_signatures_chunk, chunk, entry_func)
+                    for chunk in chunks
+                ]
+                results = [future.result() for future in as_completed(futures)]
+        # Signatures are yielded only after the entry point environment is restored,
+        # so the caller doesn't run with it while consuming them.
+        for result in results:
+            yield from result
+
+    def _fetch_signatures_chunk(
+        self, chunk: List[str], entry_func: Optional[Callable[[List[str]], Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch signatures of a chunk of manifest digests from sigstore.
 
-            args = ["--pyxis-server", self.settings.pyxis_server]
-            args += ["--pyxis-ssl-crtfile", cert]
-            args += ["--pyxis-ssl-keyfile", key]
+        Args:
+            chunk (list): Manifest digests to fetch signatures for.
+            entry_func (callable): Already set up entry point to call. Entry point is run
+                with run_entrypoint if not set.
+        Returns:
+            List[Dict[str, Any]]: List of fetched signatures.
+        """
+        if self.settings.pyxis_direct:
+            return self.settings.pyxis_client().get_signatures(chunk)
 
-            with tempfile.NamedTemporaryFile(
-                mode="w", prefix="pubtools_quay_get_signatures_"
-            ) as signature_fetch_file:
-                if manifest_digests:
-                    json.dump(chunk, signature_fetch_file)
-                    signature_fetch_file.flush()
-                    args += ["--manifest-digest", "@{0}".format(signature_fetch_file.name)]
+        cert, key = self.settings.pyxis_ssl_crt_file, self.settings.pyxis_ssl_key_file
+        args = ["--pyxis-server", self.settings.pyxis_server]
+        args += ["--pyxis-ssl-crtfile", cert]
+        args += ["--pyxis-ssl-keyfile", key]
 
-                env_vars: dict[Any, Any] = {"REQUESTS_CA_BUNDLE": self.settings.pyxis_ca_file}
-                chunk_results = run_entrypoint(
+        with tempfile.NamedTemporaryFile(
+            mode="w", prefix="pubtools_quay_get_signatures_"
+        ) as signature_fetch_file:
+            json.dump(chunk, signature_fetch_file)
+            signature_fetch_file.flush()
+            args += ["--manifest-digest", "@{0}".format(signature_fetch_file.name)]
+
+            if entry_func:
+                with capture_stdout():
+                    return list(entry_func(["pubtools-pyxis-get-signatures"] + args))
+            env_vars: dict[Any, Any] = {"REQUESTS_CA_BUNDLE": self.settings.pyxis_ca_file}
+            return list(
+                self._entrypoint_runner()(
                     ("pubtools-pyxis", "mod", "pubtools-pyxis-get-signatures"),
                     "pubtools-pyxis-get-signatures",
                     args,
                     env_vars,
                 )
-
-            for result in chunk_results:
-                yield result
+            )
 
     def _run_store_signed(self, signed_results: Dict[str, Any]) -> None:
         """
@@ -326,15 +601,19 @@ class MsgSignerWrapper(SignerWrapper):
         )
 
         signatures: List[Dict[str, Any]] = []
-        for reference, op_res in zip(
-            signed_results["operation"]["references"], signed_results["operation_results"]
+        references = signed_results["operation"]["references"]
+        signing_keys = signed_results.get("signing_keys") or [signed_results["signing_key"]] * len(
+            references
+        )
+        for reference, op_res, signing_key in zip(
+            references, signed_results["operation_results"], signing_keys
         ):
             signatures.append(
                 {
                     "manifest_digest": op_res[0]["msg"]["manifest_digest"],
                     "reference": reference,
                     "repository": op_res[0]["msg"]["repo"],
-                    "sig_key_id": signed_results["signing_key"],
+                    "sig_key_id": signing_key,
                     "signature_data": op_res[0]["msg"]["signed_claim"],
                 }
             )
@@ -347,6 +626,24 @@ class MsgSignerWrapper(SignerWrapper):
                 f"Key: {sig['sig_key_id']}"
             )
 
+        if self.settings.pyxis_direct:
+            LOG.info("Uploading {0} new signatures".format(len(signatures)))
+            self.settings.pyxis_client().upload_signatures(
+                signatures, threads=self.settings.num_thread_pyxis or 7
+            )
+        else:
+            self._run_store_signed_entrypoint(signatures)
+        if self.signed_state_index:
+            self.signed_state_index.add_signatures(
+                (sig["manifest_digest"], sig["reference"], sig["sig_key_id"]) for sig in signatures
+            )
+
+    def _run_store_signed_entrypoint(self, signatures: List[Dict[str, Any]]) -> None:
+        """Upload signatures to Pyxis with pubtools-pyxis-upload-signatures entrypoint.
+
+        Args:
+            signatures (List[Dict[str, Any]]): Signatures to upload.
+        """
         cert, key = self.settings.pyxis_ssl_crt_file, self.settings.pyxis_ssl_key_file
 
         args = ["--pyxis-server", self.settings.pyxis_server]
@@ -361,7 +658,7 @@ class MsgSignerWrapper(SignerWrapper):
 
             args += ["--signatures", "@{0}".format(signature_file.name)]
             LOG.info("Uploading {0} new signatures".format(len(signatures)))
-            run_entrypoint(
+            self._entrypoint_runner()(
                 ("pubtools-pyxis", "console_scripts", "pubtools-pyxis-upload-signatures"),
                 "pubtools-pyxis-upload-signature",
                 args,
@@ -374,6 +671,12 @@ class MsgSignerWrapper(SignerWrapper):
         Args:
             signatures_to_remove (List[str]): List of signatures to remove.
         """
+        if self.settings.pyxis_direct:
+            self.settings.pyxis_client().delete_signatures(
+                signatures_to_remove, threads=self.settings.num_thread_pyxis or 7
+            )
+            return
+
         cert, key = self.settings.pyxis_ssl_crt_file, self.settings.pyxis_ssl_key_file
         args = []
         args = ["--pyxis-server", self.settings.pyxis_server]
@@ -401,6 +704,9 @@ class MsgSignerWrapper(SignerWrapper):
         """
         exclude = _exclude or []
         signatures_to_remove = list(self._fetch_signatures([x[0] for x in signatures]))
+        if self.signed_state_index:
+            # Signatures of the digests are about to change
+            self.signed_state_index.invalidate({x[0] for x in signatures})
         sig_ids_to_remove = []
         for existing_signature in signatures_to_remove:
             if (
@@ -442,6 +748,10 @@ class MsgSignerWrapper(SignerWrapper):
 class CosignSignerSettings(Base):
     """Validation schema for cosign signer settings."""
 
+    max_chunk_size: Optional[int] = None
+
+    d_max_chunk_size: str = doc("Maximum number of entries signed in one request.")
+
 
 class CosignSignerWrapper(SignerWrapper):
     """Wrapper for cosign signer functionality."""
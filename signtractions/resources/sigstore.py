@@ -1,9 +1,13 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 import requests
-import subprocess
+import threading
+from typing import List, Optional
 
 from pytractions.base import Base
+from pytractions.utils import doc
 
+from .gpg import BatchDecryptor, DecryptionFailed, decrypt
 from ..models.signing import LegacySignature
 
 
@@ -17,26 +21,127 @@ class Sigstore(Base):
     """Container reference constructor."""
 
     base_url: str = ""
+    pool_size: int = 10
+    timeout: int = 60
+    gpg_batch_size: int = 0
+
+    d_base_url: str = doc("URL of the legacy sigstore.")
+    d_pool_size: str = doc(
+        "Maximum number of connections to the sigstore and of gpg processes running at once."
+    )
+    d_timeout: str = doc("Timeout of sigstore requests in seconds.")
+    d_gpg_batch_size: str = doc(
+        "Maximum number of signatures decrypted by one gpg process. Signatures fetched by all"
+        + " threads are batched together. 0 runs gpg for each signature."
+    )
+
+    def __post_init__(self, *args, **kwargs):
+        """Post init for sigstore client."""
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._decryptor: Optional[BatchDecryptor] = None
+
+    @property
+    def session(self) -> requests.Session:
+        """Session shared by all threads, so connections to the sigstore are reused."""
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=max(int(self.pool_size), 1)
+                )
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Executor decrypting signatures, it limits number of running gpg processes."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(int(self.pool_size), 1))
+            return self._executor
+
+    @property
+    def decryptor(self) -> BatchDecryptor:
+        """Decryptor batching signatures of all threads into shared gpg processes."""
+        with self._lock:
+            if self._decryptor is None:
+                self._decryptor = BatchDecryptor(
+                    batch_size=int(self.gpg_batch_size), workers=max(int(self.pool_size), 1)
+                )
+            return self._decryptor
+
+    def close(self) -> None:
+        """
+        Close connections to the sigstore and stop decryption threads.
+
+        Sigstore can be used again after it's closed, they are started again when needed.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+            executor, self._executor = self._executor, None
+            decryptor, self._decryptor = self._decryptor, None
+        if decryptor is not None:
+            decryptor.close()
+        if executor is not None:
+            executor.shutdown()
+        if session is not None:
+            session.close()
+
+    def _submit_decryption(self, content: bytes) -> Future:
+        if self.gpg_batch_size:
+            return self.decryptor.submit(content)
+        return self.executor.submit(decrypt, content)
+
+    def _fetch_signature(self, url: str) -> Optional[bytes]:
+        ret = self.session.get(url, timeout=self.timeout)
+        if ret.status_code == 404:
+            return None
+        if ret.status_code != 200:
+            ret.raise_for_status()
+        return ret.content
 
     def get_signatures(self, image, digest):
-        """Get signatures for an image and digest."""
+        """
+        Get signatures for an image and digest.
+
+        Signature N is decrypted while signature N+1 is fetched. With gpg batch size set,
+        signatures are decrypted in batches shared with other threads.
+
+        Args:
+            image (str):
+                Image repository.
+            digest (str):
+                Manifest digest.
+        Returns (list):
+            Decrypted signatures.
+        Raises:
+            VerificationError:
+                If any of the signatures can't be decrypted.
+        """
         digest = digest.replace("sha256:", "")
         i = 1
+        decrypted: List[Future] = []
+        try:
+            while True:
+                content = self._fetch_signature(
+                    f"{self.base_url}{image}@sha256={digest}/signature-{i}"
+                )
+                if content is None:
+                    break
+                decrypted.append(self._submit_decryption(content))
+                i += 1
+        except Exception:
+            for future in decrypted:
+                future.cancel()
+            raise
         signatures = []
-        while True:
-            ret = requests.get(f"{self.base_url}{image}@sha256={digest}/signature-{i}", timeout=60)
-            if ret.status_code == 404:
-                break
-            if ret.status_code != 200:
-                ret.raise_for_status()
-            p = subprocess.Popen(
-                ["gpg", "-d"], stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE
-            )
-            print("RC", p.returncode)
-            stdout, stderr = p.communicate(ret.content)
-            if p.returncode != 0:
-                raise VerificationError(f"Error verifying {image} {digest}", stdout, stderr)
-
+        for future in decrypted:
+            try:
+                stdout = future.result()
+            except DecryptionFailed as e:
+                raise VerificationError(f"Error verifying {image} {digest}", e.stdout, e.stderr)
             signatures.append(LegacySignature.content_from_json(json.loads(stdout)))
-            i += 1
         return signatures
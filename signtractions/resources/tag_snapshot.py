@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from typing import Iterable, List, Tuple
+
+LOG = logging.getLogger("signtractions.resources.tag_snapshot")
+
+# (tag, manifest_digest, last_modified)
+TagRecord = Tuple[str, str, str]
+
+
+class TagSnapshotIndex:
+    """
+    Persistent index of repository tags seen by previous runs.
+
+    Tags observed during a run are staged first and become part of the snapshot only
+    when they are committed, so tags of a failed run are reported as changed again
+    by the next run.
+
+    Tags are recorded per fingerprint of the run's inputs (signing keys and identities),
+    so a run with another key or identities doesn't skip tags seen only by other runs.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tags (
+        repo TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        manifest_digest TEXT NOT NULL,
+        last_modified TEXT NOT NULL,
+        PRIMARY KEY (repo, fingerprint, tag)
+    );
+    CREATE TABLE IF NOT EXISTS staged_tags (
+        repo TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        manifest_digest TEXT NOT NULL,
+        last_modified TEXT NOT NULL,
+        PRIMARY KEY (repo, fingerprint, tag)
+    );
+    """
+    _COLUMNS = "repo, fingerprint, tag, manifest_digest, last_modified"
+
+    def __init__(self, path: str, timeout: float = 60):
+        """
+        Initialize the index.
+
+        Args:
+            path (str):
+                Path of SQLite database file. Created if it doesn't exist.
+            timeout (float):
+                Seconds to wait for lock held by another writer.
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tags)")]
+        if columns and "fingerprint" not in columns:
+            LOG.warning("Tag snapshot %s doesn't record fingerprints, discarding it", path)
+            with self._conn:
+                self._conn.execute("DROP TABLE tags")
+                self._conn.execute("DROP TABLE IF EXISTS staged_tags")
+        self._conn.executescript(self._SCHEMA)
+
+    @staticmethod
+    def fingerprint(signing_keys: Iterable[str], identities: Iterable[str]) -> str:
+        """
+        Return fingerprint of inputs which the tags are processed with.
+
+        Args:
+            signing_keys (iterable):
+                Signing keys used for the tags.
+            identities (iterable):
+                Identities used for the tags.
+        Returns (str):
+            Hex digest independent of order of the keys and identities.
+        """
+        data = json.dumps([sorted(set(signing_keys)), sorted(set(identities))])
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def __enter__(self) -> "TagSnapshotIndex":
+        """Return the index itself."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close the index."""
+        self.close()
+
+    def changed_tags(
+        self, repo: str, tags: Iterable[TagRecord], fingerprint: str = ""
+    ) -> List[TagRecord]:
+        """
+        Filter tags which are new or point to other digest than in the snapshot.
+
+        Args:
+            repo (str):
+                Repository the tags belong to.
+            tags (iterable):
+                Current (tag, manifest_digest, last_modified) records of the repository.
+            fingerprint (str):
+                Fingerprint of the run's inputs, see fingerprint().
+        Returns (list):
+            Records of tags which are not in the snapshot of the fingerprint
+            or whose digest changed.
+        """
+        snapshot = dict(
+            self._conn.execute(
+                "SELECT tag, manifest_digest FROM tags WHERE repo = ? AND fingerprint = ?",
+                (repo, fingerprint),
+            )
+        )
+        return [record for record in tags if snapshot.get(record[0]) != record[1]]
+
+    def stage(self, repo: str, tags: Iterable[TagRecord], fingerprint: str = "") -> None:
+        """
+        Stage current tags of a repository replacing previously staged ones.
+
+        Args:
+            repo (str):
+                Repository the tags belong to.
+            tags (iterable):
+                Current (tag, manifest_digest, last_modified) records of the repository.
+            fingerprint (str):
+                Fingerprint of the run's inputs, see fingerprint().
+        """
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM staged_tags WHERE repo = ? AND fingerprint = ?", (repo, fingerprint)
+            )
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO staged_tags ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                [(repo, fingerprint) + tuple(record) for record in tags],
+            )
+
+    def commit(self, repos: Iterable[str]) -> None:
+        """
+        Replace snapshot of repositories with their staged tags.
+
+        Repositories without staged tags are left untouched.
+
+        Args:
+            repos (iterable):
+                Repositories to commit.
+        """
+        with self._conn:
+            for repo in repos:
+                staged = self._conn.execute(
+                    "SELECT fingerprint, COUNT(*) FROM staged_tags WHERE repo = ?"
+                    + " GROUP BY fingerprint",
+                    (repo,),
+                ).fetchall()
+                for fingerprint, count in staged:
+                    self._conn.execute(
+                        "DELETE FROM tags WHERE repo = ? AND fingerprint = ?", (repo, fingerprint)
+                    )
+                    self._conn.execute(
+                        f"INSERT INTO tags ({self._COLUMNS}) SELECT {self._COLUMNS}"
+                        + " FROM staged_tags WHERE repo = ? AND fingerprint = ?",
+                        (repo, fingerprint),
+                    )
+                    LOG.info("Committed %d tags of %s to snapshot", count, repo)
+                self._conn.execute("DELETE FROM staged_tags WHERE repo = ?", (repo,))
@@ -1,15 +1,20 @@
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+import configparser
 import contextlib
 import functools
 from dataclasses import dataclass, field
 from io import StringIO
 import logging
+import multiprocessing
 import os
 
 # import pkg_resources
 import importlib
 import importlib.metadata
 import textwrap
-from typing import Iterable, Any, Dict, Generator, Tuple, Optional, List, Callable
+import threading
+from typing import Iterable, Any, Dict, Generator, Tuple, Optional, List, Callable, Set
 import sys
 
 LOG = logging.getLogger("pubtools.quay")
@@ -32,16 +37,234 @@ class FData:
     kwargs: Dict[str, Any] = field(default_factory=dict)
 
 
+class EntryPointRegistry:
+    """
+    Process wide registry of resolved entry points.
+
+    Looking up an entry point with importlib.metadata scans metadata of all installed
+    distributions, so entry points are resolved and loaded only once and then served
+    from the registry. Registry can be warmed up front from installed distributions
+    or from entry_points.txt file.
+    """
+
+    def __init__(self):
+        """Initialize empty registry."""
+        self._lock = threading.Lock()
+        self._entry_points: Dict[Tuple[str, str], importlib.metadata.EntryPoint] = {}
+        self._loaded: Dict[Tuple[str, str], Any] = {}
+        self._warmed: Set[str] = set()
+        self._files: Set[str] = set()
+
+    def clear(self) -> None:
+        """Forget all registered and loaded entry points."""
+        with self._lock:
+            self._entry_points.clear()
+            self._loaded.clear()
+            self._warmed.clear()
+            self._files.clear()
+
+    def is_registered(self, group: str, name: str) -> bool:
+        """
+        Return True if the entry point is registered.
+
+        Args:
+            group (str):
+                Entry point group.
+            name (str):
+                Entry point name.
+        Returns (bool):
+            Whether the entry point definition is known to the registry.
+        """
+        with self._lock:
+            return (group, name) in self._entry_points
+
+    def is_loaded(self, group: str, name: str) -> bool:
+        """
+        Return True if the entry point is loaded.
+
+        Args:
+            group (str):
+                Entry point group.
+            name (str):
+                Entry point name.
+        Returns (bool):
+            Whether the object the entry point refers to is loaded.
+        """
+        with self._lock:
+            return (group, name) in self._loaded
+
+    def register(self, group: str, name: str, value: str) -> None:
+        """
+        Register entry point without loading it.
+
+        Args:
+            group (str):
+                Entry point group.
+            name (str):
+                Entry point name.
+            value (str):
+                Entry point object reference in module:attr form.
+        """
+        with self._lock:
+            self._entry_points[(group, name)] = importlib.metadata.EntryPoint(
+                name=name, value=value, group=group
+            )
+
+    def warm(self, groups: Iterable[str]) -> None:
+        """
+        Register all installed entry points of the groups.
+
+        Metadata of installed distributions is scanned only once for each group,
+        groups which were already warmed are skipped.
+
+        Args:
+            groups ([str]):
+                Entry point groups to register.
+        """
+        for group in groups:
+            with self._lock:
+                if group in self._warmed:
+                    continue
+                self._warmed.add(group)
+            for ep in importlib.metadata.entry_points(group=group):
+                self.register(group, ep.name, ep.value)
+
+    def load_file(self, path: str) -> None:
+        """
+        Register entry points listed in entry_points.txt file.
+
+        Groups listed in the file are considered warmed, so installed distributions
+        aren't scanned for them. Each file is read only once.
+
+        Args:
+            path (str):
+                Path to entry_points.txt file.
+        """
+        with self._lock:
+            if path in self._files:
+                return
+            self._files.add(path)
+        parser = configparser.ConfigParser(delimiters=("=",), interpolation=None)
+        parser.optionxform = str  # type: ignore
+        if not parser.read(path):
+            LOG.warning("Entry points file %s can't be read", path)
+        for group in parser.sections():
+            for name, value in parser.items(group):
+                self.register(group, name, value)
+            with self._lock:
+                self._warmed.add(group)
+
+    def entry_point(self, group: str, name: str) -> importlib.metadata.EntryPoint:
+        """
+        Return entry point definition without loading it.
+
+        Args:
+            group (str):
+                Entry point group.
+            name (str):
+                Entry point name.
+        Returns (importlib.metadata.EntryPoint):
+            Entry point definition.
+        """
+        key = (group, name)
+        with self._lock:
+            ep = self._entry_points.get(key)
+        if ep is None:
+            ep = list(importlib.metadata.entry_points(group=group, name=name))[0]
+            with self._lock:
+                self._entry_points[key] = ep
+        return ep
+
+    def load(self, group: str, name: str) -> Any:
+        """
+        Return loaded entry point object.
+
+        Entry points which aren't registered are looked up in installed distributions.
+
+        Args:
+            group (str):
+                Entry point group.
+            name (str):
+                Entry point name.
+        Returns (Any):
+            Object the entry point refers to.
+        """
+        key = (group, name)
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key]
+        func = self.entry_point(group, name).load()
+        with self._lock:
+            self._loaded[key] = func
+        return func
+
+
+ENTRY_POINTS = EntryPointRegistry()
+
+
+def load_entry_point(entry_tuple: Tuple[str, str, str]) -> Any:
+    """
+    Return entry point object from process wide entry point registry.
+
+    Args:
+        entry_tuple ((str, str, str)):
+            Tuple consisting of dependency, category, and entrypoint.
+    Returns (Any):
+        Object the entry point refers to.
+    """
+    return ENTRY_POINTS.load(entry_tuple[1], entry_tuple[2])
+
+
+class _ThreadLocalStdout:
+    """Stdout proxy writing to buffer of the current thread if it captures output."""
+
+    def __init__(self, stdout: Any):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def _target(self) -> Any:
+        return getattr(self.local, "buffer", None) or self.stdout
+
+    def write(self, data: str) -> int:
+        return self._target().write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+
+_stdout_lock = threading.Lock()
+_stdout_captures = 0
+
+
 @contextlib.contextmanager
 def capture_stdout() -> Generator[StringIO, None, None]:
-    """Capture sys.stdout to stream buffer."""
-    old_stdout = sys.stdout
-    sys.stdout = new_stdout = StringIO()
+    """
+    Capture sys.stdout of the current thread to stream buffer.
+
+    Output of other threads isn't captured, so entrypoints can run with captured output
+    in multiple threads at the same time.
+    """
+    global _stdout_captures
+    new_stdout = StringIO()
+    with _stdout_lock:
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        proxy = sys.stdout
+        _stdout_captures += 1
+    old_buffer = getattr(proxy.local, "buffer", None)
+    proxy.local.buffer = new_stdout
 
     try:
         yield new_stdout
     finally:
-        sys.stdout = old_stdout
+        proxy.local.buffer = old_buffer
+        with _stdout_lock:
+            _stdout_captures -= 1
+            if not _stdout_captures and sys.stdout is proxy:
+                sys.stdout = proxy.stdout
+
+
+_environ_lock = threading.RLock()
 
 
 @contextlib.contextmanager
@@ -54,6 +277,9 @@ def setup_entry_point_cli(
     """
     Set up an entrypoint as a context manager.
 
+    Environment of the process is swapped while the context is entered, so entrypoints
+    set up in other threads wait until the context is exited.
+
     Args:
         entry_tuple ((str, str, str)):
             Tuple consisting of dependency, category, and entrypoint.
@@ -62,33 +288,31 @@ def setup_entry_point_cli(
         args ([str]):
             Entrypoint arguments.
         environ_vars (dict):
-            Env variable names and values to set for the entrypoint.
+            Env variable names and values to set for the entrypoint. Variables set
+            to None are left unset.
     """
-    orig_environ = os.environ.copy()
+    with _environ_lock:
+        orig_environ = os.environ.copy()
+        try:
+            # First argv element is always the entry point name.
+            # For a console_scripts entry point, this will be the same value
+            # as if the script was invoked directly. For any other kind of entry point,
+            # this value is probably meaningless.
+            os.environ.update(_entry_point_environ(environ_vars))
+            entry_point_func = load_entry_point(entry_tuple)
 
-    try:
-        # First argv element is always the entry point name.
-        # For a console_scripts entry point, this will be the same value
-        # as if the script was invoked directly. For any other kind of entry point,
-        # this value is probably meaningless.
-        for key in environ_vars:
-            os.environ[key] = environ_vars[key]
-        entry_point_func = list(
-            importlib.metadata.entry_points(group=entry_tuple[1], name=entry_tuple[2])
-        )[0].load()
-
-        if args:
-            func_args = [name]
-            func_args.extend(args)
-            yield functools.partial(entry_point_func, func_args)
-        else:
-            yield entry_point_func
-    finally:
-        os.environ.update(orig_environ)
+            if args:
+                func_args = [name]
+                func_args.extend(args)
+                yield functools.partial(entry_point_func, func_args)
+            else:
+                yield entry_point_func
+        finally:
+            os.environ.update(orig_environ)
 
-        to_delete = [key for key in os.environ if key not in orig_environ]
-        for key in to_delete:
-            del os.environ[key]
+            to_delete = [key for key in os.environ if key not in orig_environ]
+            for key in to_delete:
+                del os.environ[key]
 
 
 def run_entrypoint(
@@ -105,7 +329,8 @@ def run_entrypoint(
         args ([str]):
             Entrypoint arguments.
         environ_vars (dict):
-            Env variable names and values to set for the entrypoint.
+            Env variable names and values to set for the entrypoint. Variables set
+            to None are left unset.
 
     Returns (str):
         Data returned by the entrypoint.
@@ -130,11 +355,121 @@ def run_entrypoint(
     return pyret
 
 
+def _entry_point_environ(environ_vars: Dict[str, Any]) -> Dict[str, Any]:
+    """Return env variables to set for an entrypoint, variables set to None are left unset."""
+    return {key: value for key, value in environ_vars.items() if value is not None}
+
+
+def _run_isolated_entrypoint(
+    entry_point: Tuple[str, str, str], func_args: Optional[List[Any]], environ_vars: Dict[str, Any]
+) -> Any:
+    """Run entrypoint in entrypoint worker process."""
+    group, name, value = entry_point
+    if not ENTRY_POINTS.is_registered(group, name):
+        ENTRY_POINTS.register(group, name, value)
+    entry_point_func = ENTRY_POINTS.load(group, name)
+    orig_environ = os.environ.copy()
+    try:
+        os.environ.update(_entry_point_environ(environ_vars))
+        with capture_stdout():
+            pyret = entry_point_func(func_args) if func_args else entry_point_func()
+            # Generators can't be sent back to the parent process
+            if isinstance(pyret, Iterator):
+                pyret = list(pyret)
+    finally:
+        os.environ.clear()
+        os.environ.update(orig_environ)
+    return pyret
+
+
+_entry_point_pool: Optional[ProcessPoolExecutor] = None
+_entry_point_pool_lock = threading.Lock()
+
+
+def _submit_to_entry_point_pool(max_workers: int, func: Callable[..., Any], *args: Any) -> Future:
+    """
+    Submit function to process pool for running entrypoints shared by all callers in the process.
+
+    Pool is created with the number of workers requested by the first caller. Function
+    is submitted under the pool lock, so the pool can't be shut down meanwhile.
+
+    Args:
+        max_workers (int):
+            Number of worker processes.
+        func (callable):
+            Function to run in the pool.
+    Returns (Future):
+        Future of the function result.
+    """
+    global _entry_point_pool
+    with _entry_point_pool_lock:
+        if _entry_point_pool is None:
+            _entry_point_pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _entry_point_pool.submit(func, *args)
+
+
+def shutdown_entry_point_process_pool() -> None:
+    """
+    Shut down the entrypoint process pool if it was started.
+
+    Entrypoints running in the pool are finished first. Pool is started again
+    when another entrypoint is run.
+    """
+    global _entry_point_pool
+    with _entry_point_pool_lock:
+        if _entry_point_pool is not None:
+            _entry_point_pool.shutdown()
+            _entry_point_pool = None
+
+
+def run_entrypoint_isolated(
+    entry_tuple: tuple[str, str, str],
+    name: Optional[str],
+    args: list[str],
+    environ_vars: dict[str, Any],
+    max_workers: int = 4,
+) -> Any:
+    """
+    Run an entrypoint in a worker process and return its return value.
+
+    Unlike run_entrypoint, environment variables and stdout are changed only in the worker
+    process running the entrypoint, so entrypoints with different environment can run
+    from multiple threads at the same time.
+
+    Args:
+        entry_tuple ((str, str, str)):
+            Tuple consisting of dependency, category, and entrypoint.
+        name: (str):
+            Entrypoint name.
+        args ([str]):
+            Entrypoint arguments.
+        environ_vars (dict):
+            Env variable names and values to set for the entrypoint. Variables set
+            to None are left unset.
+        max_workers (int):
+            Number of worker processes if the process pool isn't started yet.
+
+    Returns (Any):
+        Data returned by the entrypoint. Returned iterators are converted to lists.
+    """
+    LOG.info("Running isolated task with arguments: %s", " ".join([entry_tuple[2]] + args))
+    ep = ENTRY_POINTS.entry_point(entry_tuple[1], entry_tuple[2])
+    func_args = [name] + args if args else None
+    future = _submit_to_entry_point_pool(
+        max_workers,
+        _run_isolated_entrypoint,
+        (ep.group, ep.name, ep.value),
+        func_args,
+        environ_vars,
+    )
+    return future.result()
+
+
 def run_entrypoint_mod(entry_tuple: tuple[str, str, str], name: str, args: list[str]) -> Any:
     """Run entrypoint as python module function."""
-    entry_point_func = list(
-        importlib.metadata.entry_points(group=entry_tuple[1], name=entry_tuple[2])
-    )[0].load()
+    entry_point_func = load_entry_point(entry_tuple)
     print("RUN ENTRYPOINT MOD", entry_point_func, args)
     pyret = entry_point_func(*args)
 
@@ -1,7 +1,8 @@
 import json
 import hashlib
 import logging
-from typing import Type, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Type, Union
 from pytractions.base import TList, Port, STMDSingleIn
 from pytractions.stmd import STMD
 from pytractions.traction import Traction
@@ -9,8 +10,10 @@ from pytractions.traction import Traction
 from ..models.containers import ContainerParts
 from ..models.quay import QuayTag, QuayRepo
 
+from ..resources.async_quay_client import AsyncQuayClient
 from ..resources.quay_client import QuayClient
 from ..resources.fake_quay_client import FakeQuayClient
+from ..resources.tag_snapshot import TagSnapshotIndex
 
 LOG = logging.getLogger()
 logging.basicConfig()
@@ -36,11 +39,47 @@ class GetQuayTags(Traction):
     r_quay_client: Port[Union[QuayClient, FakeQuayClient]]
     o_tags: TList[QuayTag]
 
+    d_: str = """Get tags of a repository with Quay API.
+
+    Tag pages are fetched concurrently if quay client has tag_page_window greater than 1.
+    """
+
     def _run(self) -> None:
-        for tag in self.r_quay_client.get_quay_repository_tags(self.i_repository):
+        for tag in self.r_quay_client.iter_quay_repository_tags(self.i_repository):
+            if not isinstance(tag, QuayTag):
+                # Quay API returns plain dicts, possibly with fields the model doesn't have
+                tag = QuayTag.content_from_json(
+                    {key: value for key, value in tag.items() if key in QuayTag._fields}
+                )
             self.o_tags.append(tag)
 
 
+class PreauthorizeRepositories(Traction):
+    """Obtain registry tokens for repositories in advance."""
+
+    i_container_image_repos: TList[str]
+    r_quay_client: Port[Union[QuayClient, FakeQuayClient]]
+    a_batch_size: Port[int] = Port[int](data=0)
+
+    d_: str = """Obtain registry pull tokens for repositories before they are processed.
+
+    One token covering whole batch of repositories is requested per batch, so following
+    requests to the repositories don't need to be authenticated one by one.
+    """
+    d_i_container_image_repos: str = "Repositories in format <registry>/<repository>"
+    d_r_quay_client: str = "Quay client used to obtain the tokens"
+    d_a_batch_size: str = (
+        "Number of repositories covered by one token. 0 disables pre-authorization"
+    )
+
+    def _run(self) -> None:
+        if not self.a_batch_size:
+            return
+        repos = [repo.split("/", 1)[1] for repo in self.i_container_image_repos]
+        self.log.info(f"Pre-authorizing {len(repos)} repositories")
+        self.r_quay_client.preauthorize(repos, batch_size=self.a_batch_size)
+
+
 class GetContainerImageTags(Traction):
     """Parser container image reference into parts."""
 
@@ -48,15 +87,39 @@ class GetContainerImageTags(Traction):
     i_container_image_repo_identities: TList[str]
     o_container_references: TList[str]
     o_container_identities: TList[str]
+    o_signature_tags: TList[str]
     r_quay_client: Port[Union[QuayClient, FakeQuayClient]]
+    i_signing_key: str = ""
+    a_tag_snapshot_file: str = ""
+
+    d_i_signing_key: str = (
+        "Signing key the tags are signed with. Tag snapshot is kept separately for each"
+        + " signing key and set of identities."
+    )
+    d_o_signature_tags: str = (
+        "References of cosign signature tags (sha256-<digest>.sig) found in the repository."
+    )
+    d_a_tag_snapshot_file: str = (
+        "Path to tag snapshot index of previous runs. If set, only tags which are new or "
+        + "point to other digest than in the snapshot are returned. Tags are listed with "
+        + "Quay API in such case, so quay client needs oauth token."
+    )
 
     def _run(self) -> None:
 
         registry, repo_ns = self.i_container_image_repo.split("/", 1)
         ns, repo = repo_ns.split("/", 1)
 
-        for tag in self.r_quay_client.get_repository_tags(repo_ns)["tags"]:
-            if tag.endswith(".sig") or tag.endswith(".att") or tag.endswith(".sbom"):
+        if self.a_tag_snapshot_file:
+            tags = self._changed_tags(repo_ns)
+        else:
+            tags = self.r_quay_client.iter_repository_tags(repo_ns)
+
+        for tag in tags:
+            if tag.endswith(".sig"):
+                self.o_signature_tags.append(f"{self.i_container_image_repo}:{tag}")
+                continue
+            if tag.endswith(".att") or tag.endswith(".sbom"):
                 continue
             for identity in self.i_container_image_repo_identities:
                 self.o_container_references.append(f"{self.i_container_image_repo}:{tag}")
@@ -66,6 +129,32 @@ class GetContainerImageTags(Traction):
             f"Found {len(self.o_container_references)} tags for {self.i_container_image_repo}"
         )
 
+    def _changed_tags(self, repo_ns: str) -> List[str]:
+        records = []
+        for tag in self.r_quay_client.iter_quay_repository_tags(repo_ns):
+            if isinstance(tag, QuayTag):
+                tag = tag.content_to_json()
+            # Skip expired tags from tag history
+            if tag.get("end_ts"):
+                continue
+            # Signature tags are reported even if they didn't change
+            if tag["name"].endswith(".sig"):
+                self.o_signature_tags.append(f"{self.i_container_image_repo}:{tag['name']}")
+                continue
+            records.append((tag["name"], tag["manifest_digest"], tag.get("last_modified") or ""))
+
+        with TagSnapshotIndex(self.a_tag_snapshot_file) as index:
+            fingerprint = index.fingerprint(
+                [self.i_signing_key], self.i_container_image_repo_identities
+            )
+            changed = index.changed_tags(self.i_container_image_repo, records, fingerprint)
+            index.stage(self.i_container_image_repo, records, fingerprint)
+        self.log.info(
+            f"{len(changed)} of {len(records)} tags changed since last snapshot "
+            + f"for {self.i_container_image_repo}"
+        )
+        return [record[0] for record in changed]
+
 
 class STMDGetContainerImageTags(STMD):
     """STMD: Parser container image reference into parts."""
@@ -76,7 +165,19 @@ class STMDGetContainerImageTags(STMD):
     i_container_image_repo_identities: STMDSingleIn[TList[str]]
     o_container_references: TList[TList[str]]
     o_container_identities: TList[TList[str]]
+    o_signature_tags: TList[TList[str]]
     r_quay_client: Port[Union[QuayClient, FakeQuayClient]]
+    i_signing_key: STMDSingleIn[str] = STMDSingleIn[str](data="")
+    a_tag_snapshot_file: str = ""
+
+    d_i_signing_key: str = (
+        "Signing key the tags are signed with. Tag snapshot is kept separately for each"
+        + " signing key and set of identities."
+    )
+    d_a_tag_snapshot_file: str = (
+        "Path to tag snapshot index of previous runs. If set, only tags which are new or "
+        + "point to other digest than in the snapshot are returned."
+    )
 
 
 class ParseCotainerImageReference(Traction):
@@ -120,12 +221,143 @@ class STMDParseContainerImageReference(STMD):
     d_o_container_parts: str = "List of Parsed container parts"
 
 
+def _populate_container_digest(
+    container_parts: ContainerParts,
+    quay_client: QuayClient,
+    resolve_digest_head: bool = False,
+    log: logging.Logger = LOG,
+) -> ContainerParts:
+    """
+    Fetch digest(s) for container parts.
+
+    Args:
+        container_parts (ContainerParts):
+            Container parts to fetch digest for.
+        quay_client (QuayClient):
+            Quay client to fetch manifest.
+        resolve_digest_head (bool):
+            Resolve digest from manifest headers first and fetch manifest only for manifest lists.
+        log (Logger):
+            Logger used to report progress.
+    Returns (ContainerParts):
+        Container parts with digests populated.
+    """
+    if resolve_digest_head:
+        try:
+            digest, content_type = quay_client.resolve_manifest_digest(
+                container_parts.make_reference()
+            )
+        except Exception:
+            log.error("Exception when resolving manifest digest", exc_info=True)
+            raise
+        # Single arch image, manifest itself is not needed
+        if content_type not in (
+            QuayClient._MANIFEST_LIST_TYPE,
+            QuayClient._MANIFEST_OCI_LIST_TYPE,
+        ):
+            return ContainerParts(
+                registry=container_parts.registry,
+                image=container_parts.image,
+                tag=container_parts.tag,
+                digests=TList[str]([digest]),
+                arches=TList[str]([""]),
+            )
+
+    if container_parts.tag:
+        log.info(
+            "Fetching {}/{}:{}".format(
+                container_parts.registry,
+                container_parts.image,
+                container_parts.tag,
+            )
+        )
+        try:
+            manifest_str = quay_client.get_manifest(
+                "{}/{}:{}".format(
+                    container_parts.registry,
+                    container_parts.image,
+                    container_parts.tag,
+                ),
+                raw=True,
+            )
+        except Exception:
+            log.error("Exception when fetching manifest", exc_info=True)
+            raise
+
+    else:
+        LOG.info(
+            "Fetching {}/{}@{}".format(
+                container_parts.registry,
+                container_parts.image,
+                container_parts.digests[0],
+            )
+        )
+        try:
+            manifest_str = quay_client.get_manifest(
+                "{}/{}@{}".format(
+                    container_parts.registry,
+                    container_parts.image,
+                    container_parts.digests[0],
+                ),
+                raw=True,
+            )
+        except Exception:
+            log.error("Exception when fetching manifest", exc_info=True)
+            raise
+
+    return _container_parts_from_manifest(container_parts, manifest_str)
+
+
+def _container_parts_from_manifest(
+    container_parts: ContainerParts, manifest_str: str
+) -> ContainerParts:
+    """
+    Populate digest(s) of container parts from its raw manifest.
+
+    Args:
+        container_parts (ContainerParts):
+            Container parts the manifest was fetched for.
+        manifest_str (str):
+            Raw manifest.
+    Returns (ContainerParts):
+        Container parts with digests populated.
+    """
+    manifest = json.loads(manifest_str)
+    populated = ContainerParts(
+        registry=container_parts.registry,
+        image=container_parts.image,
+        tag=container_parts.tag,
+    )
+    if manifest["mediaType"] in (
+        QuayClient._MANIFEST_LIST_TYPE,
+        QuayClient._MANIFEST_OCI_LIST_TYPE,
+    ):
+        for _manifest in manifest["manifests"]:
+            populated.digests.append(_manifest["digest"])
+            populated.arches.append(_manifest["platform"]["architecture"])
+
+        hasher = hashlib.sha256()
+        hasher.update(manifest_str.encode("utf-8"))
+        digest = hasher.hexdigest()
+        populated.digests.append("sha256:" + digest)
+        populated.arches.append("multiarch")
+
+    else:
+        hasher = hashlib.sha256()
+        hasher.update(manifest_str.encode("utf-8"))
+        digest = hasher.hexdigest()
+        populated.digests.append("sha256:" + digest)
+        populated.arches.append("")
+    return populated
+
+
 class PopulateContainerDigest(Traction):
     """Fetch digest(s) for ContainerParts if there isn't any."""
 
     i_container_parts: ContainerParts
     o_container_parts: ContainerParts
     r_quay_client: QuayClient
+    a_resolve_digest_head: bool = False
 
     d_: str = """Fetch digest(s) for ContainerParts if there aren't any
 
@@ -135,77 +367,17 @@ class PopulateContainerDigest(Traction):
     d_i_container_parts: str = "Container parts to fetch digest for"
     d_o_container_parts: str = "Container parts with digests populated (or unchanged)"
     d_r_quay_client: str = "Quay client to fetch manifest"
+    d_a_resolve_digest_head: str = (
+        "Resolve digest from manifest headers first and fetch manifest only for manifest lists"
+    )
 
     def _run(self) -> None:
-        self.o_container_parts = self.i_container_parts
-        if self.i_container_parts.tag:
-            self.log.info(
-                "Fetching {}/{}:{}".format(
-                    self.i_container_parts.registry,
-                    self.i_container_parts.image,
-                    self.i_container_parts.tag,
-                )
-            )
-            try:
-                manifest_str = self.r_quay_client.get_manifest(
-                    "{}/{}:{}".format(
-                        self.i_container_parts.registry,
-                        self.i_container_parts.image,
-                        self.i_container_parts.tag,
-                    ),
-                    raw=True,
-                )
-            except Exception:
-                self.log.error("Exception when fetching manifest", exc_info=True)
-                raise
-
-        else:
-            LOG.info(
-                "Fetching {}/{}@{}".format(
-                    self.i_container_parts.registry,
-                    self.i_container_parts.image,
-                    self.i_container_parts.digests[0],
-                )
-            )
-            try:
-                manifest_str = self.r_quay_client.get_manifest(
-                    "{}/{}@{}".format(
-                        self.i_container_parts.registry,
-                        self.i_container_parts.image,
-                        self.i_container_parts.digests[0],
-                    ),
-                    raw=True,
-                )
-            except Exception:
-                self.log.error("Exception when fetching manifest", exc_info=True)
-                raise
-
-        manifest = json.loads(manifest_str)
-        self.o_container_parts = ContainerParts(
-            registry=self.i_container_parts.registry,
-            image=self.i_container_parts.image,
-            tag=self.i_container_parts.tag,
+        self.o_container_parts = _populate_container_digest(
+            self.i_container_parts,
+            self.r_quay_client,
+            resolve_digest_head=self.a_resolve_digest_head,
+            log=self.log,
         )
-        if manifest["mediaType"] in (
-            QuayClient._MANIFEST_LIST_TYPE,
-            QuayClient._MANIFEST_OCI_LIST_TYPE,
-        ):
-            for _manifest in manifest["manifests"]:
-                self.o_container_parts.digests.append(_manifest["digest"])
-                self.o_container_parts.arches.append(_manifest["platform"]["architecture"])
-
-            hasher = hashlib.sha256()
-            hasher.update(manifest_str.encode("utf-8"))
-            digest = hasher.hexdigest()
-            self.o_container_parts.digests.append("sha256:" + digest)
-            self.o_container_parts.arches.append("multiarch")
-
-        else:
-            hasher = hashlib.sha256()
-            hasher.update(manifest_str.encode("utf-8"))
-            digest = hasher.hexdigest()
-            self.o_container_parts.digests.append("sha256:" + digest)
-            self.o_container_parts.arches.append("")
 
 
 class STMDPopulateContainerDigest(STMD):
@@ -215,6 +387,7 @@ class STMDPopulateContainerDigest(STMD):
     i_container_parts: TList[ContainerParts]
     o_container_parts: TList[ContainerParts]
     r_quay_client: QuayClient
+    a_resolve_digest_head: bool = False
 
     d_: str = """Fetch digest(s) for ContainerParts if there aren't any
 
@@ -224,3 +397,175 @@ class STMDPopulateContainerDigest(STMD):
     d_i_container_parts: str = "Container parts to fetch digest for"
     d_o_container_parts: str = "Container parts with digests populated (or unchanged)"
     d_r_quay_client: str = "Quay client to fetch manifest"
+    d_a_resolve_digest_head: str = (
+        "Resolve digest from manifest headers first and fetch manifest only for manifest lists"
+    )
+
+
+class BulkPopulateContainerDigest(Traction):
+    """Fetch digest(s) for list of ContainerParts in one traction."""
+
+    i_container_parts: TList[ContainerParts]
+    o_container_parts: TList[ContainerParts]
+    r_quay_client: QuayClient
+    a_resolve_digest_head: bool = False
+    a_max_workers: int = 20
+
+    d_: str = """Fetch digest(s) for list of ContainerParts if there aren't any
+
+    Same as STMDPopulateContainerDigest, but without overhead of traction per container parts.
+    Identical references are fetched only once, manifests are fetched concurrently by
+    pool of threads, each of them reusing its own connection to the registry.
+    With digest resolution from headers, digests of all references are resolved first and
+    each manifest list is fetched only once for all references (e.g. floating tags) pointing
+    to it. With AsyncQuayClient, requests of all references are multiplexed over the client's
+    connection pool instead of the pool of threads. Output container parts are in the same
+    order as the input.
+    """
+    d_i_container_parts: str = "List of container parts to fetch digest for"
+    d_o_container_parts: str = "List of container parts with digests populated"
+    d_r_quay_client: str = (
+        "Quay client to fetch manifest. AsyncQuayClient fetches all manifests concurrently."
+    )
+    d_a_resolve_digest_head: str = (
+        "Resolve digest from manifest headers first and fetch manifest only for manifest lists"
+    )
+    d_a_max_workers: str = (
+        "Maximum number of manifests fetched at the same time. Not used with AsyncQuayClient,"
+        + " which limits requests in flight by itself."
+    )
+
+    def _run(self) -> None:
+        unique: Dict[Tuple[str, str, str], ContainerParts] = {}
+        keys = []
+        for container_parts in self.i_container_parts:
+            key = (
+                container_parts.registry,
+                container_parts.image,
+                container_parts.tag or container_parts.digests[0],
+            )
+            unique.setdefault(key, container_parts)
+            keys.append(key)
+        self.log.info(
+            f"Populating digests for {len(unique)} unique references "
+            + f"of {len(self.i_container_parts)}"
+        )
+
+        with ThreadPoolExecutor(max_workers=max(self.a_max_workers, 1)) as executor:
+            if self.a_resolve_digest_head:
+                populated = self._populate_by_digest(executor, unique)
+            else:
+                populated = self._fetch(executor, unique)
+
+        for key in keys:
+            # each input gets its own copy, so outputs of duplicate references aren't shared
+            self.o_container_parts.append(
+                ContainerParts(
+                    registry=populated[key].registry,
+                    image=populated[key].image,
+                    tag=populated[key].tag,
+                    digests=TList[str](populated[key].digests),
+                    arches=TList[str](populated[key].arches),
+                )
+            )
+
+    def _fetch(
+        self,
+        executor: ThreadPoolExecutor,
+        parts: Dict[Tuple[str, str, str], ContainerParts],
+    ) -> Dict[Tuple[str, str, str], ContainerParts]:
+        if isinstance(self.r_quay_client, AsyncQuayClient):
+            try:
+                manifests = self.r_quay_client.get_manifests(
+                    [container_parts.make_reference() for container_parts in parts.values()],
+                    raw=True,
+                )
+            except Exception:
+                self.log.error("Exception when fetching manifest", exc_info=True)
+                raise
+            return {
+                key: _container_parts_from_manifest(container_parts, manifest)
+                for (key, container_parts), manifest in zip(parts.items(), manifests)
+            }
+        futures = {
+            key: executor.submit(
+                _populate_container_digest,
+                container_parts,
+                self.r_quay_client,
+                log=self.log,
+            )
+            for key, container_parts in parts.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+    def _resolve(
+        self,
+        executor: ThreadPoolExecutor,
+        parts: Dict[Tuple[str, str, str], ContainerParts],
+    ) -> Dict[Tuple[str, str, str], Tuple[str, str]]:
+        try:
+            if isinstance(self.r_quay_client, AsyncQuayClient):
+                resolved = self.r_quay_client.resolve_manifest_digests(
+                    [container_parts.make_reference() for container_parts in parts.values()]
+                )
+                return dict(zip(parts, resolved))
+            futures = {
+                key: executor.submit(
+                    self.r_quay_client.resolve_manifest_digest, container_parts.make_reference()
+                )
+                for key, container_parts in parts.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+        except Exception:
+            self.log.error("Exception when resolving manifest digest", exc_info=True)
+            raise
+
+    def _populate_by_digest(
+        self,
+        executor: ThreadPoolExecutor,
+        unique: Dict[Tuple[str, str, str], ContainerParts],
+    ) -> Dict[Tuple[str, str, str], ContainerParts]:
+        populated: Dict[Tuple[str, str, str], ContainerParts] = {}
+        # references of each manifest list, keyed by repository and digest of the list
+        lists: Dict[Tuple[str, str, str], List[Tuple[str, str, str]]] = {}
+        for key, (digest, content_type) in self._resolve(executor, unique).items():
+            container_parts = unique[key]
+            if content_type in (
+                QuayClient._MANIFEST_LIST_TYPE,
+                QuayClient._MANIFEST_OCI_LIST_TYPE,
+            ):
+                lists.setdefault(
+                    (container_parts.registry, container_parts.image, digest), []
+                ).append(key)
+                continue
+            populated[key] = ContainerParts(
+                registry=container_parts.registry,
+                image=container_parts.image,
+                tag=container_parts.tag,
+                digests=TList[str]([digest]),
+                arches=TList[str]([""]),
+            )
+        self.log.info(
+            f"Fetching {len(lists)} manifest lists for "
+            + f"{sum(len(keys) for keys in lists.values())} references"
+        )
+
+        manifest_lists = self._fetch(
+            executor,
+            {
+                (registry, image, digest): ContainerParts(
+                    registry=registry, image=image, digests=TList[str]([digest])
+                )
+                for registry, image, digest in lists
+            },
+        )
+        for list_key, manifest_list in manifest_lists.items():
+            for key in lists[list_key]:
+                populated[key] = ContainerParts(
+                    registry=manifest_list.registry,
+                    image=manifest_list.image,
+                    tag=unique[key].tag,
+                    digests=manifest_list.digests,
+                    arches=manifest_list.arches,
+                )
+        return populated
@@ -1,5 +1,7 @@
-from typing import Type, Union
+from typing import Any, Dict, Iterable, Type, Union
 import json
+import queue
+import threading
 
 from pytractions.base import TList, NullPort, Port, STMDSingleIn
 from pytractions.traction import Traction
@@ -8,7 +10,9 @@ from pytractions.tractor import Tractor
 from pytractions.stmd import STMD
 
 from ..resources import SIGNING_WRAPPERS
+from ..resources.chunking import AdaptiveChunkSizer
 from ..resources.cosign import CosignClient, FakeCosignClient
+from ..resources.signing_wrapper import SigningError
 from ..models.signing import SignEntry
 from ..models.containers import ContainerParts
 
@@ -117,6 +121,110 @@ class STMDSignSignEntries(STMD):
     d_i_task_id: str = "Task id used to identify signing requests."
 
 
+class PipelinedSignSignEntries(Traction):
+    """Sign chunks of SignEntries with overlapping filter, sign and store stages."""
+
+    r_signer_wrapper: Port[SIGNING_WRAPPERS]
+    i_task_id: int
+    i_sign_entries: TList[TList[SignEntry]]
+    o_failed_chunks: TList[int]
+    a_dry_run: bool = False
+    a_queue_size: int = 2
+    a_target_chunk_duration: float = 0.0
+    a_initial_chunk_size: int = 10
+
+    d_: str = """Sign provided chunks of SignEntries with signer wrapper.
+
+    Filtering, signing and storing run in separate threads connected with bounded queues,
+    so next chunk is filtered and signed while signatures of previous chunk are stored.
+    Stage blocks when its output queue is full. Failure of a chunk doesn't stop processing
+    of other chunks, traction fails after all chunks are processed. Entrypoints run in
+    process of the traction swap its environment, so they don't overlap each other;
+    stages overlap fully when signer runs entrypoints in worker processes or directly.
+
+    With target chunk duration set, entries are re-chunked while they are processed, so
+    size of each chunk follows signing and storing latency measured on previous chunks.
+    Until the latency is measured, chunks start at initial chunk size and grow geometrically.
+    """
+    d_i_sign_entries: str = "List of List of SignEntry objects to sign."
+    d_i_task_id: str = "Task id used to identify signing requests."
+    d_o_failed_chunks: str = "Indexes of chunks which failed to be signed or stored."
+    d_a_dry_run: str = "Filter entries but don't sign and store them."
+    d_a_queue_size: str = "Maximum number of chunks waiting between two stages."
+    d_a_target_chunk_duration: str = (
+        "Desired seconds spent signing and storing one chunk. Size of the largest input chunk"
+        + " is the upper bound. 0 keeps the input chunks."
+    )
+    d_a_initial_chunk_size: str = "Size of the first chunk when the latency isn't measured yet."
+
+    _DONE = object()
+
+    def _run(self) -> None:
+        to_sign: queue.Queue = queue.Queue(maxsize=max(self.a_queue_size, 1))
+        to_store: queue.Queue = queue.Queue(maxsize=max(self.a_queue_size, 1))
+        errors: Dict[int, Exception] = {}
+
+        def sign_stage() -> None:
+            while (item := to_sign.get()) is not self._DONE:
+                n, entries = item
+                try:
+                    self.log.info(f"Signing {len(entries)} entries of chunk {n}")
+                    to_store.put((n, self.r_signer_wrapper._sign_entries(entries, self.i_task_id)))
+                except Exception as e:
+                    self.log.error(f"Signing of chunk {n} failed", exc_info=True)
+                    errors[n] = e
+            to_store.put(self._DONE)
+
+        def store_stage() -> None:
+            while (item := to_store.get()) is not self._DONE:
+                n, signed = item
+                try:
+                    self.r_signer_wrapper._store_signed(signed)
+                except Exception as e:
+                    self.log.error(f"Storing signatures of chunk {n} failed", exc_info=True)
+                    errors[n] = e
+
+        chunks: Iterable[Any] = self.i_sign_entries
+        if self.a_target_chunk_duration and self.i_sign_entries:
+            sizer = AdaptiveChunkSizer(
+                [self.r_signer_wrapper.sign_latency, self.r_signer_wrapper.store_latency],
+                self.a_target_chunk_duration,
+                max(len(chunk) for chunk in self.i_sign_entries),
+                initial_size=self.a_initial_chunk_size,
+            )
+            chunks = sizer.chunks([entry for chunk in self.i_sign_entries for entry in chunk])
+
+        total = 0
+        threads = [threading.Thread(target=sign_stage), threading.Thread(target=store_stage)]
+        for thread in threads:
+            thread.start()
+        try:
+            for n, chunk in enumerate(chunks):
+                total += 1
+                try:
+                    entries = self.r_signer_wrapper._filter_to_sign(chunk)
+                except Exception as e:
+                    self.log.error(f"Filtering of chunk {n} failed", exc_info=True)
+                    errors[n] = e
+                    continue
+                if not entries:
+                    continue
+                if self.a_dry_run:
+                    self.log.info(f"[DRY RUN] Signing {len(entries)} entries of chunk {n}")
+                    continue
+                to_sign.put((n, entries))
+        finally:
+            to_sign.put(self._DONE)
+            for thread in threads:
+                thread.join()
+
+        for n in sorted(errors):
+            self.o_failed_chunks.append(n)
+        if errors:
+            first: Any = errors[min(errors)]
+            raise SigningError(f"{len(errors)} of {total} chunks failed: {first}") from first
+
+
 class SignEntriesFromContainerParts(Traction):
     """Create sign entries from container parts."""
 
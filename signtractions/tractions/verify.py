@@ -1,51 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
 import os
 import logging
-from typing import Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from pytractions.base import TList, TDict
 from pytractions.stmd import STMD
 from pytractions.traction import Traction
 
-import subprocess
-
 from ..models.signing import SignEntry
+from ..resources.cosign import (
+    NativeCosignVerifier,
+    VerificationResult,
+    digest_reference,
+    signature_reference,
+    verify_batched,
+)
+from ..resources.quay_client import QuayClient
+from ..resources.fake_quay_client import FakeQuayClient
 from ..resources.sigstore import Sigstore
 from ..resources.fake_sigstore import FakeSigstore
 
-
 LOG = logging.getLogger()
 logging.basicConfig()
 LOG.setLevel(logging.INFO)
 
 
+def _log_verification_failure(
+    log: logging.Logger, entry: SignEntry, result: VerificationResult
+) -> None:
+    # Single record, so output of concurrent verifications isn't interleaved
+    log.error(
+        f"Error verifying {entry.reference} {entry.digest}\n"
+        f"Verificaiton failed\nSTDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}"
+    )
+
+
 class VerifyEntriesLegacy(Traction):
     """Sign SignEntries."""
 
     i_sign_entries: TList[SignEntry]
     r_sigstore: Union[Sigstore, FakeSigstore]
     o_verified: TDict[SignEntry, bool]
+    a_max_workers: int = 10
+
+    d_: str = """Verify SignEntries have signatures in the legacy sigstore.
 
-    d_: str = """Verify SignEntries have signatures in the legacy sigstore."""
+    Entries are verified concurrently, signatures of each entry are fetched and decrypted
+    by the sigstore resource. Sigstore connections and decryption threads are closed when
+    the verification finishes.
+    """
     d_i_sign_entries: str = "List of SignEntries to verify"
     d_r_sigstore: str = "Sigstore resource"
     d_o_verified: str = "Dictionary of SignEntry to verification status"
+    d_a_max_workers: str = "Maximum number of entries verified at the same time."
 
-    def _run(self) -> None:
-        for entry in self.i_sign_entries:
-            if entry.arch != "amd64":
-                continue
-            image_tag = entry.identity.split("/", 1)[-1]
-            image = image_tag.split(":")[0]
+    def _verify(self, entry: SignEntry) -> bool:
+        image_tag = entry.identity.split("/", 1)[-1]
+        image = image_tag.split(":")[0]
+
+        self.log.info(f"Legacy: Verifying {entry.reference}")
 
-            self.log.info(f"Legacy: Verifying {entry.reference}")
+        signatures = self.r_sigstore.get_signatures(image, entry.digest)
+        for signature in signatures:
+            if signature.critical.identity.docker_reference == entry.identity:
+                return True
+        return False
 
-            signatures = self.r_sigstore.get_signatures(image, entry.digest)
-            found = False
-            for signature in signatures:
-                if signature.critical.identity.docker_reference == entry.identity:
-                    found = True
-                    break
-            self.o_verified[entry] = found
+    def _run(self) -> None:
+        entries = [entry for entry in self.i_sign_entries if entry.arch == "amd64"]
+        try:
+            with ThreadPoolExecutor(max_workers=max(self.a_max_workers, 1)) as executor:
+                for entry, found in zip(entries, executor.map(self._verify, entries)):
+                    self.o_verified[entry] = found
+        finally:
+            self.r_sigstore.close()
 
 
 class VerifyEntriesCosign(Traction):
@@ -54,38 +82,99 @@ class VerifyEntriesCosign(Traction):
     i_sign_entries: TList[SignEntry]
     i_public_key_file: str
     i_rekor_public_key_file: str
+    i_signature_tags: TList[str] = TList[str]([])
     o_verified: TDict[SignEntry, bool]
-
-    d_: str = """Verify SignEntries have signatures in the cosign sigstore."""
+    r_quay_client: Optional[Union[QuayClient, FakeQuayClient]] = None
+    a_batch_size: int = 50
+    a_max_workers: int = 0
+    a_native: bool = False
+    a_prefilter: bool = False
+
+    d_: str = """Verify SignEntries have signatures in the cosign sigstore.
+
+    Manifest digests of the entries are verified in batches by one cosign invocation per
+    batch, so a tag moved since the entries were made doesn't affect the result. Entries
+    sharing digest are verified only once. Batches are verified concurrently, each cosign
+    process gets its own environment and output.
+
+    In native mode, signatures made with the key are verified in-process with the quay
+    client first, including signed entry timestamp of their transparency log bundle. Only
+    entries which can't be verified natively, e.g. keyless signatures or signatures without
+    transparency log bundle, are verified by cosign.
+
+    With prefilter enabled, entries whose digest doesn't have a signature tag among the
+    listed signature tags are marked unverified without any verification.
+    """
     d_i_sign_entries: str = "List of SignEntries to verify"
     d_i_public_key_file: str = "Public key file"
+    d_i_rekor_public_key_file: str = "Public key to validate against rekor instance"
+    d_i_signature_tags: str = "References of signature tags existing in the repositories."
     d_o_verified: str = "Dictionary of SignEntry to verification status"
+    d_a_batch_size: str = "Maximum number of references verified by one cosign invocation."
+    d_a_max_workers: str = (
+        "Maximum number of cosign processes running at the same time. 0 uses number of CPUs."
+    )
+    d_r_quay_client: str = "Quay client used to fetch signatures in native mode."
+    d_a_native: str = (
+        "Verify signatures made with the key and their transparency log bundle in-process"
+        + " and use cosign only for the rest."
+    )
+    d_a_prefilter: str = (
+        "Mark entries without signature tag in signature tags as unverified without verifying."
+    )
+
+    def _prefilter(self) -> Dict[Tuple[str, str], VerificationResult]:
+        signature_tags = set(self.i_signature_tags)
+        unsigned = {}
+        for entry in self.i_sign_entries:
+            signature = signature_reference(entry.reference, entry.digest)
+            if signature not in signature_tags:
+                unsigned[(entry.reference, entry.digest)] = VerificationResult(
+                    False, "", f"signature tag {signature} not found"
+                )
+        return unsigned
+
+    def _verify_native(
+        self, entries: List[SignEntry], max_workers: int
+    ) -> Dict[Tuple[str, str], VerificationResult]:
+        verifier = NativeCosignVerifier(
+            self.r_quay_client, self.i_public_key_file, self.i_rekor_public_key_file
+        )
+        keys = list(dict.fromkeys((entry.reference, entry.digest) for entry in entries))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda key: verifier.verify(*key), keys)
+            return {key: result for key, result in zip(keys, results) if result is not None}
 
     def _run(self) -> None:
-        pk_backup = os.environ.get("SIGSTORE_REKOR_PUBLIC_KEY")
-        os.environ["SIGSTORE_REKOR_PUBLIC_KEY"] = self.i_rekor_public_key_file
-        try:
-            for entry in self.i_sign_entries:
-                self.log.info(f"Cosign: Verifying {entry.reference} {entry.digest}")
-                p = subprocess.Popen(
-                    ["cosign", "verify", "--key", self.i_public_key_file, entry.reference],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-                stdout, stderr = p.communicate()
-                if p.returncode != 0:
-                    self.log.error(f"Error verifying {entry.reference} {entry.digest}")
-                    self.o_verified[entry] = False
-                    self.log.error("Verificaiton failed")
-                    self.log.error("STDOUT:")
-                    self.log.error(stdout)
-                    self.log.error("STDERR:")
-                    self.log.error(stderr)
-                else:
-                    self.o_verified[entry] = True
-        finally:
-            if pk_backup:
-                os.environ["SIGSTORE_REKOR_PUBLIC_KEY"]
+        self.log.info(f"Cosign: Verifying {len(self.i_sign_entries)} entries")
+        max_workers = self.a_max_workers or os.cpu_count() or 1
+        known: Dict[Tuple[str, str], VerificationResult] = {}
+        if self.a_prefilter:
+            known = self._prefilter()
+            self.log.info(f"Cosign: {len(known)} entries don't have signature tag")
+        entries = [e for e in self.i_sign_entries if (e.reference, e.digest) not in known]
+        if self.a_native and self.r_quay_client is not None and entries:
+            native = self._verify_native(entries, max_workers)
+            self.log.info(f"Cosign: Verified {len(native)} references natively")
+            known.update(native)
+            entries = [e for e in entries if (e.reference, e.digest) not in known]
+        results = {}
+        if entries:
+            results = verify_batched(
+                self.i_public_key_file,
+                [digest_reference(entry.reference, entry.digest) for entry in entries],
+                batch_size=self.a_batch_size,
+                rekor_public_key_file=self.i_rekor_public_key_file,
+                max_workers=max_workers,
+            )
+        for entry in self.i_sign_entries:
+            result = (
+                known.get((entry.reference, entry.digest))
+                or results[digest_reference(entry.reference, entry.digest)]
+            )
+            if not result.verified:
+                _log_verification_failure(self.log, entry, result)
+            self.o_verified[entry] = result.verified
 
 
 class VerifyEntryCosign(Traction):
@@ -102,30 +191,18 @@ class VerifyEntryCosign(Traction):
     d_o_verified: str = "Dictionary of SignEntry to verification status"
 
     def _run(self) -> None:
-        pk_backup = os.environ.get("SIGSTORE_REKOR_PUBLIC_KEY")
-        os.environ["SIGSTORE_REKOR_PUBLIC_KEY"] = self.i_rekor_public_key_file
-        try:
-            entry = self.i_sign_entry
-            self.log.info(f"Cosign: Verifying {entry.reference} {entry.digest}")
-            p = subprocess.Popen(
-                ["cosign", "verify", "--key", self.i_public_key_file, entry.reference],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            stdout, stderr = p.communicate()
-            if p.returncode != 0:
-                self.log.error(f"Error verifying {entry.reference} {entry.digest}")
-                self.o_verified = False
-                self.log.error("Verificaiton failed")
-                self.log.error("STDOUT:")
-                self.log.error(stdout)
-                self.log.error("STDERR:")
-                self.log.error(stderr)
-            else:
-                self.o_verified = True
-        finally:
-            if pk_backup:
-                os.environ["SIGSTORE_REKOR_PUBLIC_KEY"]
+        entry = self.i_sign_entry
+        self.log.info(f"Cosign: Verifying {entry.reference} {entry.digest}")
+        # Environment is passed to the process only, so entries can be verified in threads
+        reference = digest_reference(entry.reference, entry.digest)
+        result = verify_batched(
+            self.i_public_key_file,
+            [reference],
+            rekor_public_key_file=self.i_rekor_public_key_file,
+        )[reference]
+        if not result.verified:
+            _log_verification_failure(self.log, entry, result)
+        self.o_verified = result.verified
 
 
 STMDVerifyEntryCosign = STMD.wrap(
@@ -10,6 +10,7 @@ from ..tractions.quay import GetQuayRepositories, STMDGetQuayTags
 
 
 from ..resources.quay_client import QuayClient
+from ..resources.async_quay_client import AsyncQuayClient
 from ..resources.fake_quay_client import FakeQuayClient
 
 from ..models.quay import QuayTag
@@ -65,8 +66,8 @@ class GetLastRepoTags(Tractor):
     """Sign container images."""
 
     i_namespace: Port[str] = Port[str](data="")
-    r_dst_quay_client: Union[QuayClient, FakeQuayClient] = NullPort[
-        Union[QuayClient, FakeQuayClient]
+    r_dst_quay_client: Union[QuayClient, AsyncQuayClient, FakeQuayClient] = NullPort[
+        Union[QuayClient, AsyncQuayClient, FakeQuayClient]
     ]()
     a_executor: Union[ProcessPoolExecutor, ThreadPoolExecutor, LoopExecutor] = ThreadPoolExecutor(
         pool_size=5
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Any, Dict, Tuple, Union
 
 from pytractions.base import TList, NullPort, Port
 from pytractions.traction import Traction
@@ -8,12 +8,13 @@ from pytractions.executor import LoopExecutor, ThreadPoolExecutor, ProcessPoolEx
 from pytractions.transformations import Extractor
 from pytractions.stmd import STMD
 
-from ..tractions.containers import STMDPopulateContainerDigest, STMDParseContainerImageReference
-from ..tractions.signing import STMDSignSignEntries
+from ..tractions.containers import BulkPopulateContainerDigest, STMDParseContainerImageReference
+from ..tractions.signing import PipelinedSignSignEntries, STMDSignSignEntries
 from ..tractions.signing import STMDSignEntriesFromContainerParts
 
 from ..resources.quay_client import QuayClient
 from ..resources import SIGNING_WRAPPERS
+from ..resources.async_quay_client import AsyncQuayClient
 from ..resources.fake_quay_client import FakeQuayClient
 
 from ..models.signing import ContainerSignInput, SignEntry
@@ -22,25 +23,96 @@ from ..models.signing import ContainerSignInput, SignEntry
 class ChunkSignEntries(Traction):
     """Chunk SignEntries."""
 
+    r_signer_wrapper: Port[SIGNING_WRAPPERS] = NullPort[SIGNING_WRAPPERS]()
     i_sign_entries: TList[SignEntry]
     i_chunk_size: int
     o_chunked_sign_entries: TList[TList[SignEntry]]
 
-    d_: str = "Chunk provided SignEntries into chunks."
+    d_: str = """Chunk provided SignEntries into chunks.
+
+    Chunk size is limited by maximum chunk size declared in signer wrapper settings.
+    Adaptive chunk sizing is done by pipelined signing, which measures the latency while
+    the chunks are signed.
+    """
+    d_r_signer_wrapper: str = (
+        "Signer wrapper the chunks are signed with. Optional, it limits chunk size."
+    )
     d_i_sign_entries: str = "List of SignEntry objects to chunk."
     d_i_chunk_size: str = "Size of each chunk."
     d_o_chunked_sign_entries: str = "List of chunked SignEntry objects."
 
     def _run(self, on_update=None) -> None:
+        chunk_size = self.i_chunk_size
+        if self.r_signer_wrapper and self.r_signer_wrapper.max_chunk_size:
+            chunk_size = min(chunk_size, self.r_signer_wrapper.max_chunk_size)
         self.log.info(
-            f"Chunking {len(self.i_sign_entries)} "
-            f"SignEntries into chunks of size {self.i_chunk_size}."
+            f"Chunking {len(self.i_sign_entries)} " f"SignEntries into chunks of size {chunk_size}."
         )
-        for i in range(0, len(self.i_sign_entries), self.i_chunk_size):
-            chunk = TList[SignEntry](self.i_sign_entries[i : i + self.i_chunk_size])  # noqa: E203
+        for i in range(0, len(self.i_sign_entries), chunk_size):
+            chunk = TList[SignEntry](self.i_sign_entries[i : i + chunk_size])  # noqa: E203
             self.o_chunked_sign_entries.append(chunk)
 
 
+class GroupSignEntries(Traction):
+    """Deduplicate SignEntries and group them by digest and signing key."""
+
+    i_sign_entries: TList[SignEntry]
+    o_sign_entries: TList[SignEntry]
+
+    d_: str = """Deduplicate SignEntries and group them by digest and signing key.
+
+    Identical entries are dropped. Entries sharing digest and signing key (e.g. floating tags
+    pointing to the same manifest) are placed next to each other, in order of the first
+    occurrence of the digest, so they end up in the same chunk and existing signatures of
+    the digest are looked up only once. Manifests aren't fetched here, each of them is fetched
+    once by BulkPopulateContainerDigest before the entries are created.
+    """
+    d_i_sign_entries: str = "List of SignEntry objects to group."
+    d_o_sign_entries: str = "Deduplicated list of SignEntry objects grouped by digest."
+
+    def _run(self, on_update=None) -> None:
+        groups: Dict[Tuple[str, str], Dict[Tuple[Any, ...], SignEntry]] = {}
+        for entry in self.i_sign_entries:
+            group = groups.setdefault((entry.digest, entry.signing_key), {})
+            group.setdefault((entry.repo, entry.reference, entry.identity, entry.arch), entry)
+        for group in groups.values():
+            for entry in group.values():
+                self.o_sign_entries.append(entry)
+        self.log.info(
+            f"Grouped {len(self.i_sign_entries)} SignEntries into {len(self.o_sign_entries)} "
+            f"unique entries of {len(groups)} digests."
+        )
+
+
+class SelectSignChunks(Traction):
+    """Pass chunks of SignEntries to selected signing step."""
+
+    i_chunked_sign_entries: TList[TList[SignEntry]]
+    o_chunked_sign_entries: TList[TList[SignEntry]]
+    o_pipelined_sign_entries: TList[TList[SignEntry]]
+    a_pipelined: bool = False
+    a_target_chunk_duration: float = 0.0
+
+    d_: str = """Pass chunks of SignEntries to selected signing step.
+
+    Chunks are passed to pipelined signing if enabled, otherwise to signing of each chunk
+    by separate traction. Output of the other step is left empty, so it doesn't sign anything.
+    Adaptive chunking needs latency measured while the chunks are signed, which only pipelined
+    signing does, so chunks are passed to it also when target chunk duration is set.
+    """
+    d_i_chunked_sign_entries: str = "List of chunked SignEntry objects."
+    d_o_chunked_sign_entries: str = "Chunks signed by separate tractions."
+    d_o_pipelined_sign_entries: str = "Chunks signed by pipelined signing."
+    d_a_pipelined: str = "Sign chunks with pipelined signing."
+    d_a_target_chunk_duration: str = "Desired seconds spent signing one chunk. 0 if not set."
+
+    def _run(self, on_update=None) -> None:
+        pipelined = self.a_pipelined or self.a_target_chunk_duration > 0
+        output = self.o_pipelined_sign_entries if pipelined else self.o_chunked_sign_entries
+        for chunk in self.i_chunked_sign_entries:
+            output.append(chunk)
+
+
 STMDExtractContainerSignInput = STMD.wrap(Extractor[ContainerSignInput, str])
 
 
@@ -48,8 +120,8 @@ class SignContainers(Tractor):
     """Sign container images."""
 
     r_signer_wrapper: Port[SIGNING_WRAPPERS] = NullPort[SIGNING_WRAPPERS]()
-    r_dst_quay_client: Union[QuayClient, FakeQuayClient] = NullPort[
-        Union[QuayClient, FakeQuayClient]
+    r_dst_quay_client: Union[QuayClient, AsyncQuayClient, FakeQuayClient] = NullPort[
+        Union[QuayClient, AsyncQuayClient, FakeQuayClient]
     ]()
     i_task_id: Port[int] = Port[int](data=1)
     i_containers_to_sign: Port[TList[ContainerSignInput]] = NullPort[TList[ContainerSignInput]]()
@@ -61,6 +133,9 @@ class SignContainers(Tractor):
         ThreadPoolExecutor(pool_size=5, executor_type="thread_pool_executor")
     )
     a_dry_run: Port[bool] = Port[bool](data=False)
+    a_pipelined: Port[bool] = Port[bool](data=False)
+    a_populate_digests_max_workers: Port[int] = Port[int](data=20)
+    a_resolve_digest_head: Port[bool] = Port[bool](data=False)
 
     t_extract_references: STMDExtractContainerSignInput = STMDExtractContainerSignInput(
         uid="extract_references", i_model=i_containers_to_sign, a_field="reference"
@@ -72,11 +147,12 @@ class SignContainers(Tractor):
             a_executor=a_executor,
         )
     )
-    t_populate_digests: STMDPopulateContainerDigest = STMDPopulateContainerDigest(
+    t_populate_digests: BulkPopulateContainerDigest = BulkPopulateContainerDigest(
         uid="populate_digests",
         r_quay_client=r_dst_quay_client,
         i_container_parts=t_parse_container_references._raw_o_container_parts,
-        a_executor=a_executor,
+        a_max_workers=a_populate_digests_max_workers,
+        a_resolve_digest_head=a_resolve_digest_head,
     )
     t_extract_identities: STMDExtractContainerSignInput = STMDExtractContainerSignInput(
         uid="extract_identities", i_model=i_containers_to_sign, a_field="identity"
@@ -97,22 +173,43 @@ class SignContainers(Tractor):
         uid="flatten_entries",
         i_complex=t_make_sign_entries_from_push_item._raw_o_sign_entries,
     )
+    t_group_entries: GroupSignEntries = GroupSignEntries(
+        uid="group_entries",
+        i_sign_entries=t_flatten_entries._raw_o_flat,
+    )
     i_chunk_size: Port[int] = Port[int](data=1000)
+    a_target_chunk_duration: Port[float] = Port[float](data=0.0)
 
     t_chunk_entries: ChunkSignEntries = ChunkSignEntries(
         uid="chunk_entries",
-        i_sign_entries=t_flatten_entries._raw_o_flat,
+        r_signer_wrapper=r_signer_wrapper,
+        i_sign_entries=t_group_entries._raw_o_sign_entries,
         i_chunk_size=i_chunk_size,
     )
 
+    t_select_chunks: SelectSignChunks = SelectSignChunks(
+        uid="select_chunks",
+        i_chunked_sign_entries=t_chunk_entries._raw_o_chunked_sign_entries,
+        a_pipelined=a_pipelined,
+        a_target_chunk_duration=a_target_chunk_duration,
+    )
+
     t_sign_entries: STMDSignSignEntries = STMDSignSignEntries(
         uid="sign_entries",
-        i_sign_entries=t_chunk_entries._raw_o_chunked_sign_entries,
+        i_sign_entries=t_select_chunks._raw_o_chunked_sign_entries,
         i_task_id=i_task_id,
         r_signer_wrapper=r_signer_wrapper,
         a_dry_run=a_dry_run,
         a_executor=a_sign_executor,
     )
+    t_pipelined_sign_entries: PipelinedSignSignEntries = PipelinedSignSignEntries(
+        uid="pipelined_sign_entries",
+        i_sign_entries=t_select_chunks._raw_o_pipelined_sign_entries,
+        i_task_id=i_task_id,
+        r_signer_wrapper=r_signer_wrapper,
+        a_dry_run=a_dry_run,
+        a_target_chunk_duration=a_target_chunk_duration,
+    )
     o_sign_entries: Port[TList[SignEntry]] = t_flatten_entries._raw_o_flat
 
     d_: str = """markdown
@@ -129,7 +226,14 @@ Signing consists of these steps:
 
 - Convert containers to signing entries.
   This includes populating manifests digests for given references. For that `r_dst_quay_client`
-  is used. This steps also runs in parallel using `a_executor`.
+  is used. Each unique reference is fetched once, by up to `a_populate_digests_max_workers`
+  threads. With `a_resolve_digest_head` set, digests are resolved from manifest headers and
+  each manifest list is fetched only once for all references pointing to it.
+  With AsyncQuayClient as `r_dst_quay_client`, requests of all references are multiplexed over
+  its connection pool instead of the threads.
+  Other steps run in parallel using `a_executor`.
+- Deduplicate signing entries and group them by digest and signing key, so entries of
+  the same manifest (e.g. floating tags) are processed in the same chunk.
 - Split populated signing entries into chunks. This is important for next step as
   if anything happens during signing process, provided references could be at least partially
   signed (before the error)
@@ -139,13 +243,41 @@ Signing consists of these steps:
 - Sign filtered references
 - Store signatures to sigstore
 
+Chunks are filtered, signed and stored by separate tractions running in `a_sign_executor`.
+With `a_pipelined` set, chunks are processed by one traction instead, which filters and signs
+next chunk while signatures of the previous chunk are stored.
+
 """
     d_i_task_id: str = "Task ID to identify signing request."
     d_i_containers_to_sign: str = "List of ContainerSignInput models to sign."
     d_a_executor: str = "Executor used for parallel processing."
+    d_a_populate_digests_max_workers: str = (
+        "Maximum number of manifests fetched at the same time when populating digests."
+    )
+    d_a_resolve_digest_head: str = (
+        "Resolve digests from manifest headers and fetch each manifest list only once."
+    )
     d_i_chunk_size: str = (
         "Size of each chunk used to split sign entries to chunks for parallel signing."
     )
+    d_a_target_chunk_duration: str = (
+        "Desired seconds spent signing one chunk. If set, chunk sizes adapt to measured"
+        + " latency of the signer, bounded by chunk size. Chunks are then signed by pipelined"
+        + " signing, which measures the latency while signing. 0 disables adaptive chunking."
+    )
     d_o_sign_entries: str = "List of SignEntry objects signed."
     d_r_signer_wrapper: str = "Signer wrapper used to sign container images with cosign."
     d_a_dry_run: str = "Dry run flag to simulate signing without actual signing."
+    d_a_pipelined: str = (
+        "Filter, sign and store chunks in overlapping stages instead of running separate"
+        + " traction for each chunk."
+    )
+
+    def _run(self) -> "SignContainers":
+        try:
+            super()._run()
+        finally:
+            # Entrypoint worker processes aren't needed once all chunks are signed.
+            if self.r_signer_wrapper:
+                self.r_signer_wrapper.close()
+        return self
@@ -2,16 +2,18 @@ from typing import Union, Optional
 import os
 
 from pytractions.base import TList, Port, NullPort
-from pytractions.traction import Traction, TractionFailedError
+from pytractions.traction import Traction, TractionFailedError, TractionState
 from pytractions.stmd import STMD
 from pytractions.executor import ThreadPoolExecutor, LoopExecutor, ProcessPoolExecutor
 from pytractions.transformations import ListMultiplier, Flatten
 from pytractions.tractor import Tractor
 
-from ..tractions.containers import STMDGetContainerImageTags
+from ..tractions.containers import STMDGetContainerImageTags, PreauthorizeRepositories
 
 from ..resources.quay_client import QuayClient
+from ..resources.async_quay_client import AsyncQuayClient
 from ..resources.fake_quay_client import FakeQuayClient
+from ..resources.tag_snapshot import TagSnapshotIndex
 from signtractions.resources.cosign import CosignClient, FakeCosignClient
 
 from ..resources import SIGNING_WRAPPERS
@@ -58,12 +60,22 @@ class MakeContainerSignInput(Traction):
 STMDMakeContainerSignInputs = STMD.wrap(MakeContainerSignInput)
 
 
+def _tractions_succeeded(tractor: Tractor) -> bool:
+    """Check none of tractions (including nested ones) of the tractor errored or failed."""
+    for traction in tractor.tractions.values():
+        if traction.state in (TractionState.ERROR, TractionState.FAILED):
+            return False
+        if isinstance(traction, Tractor) and not _tractions_succeeded(traction):
+            return False
+    return True
+
+
 class SignRepos(Tractor):
     """Sign a repository."""
 
     r_signer_wrapper: Port[SIGNING_WRAPPERS] = NullPort[SIGNING_WRAPPERS]()
-    r_dst_quay_client: Port[Union[QuayClient, FakeQuayClient]] = NullPort[
-        Union[QuayClient, FakeQuayClient]
+    r_dst_quay_client: Port[Union[QuayClient, AsyncQuayClient, FakeQuayClient]] = NullPort[
+        Union[QuayClient, AsyncQuayClient, FakeQuayClient]
     ]()
     r_cosign_client: Port[Union[CosignClient, FakeCosignClient]] = NullPort[
         Union[CosignClient, FakeCosignClient]
@@ -81,6 +93,10 @@ class SignRepos(Tractor):
         Union[ProcessPoolExecutor, ThreadPoolExecutor, LoopExecutor]
     ](data=ThreadPoolExecutor(pool_size=5, executor_type="thread_pool_executor"))
     a_dry_run: Port[bool] = Port[bool](data=False)
+    a_preauthorize_batch_size: Port[int] = Port[int](data=0)
+    a_tag_snapshot_file: Port[str] = Port[str](data="")
+    a_pipelined: Port[bool] = Port[bool](data=False)
+    a_resolve_digest_head: Port[bool] = Port[bool](data=False)
 
     t_decide_repos: DecideRepos = DecideRepos(
         uid="decide_repos",
@@ -88,12 +104,21 @@ class SignRepos(Tractor):
         i_container_image_repo_file=i_container_image_repos_file,
     )
 
+    t_preauthorize_repos: PreauthorizeRepositories = PreauthorizeRepositories(
+        uid="preauthorize_repos",
+        i_container_image_repos=t_decide_repos.o_container_image_repos,
+        r_quay_client=r_dst_quay_client,
+        a_batch_size=a_preauthorize_batch_size,
+    )
+
     t_get_container_image_tags: STMDGetContainerImageTags = STMDGetContainerImageTags(
         uid="get_container_image_tags",
         r_quay_client=r_dst_quay_client,
         i_container_image_repo=t_decide_repos.o_container_image_repos,
         i_container_image_repo_identities=i_container_image_repo_identities,
+        i_signing_key=i_signing_key,
         a_executor=a_executor_2,
+        a_tag_snapshot_file=a_tag_snapshot_file,
     )
 
     t_flatten_container_references: Flatten[str] = Flatten[str](
@@ -119,6 +144,7 @@ class SignRepos(Tractor):
     )
 
     i_chunk_size: Port[int] = Port[int](data=50)
+    a_target_chunk_duration: Port[float] = Port[float](data=0.0)
     t_sign_containers: SignContainers = SignContainers(
         uid="sign_containers",
         r_signer_wrapper=r_signer_wrapper,
@@ -128,7 +154,10 @@ class SignRepos(Tractor):
         a_executor=a_executor_2,
         a_sign_executor=a_sign_executor,
         a_dry_run=a_dry_run,
+        a_pipelined=a_pipelined,
+        a_resolve_digest_head=a_resolve_digest_head,
         i_chunk_size=i_chunk_size,
+        a_target_chunk_duration=a_target_chunk_duration,
     )
     o_sign_entries: Port[TList[SignEntry]] = t_sign_containers.o_sign_entries
 
@@ -146,6 +175,11 @@ of <registry>/<repository>
     d_i_chunk_size: str = (
         "Size of each chunk used to split sign entries to chunks for parallel signing."
     )
+    d_a_target_chunk_duration: str = (
+        "Desired seconds spent signing one chunk. If set, chunk sizes adapt to measured"
+        + " latency of the signer, bounded by chunk size. Chunks are then signed by pipelined"
+        + " signing, which measures the latency while signing. 0 disables adaptive chunking."
+    )
     d_i_container_image_repos: str = "List of repositories to sign"
     d_i_container_image_repos_file: str = (
         "List of repositories to sign stored in a file. One repo per line"
@@ -160,6 +194,35 @@ of <registry>/<repository>
     d_a_sign_executor: str = "Executor used for signing."
     d_a_executor_2: str = "Executor used for parallel preprocessing of the input."
     d_a_dry_run: str = "Dry run flag to simulate signing without actual signing."
+    d_a_resolve_digest_head: str = (
+        "Resolve digests from manifest headers and fetch each manifest list only once"
+        + " for all tags pointing to it."
+    )
+    d_a_pipelined: str = (
+        "Filter, sign and store chunks in overlapping stages instead of running separate"
+        + " traction for each chunk."
+    )
+    d_a_preauthorize_batch_size: str = (
+        "Number of repositories covered by one registry token requested before listing tags."
+        + " 0 disables pre-authorization."
+    )
+    d_a_tag_snapshot_file: str = (
+        "Path to tag snapshot index. If set, only tags which are new or changed since"
+        + " the last successful run with the same signing key and identities are signed."
+    )
     d_r_dst_quay_client: str = (
         "Quay client used for fetching container images when populating digests in SignEntries."
+        + " AsyncQuayClient fetches manifests of all references concurrently."
     )
+
+    def _run(self) -> "SignRepos":
+        super()._run()
+        # Nested tractors finish even when some of their tractions errored, so tags are
+        # committed to the snapshot only when every step of the signing succeeded.
+        if self.a_tag_snapshot_file and not self.a_dry_run:
+            if _tractions_succeeded(self):
+                with TagSnapshotIndex(self.a_tag_snapshot_file) as index:
+                    index.commit(self.tractions["t_decide_repos"].o_container_image_repos)
+            else:
+                self.log.warning("Signing didn't succeed, tag snapshot is not updated")
+        return self
@@ -14,13 +14,14 @@ from ..tractions.containers import (
     STMDGetContainerImageTags,
 )
 from ..tractions.signing import STMDSignEntriesFromContainerParts
-from ..tractions.verify import VerifyEntriesCosign, VerifyEntriesLegacy, STMDVerifyEntryCosign
+from ..tractions.verify import VerifyEntriesCosign, VerifyEntriesLegacy
 
 from ..tractors.t_sign_repos import DecideRepos
 
 from ..resources.quay_client import QuayClient
 from ..resources.signing_wrapper import MsgSignerWrapper, CosignSignerWrapper
 from ..resources.fake_signing_wrapper import FakeCosignSignerWrapper
+from ..resources.async_quay_client import AsyncQuayClient
 from ..resources.fake_quay_client import FakeQuayClient
 from ..resources.sigstore import Sigstore
 from ..resources.fake_sigstore import FakeSigstore
@@ -82,8 +83,8 @@ class Verifier(Tractor):
     r_signer_wrapper_cosign: Port[
         Union[FakeCosignSignerWrapper, MsgSignerWrapper, CosignSignerWrapper]
     ] = NullPort[Union[FakeCosignSignerWrapper, MsgSignerWrapper, CosignSignerWrapper]]()
-    r_dst_quay_client: Union[QuayClient, FakeQuayClient] = NullPort[
-        Union[QuayClient, FakeQuayClient]
+    r_dst_quay_client: Union[QuayClient, AsyncQuayClient, FakeQuayClient] = NullPort[
+        Union[QuayClient, AsyncQuayClient, FakeQuayClient]
     ]()
     r_sigstore: Port[Union[Sigstore, FakeSigstore]] = NullPort[Union[Sigstore, FakeSigstore]]()
     r_gsheets: Port[Union[GSheets, FakeGSheets]] = NullPort[Union[GSheets, FakeGSheets]]()
@@ -98,6 +99,7 @@ class Verifier(Tractor):
         pool_size=1, executor_type="thread_pool_executor"
     )
     a_dry_run: bool = False
+    a_legacy_max_workers: Port[int] = Port[int](data=10)
 
     t_parse_container_references: STMDParseContainerImageReference = (
         STMDParseContainerImageReference(
@@ -128,11 +130,13 @@ class Verifier(Tractor):
         i_sign_entries=t_flatten_sign_entries._raw_o_flat,
         i_rekor_public_key_file=i_rekor_public_key_file,
         i_public_key_file=i_public_key_file,
+        r_quay_client=r_dst_quay_client,
     )
     t_verify_entries_legacy: VerifyEntriesLegacy = VerifyEntriesLegacy(
         uid="verify_entries_legacy",
         i_sign_entries=t_flatten_sign_entries._raw_o_flat,
         r_sigstore=r_sigstore,
+        a_max_workers=a_legacy_max_workers,
     )
     t_evaluate: Evaluate = Evaluate(
         uid="evaluate_entries",
@@ -153,13 +157,14 @@ For this tractor they do no need to make sense."""
     d_r_gsheets: str = "Google Sheets client."
     d_a_executor: str = "Executor to use."
     d_a_dry_run: str = "Dry run mode."
+    d_a_legacy_max_workers: str = "Maximum number of entries verified in legacy sigstore at once."
 
 
 class VerifyRepos(Tractor):
     """Sign container images."""
 
-    r_dst_quay_client: Union[QuayClient, FakeQuayClient] = NullPort[
-        Union[QuayClient, FakeQuayClient]
+    r_dst_quay_client: Union[QuayClient, AsyncQuayClient, FakeQuayClient] = NullPort[
+        Union[QuayClient, AsyncQuayClient, FakeQuayClient]
     ]()
     r_sigstore: Port[Union[Sigstore, FakeSigstore]] = NullPort[Union[Sigstore, FakeSigstore]]()
 
@@ -174,6 +179,11 @@ class VerifyRepos(Tractor):
         pool_size=10, executor_type="thread_pool_executor"
     )
     a_dry_run: bool = False
+    a_cosign_batch_size: Port[int] = Port[int](data=50)
+    a_cosign_max_workers: Port[int] = Port[int](data=0)
+    a_cosign_native: Port[bool] = Port[bool](data=False)
+    a_cosign_prefilter: Port[bool] = Port[bool](data=False)
+    a_legacy_max_workers: Port[int] = Port[int](data=10)
 
     t_decide_repos: DecideRepos = DecideRepos(
         uid="decide_repos",
@@ -199,6 +209,11 @@ class VerifyRepos(Tractor):
         i_complex=t_get_container_image_tags.o_container_identities,
     )
 
+    t_flatten_signature_tags: Flatten[str] = Flatten[str](
+        uid="flatten_signature_tags",
+        i_complex=t_get_container_image_tags.o_signature_tags,
+    )
+
     t_populate_signing_keys: ListMultiplier[str, str] = ListMultiplier[str, str](
         uid="populate_signing_keys",
         i_scalar=i_signing_key,
@@ -232,16 +247,23 @@ class VerifyRepos(Tractor):
         uid="flatten_sign_entries",
         i_complex=t_make_sign_entries._raw_o_sign_entries,
     )
-    t_verify_entries_cosign: STMDVerifyEntryCosign = STMDVerifyEntryCosign(
+    t_verify_entries_cosign: VerifyEntriesCosign = VerifyEntriesCosign(
         uid="verify_entries_cosign",
-        i_sign_entry=t_flatten_sign_entries._raw_o_flat,
+        i_sign_entries=t_flatten_sign_entries._raw_o_flat,
         i_rekor_public_key_file=i_rekor_public_key_file,
         i_public_key_file=i_public_key_file,
+        i_signature_tags=t_flatten_signature_tags._raw_o_flat,
+        a_batch_size=a_cosign_batch_size,
+        a_max_workers=a_cosign_max_workers,
+        a_native=a_cosign_native,
+        a_prefilter=a_cosign_prefilter,
+        r_quay_client=r_dst_quay_client,
     )
     t_verify_entries_legacy: VerifyEntriesLegacy = VerifyEntriesLegacy(
         uid="verify_entries_legacy",
         i_sign_entries=t_flatten_sign_entries._raw_o_flat,
         r_sigstore=r_sigstore,
+        a_max_workers=a_legacy_max_workers,
     )
 
     d_i_public_key_file: str = "Public key file to verify cosign signatures."
@@ -252,3 +274,15 @@ For this tractor they do no need to make sense."""
     d_r_sigstore: str = "Sigstore client."
     d_a_executor: str = "Executor to use."
     d_a_dry_run: str = "Dry run mode."
+    d_a_legacy_max_workers: str = "Maximum number of entries verified in legacy sigstore at once."
+    d_a_cosign_batch_size: str = "Maximum number of references verified by one cosign invocation."
+    d_a_cosign_max_workers: str = (
+        "Maximum number of cosign processes running at the same time. 0 uses number of CPUs."
+    )
+    d_a_cosign_native: str = (
+        "Verify signatures made with the key and their transparency log bundle in-process,"
+        + " cosign verifies only the rest."
+    )
+    d_a_cosign_prefilter: str = (
+        "Mark entries without signature tag in the repository as unverified without verifying."
+    )
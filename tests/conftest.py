@@ -5,10 +5,28 @@ import tempfile
 from pytractions.base import TList, TDict
 from signtractions.resources.fake_signing_wrapper import FakeCosignSignerWrapper, FakeEPRunArgs
 from signtractions.resources.signing_wrapper import CosignSignerSettings
+from signtractions.resources.chunking import clear_signer_latencies
+from signtractions.resources.utils import misc
 
 from signtractions.models.quay import QuayTag
 
 
+@pytest.fixture(autouse=True)
+def clear_entry_points():
+    # Tests mock entry points differently, don't let resolved ones leak between them
+    misc.ENTRY_POINTS.clear()
+    yield
+    misc.ENTRY_POINTS.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_latencies():
+    # Signer latencies measured by one test would change chunking of the others
+    clear_signer_latencies()
+    yield
+    clear_signer_latencies()
+
+
 @pytest.fixture
 def fix_manifest_v2s2():
     return {
@@ -0,0 +1,329 @@
+import asyncio
+import hashlib
+import json
+from unittest import mock
+
+import httpx
+import pytest
+import requests
+
+from signtractions.resources import async_quay_client
+from signtractions.resources import exceptions
+from signtractions.resources import quay_client
+
+
+def make_client(handler, **kwargs):
+    client = async_quay_client.AsyncQuayClient(
+        username="user", password="pass", host="quay.io", **kwargs
+    )
+    mock.patch.object(
+        client,
+        "_make_client",
+        return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    ).start()
+    return client
+
+
+def test_get_manifest_authenticate():
+    manifest = {"mediaType": "application/vnd.docker.distribution.manifest.v2+json"}
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        if request.url.host == "auth.quay.io":
+            return httpx.Response(200, json={"token": "abcdef"})
+        if request.headers.get("Authorization") != "Bearer abcdef":
+            return httpx.Response(
+                401,
+                headers={
+                    "WWW-Authenticate": 'Bearer realm="https://auth.quay.io/v2/auth",'
+                    'service="quay.io",scope="repository:namespace/image:pull"'
+                },
+            )
+        return httpx.Response(
+            200,
+            json=manifest,
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.v2+json"},
+        )
+
+    client = make_client(handler)
+    try:
+        ret = client.get_manifest(
+            "quay.io/namespace/image:1",
+            media_type="application/vnd.docker.distribution.manifest.v2+json",
+        )
+        # token is reused for the repository
+        client.get_manifest(
+            "quay.io/namespace/image:2",
+            media_type="application/vnd.docker.distribution.manifest.v2+json",
+        )
+    finally:
+        client.close()
+
+    assert ret == manifest
+    assert [str(r.url) for r in requests_seen] == [
+        "https://quay.io/v2/namespace/image/manifests/1",
+        "https://auth.quay.io/v2/auth?service=quay.io&scope=repository%3Anamespace%2Fimage%3Apull",
+        "https://quay.io/v2/namespace/image/manifests/1",
+        "https://quay.io/v2/namespace/image/manifests/2",
+    ]
+
+
+def test_get_manifests_concurrently():
+    def handler(request):
+        tag = request.url.path.split("/")[-1]
+        return httpx.Response(
+            200,
+            text=json.dumps({"tag": tag}),
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.list.v2+json"},
+        )
+
+    client = make_client(handler, manifest_negotiation=True)
+    try:
+        ret = client.get_manifests(
+            ["quay.io/namespace/image:{0}".format(i) for i in range(50)], raw=True
+        )
+    finally:
+        client.close()
+
+    assert ret == [json.dumps({"tag": str(i)}) for i in range(50)]
+
+
+def test_get_manifest_not_found():
+    def handler(request):
+        return httpx.Response(404)
+
+    client = make_client(handler)
+    try:
+        with pytest.raises(exceptions.ManifestNotFoundError):
+            client.get_manifest_digest("quay.io/namespace/image:1")
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_manifest("quay.io/namespace/image:1")
+    finally:
+        client.close()
+
+
+def test_get_repository_tags_pagination():
+    def handler(request):
+        if "last" not in request.url.params:
+            return httpx.Response(
+                200,
+                json={"name": "namespace/image", "tags": ["1", "2"]},
+                headers={"Link": '</v2/namespace/image/tags/list?last=2>; rel="next"'},
+            )
+        return httpx.Response(200, json={"name": "namespace/image", "tags": ["3"]})
+
+    client = make_client(handler)
+    try:
+        ret = client.get_repository_tags("namespace/image")
+    finally:
+        client.close()
+
+    assert ret == {"name": "namespace/image", "tags": ["1", "2", "3"]}
+
+
+def test_get_quay_repository_tags():
+    def handler(request):
+        assert request.headers["Authorization"] == "Bearer oauth-token"
+        if request.url.params["page"] == "0":
+            return httpx.Response(200, json={"tags": ["t1", "t2"]})
+        return httpx.Response(200, json={"tags": []})
+
+    client = make_client(handler, token="oauth-token")
+    try:
+        assert client.get_quay_repository_tags("repo") == ["t1", "t2"]
+    finally:
+        client.close()
+
+
+def test_get_quay_repository_tags_window():
+    def handler(request):
+        assert request.url.params["limit"] == "2"
+        page = int(request.url.params["page"])
+        if page < 3:
+            return httpx.Response(200, json={"tags": ["t{0}".format(page)]})
+        return httpx.Response(200, json={"tags": []})
+
+    client = make_client(handler, token="oauth-token", tag_page_limit=2, tag_page_window=2)
+    try:
+        assert client.get_quay_repository_tags("repo") == ["t0", "t1", "t2"]
+    finally:
+        client.close()
+
+
+def test_iter_repository_tags_pagination():
+    def handler(request):
+        if "last" not in request.url.params:
+            return httpx.Response(
+                200,
+                json={"name": "namespace/image", "tags": ["1", "2"]},
+                headers={"Link": '</v2/namespace/image/tags/list?last=2>; rel="next"'},
+            )
+        return httpx.Response(200, json={"name": "namespace/image", "tags": ["3"]})
+
+    client = make_client(handler)
+    try:
+        assert list(client.iter_repository_tags("namespace/image")) == ["1", "2", "3"]
+    finally:
+        client.close()
+
+
+def test_get_manifest_shared_token_cache():
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        assert request.headers["Authorization"] == "Bearer preauthorized"
+        return httpx.Response(
+            200,
+            json={},
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.v2+json"},
+        )
+
+    token_cache = quay_client.BearerTokenCache()
+    key = ("https://auth.quay.io/v2/auth", "quay.io", "repository:namespace/image:pull", "user")
+    token_cache.put(key, "preauthorized", 300)
+    client = make_client(handler)
+    client.set_token_cache(token_cache)
+    token_cache.set_hint(client._repository_token_hint("namespace/image"), key)
+    try:
+        client.get_manifest(
+            "quay.io/namespace/image:1",
+            media_type="application/vnd.docker.distribution.manifest.v2+json",
+        )
+    finally:
+        client.close()
+
+    # no 401 round trip as the token obtained elsewhere is used
+    assert len(requests_seen) == 1
+
+
+def test_get_manifest_cached_tag_revalidate():
+    manifest = json.dumps({"mediaType": "application/vnd.docker.distribution.manifest.v2+json"})
+    digest = "sha256:" + hashlib.sha256(manifest.encode("utf-8")).hexdigest()
+    methods = []
+
+    def handler(request):
+        methods.append(request.method)
+        return httpx.Response(
+            200,
+            text=manifest if request.method == "GET" else "",
+            headers={
+                "Content-Type": "application/vnd.docker.distribution.manifest.v2+json",
+                "Docker-Content-Digest": digest,
+            },
+        )
+
+    client = make_client(handler, manifest_cache_size=10)
+    try:
+        media_type = "application/vnd.docker.distribution.manifest.v2+json"
+        first = client.get_manifest("quay.io/namespace/image:1", raw=True, media_type=media_type)
+        second = client.get_manifest("quay.io/namespace/image:1", raw=True, media_type=media_type)
+        by_digest = client.get_manifest("quay.io/namespace/image@" + digest, raw=True)
+    finally:
+        client.close()
+
+    assert first == second == by_digest == manifest
+    # tag which wasn't fetched before isn't revalidated
+    assert methods == ["GET", "HEAD"]
+
+
+def test_resolve_manifest_digest():
+    def handler(request):
+        assert request.method == "HEAD"
+        return httpx.Response(
+            200,
+            headers={
+                "Content-Type": "application/vnd.docker.distribution.manifest.list.v2+json",
+                "Docker-Content-Digest": "sha256:abc",
+            },
+        )
+
+    client = make_client(handler)
+    try:
+        assert client.resolve_manifest_digest("quay.io/namespace/image:1") == (
+            "sha256:abc",
+            "application/vnd.docker.distribution.manifest.list.v2+json",
+        )
+    finally:
+        client.close()
+
+
+def test_iter_repository_tags_abandoned():
+    closed = []
+
+    async def tags():
+        try:
+            yield "1"
+            yield "2"
+        finally:
+            closed.append(True)
+
+    client = make_client(lambda request: httpx.Response(500))
+    try:
+        iterator = client._iter_sync(tags())
+        assert next(iterator) == "1"
+        iterator.close()
+        assert closed == [True]
+    finally:
+        client.close()
+
+
+def test_get_manifest_disk_cache_in_thread(tmp_path):
+    manifest = json.dumps({"mediaType": "application/vnd.docker.distribution.manifest.v2+json"})
+    digest = "sha256:" + hashlib.sha256(manifest.encode("utf-8")).hexdigest()
+
+    def handler(request):
+        return httpx.Response(
+            200,
+            text=manifest,
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.v2+json"},
+        )
+
+    client = make_client(handler, manifest_cache_dir=str(tmp_path))
+    try:
+        with mock.patch(
+            "signtractions.resources.async_quay_client.asyncio.to_thread",
+            side_effect=asyncio.to_thread,
+        ) as to_thread:
+            client.get_manifest("quay.io/namespace/image@" + digest, raw=True)
+    finally:
+        client.close()
+
+    # cache lookup and store don't block the event loop
+    assert to_thread.call_count == 2
+    assert quay_client.ManifestCache(cache_dir=str(tmp_path)).get("namespace/image", digest)
+
+
+def test_transport_error_mapped():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client(handler)
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get_manifest("quay.io/namespace/image:1")
+    finally:
+        client.close()
+
+
+def test_resolve_manifest_digests():
+    def handler(request):
+        tag = request.url.path.split("/")[-1]
+        return httpx.Response(
+            200,
+            headers={
+                "Content-Type": "application/vnd.docker.distribution.manifest.v2+json",
+                "Docker-Content-Digest": "sha256:" + tag,
+            },
+        )
+
+    client = make_client(handler)
+    try:
+        ret = client.resolve_manifest_digests(
+            ["quay.io/namespace/image:1", "quay.io/namespace/image:2"]
+        )
+    finally:
+        client.close()
+
+    assert [digest for digest, _ in ret] == ["sha256:1", "sha256:2"]
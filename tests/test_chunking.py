@@ -0,0 +1,47 @@
+import pytest
+
+from signtractions.resources.chunking import AdaptiveChunkSizer, LatencyStats, signer_latency
+
+
+def test_latency_stats():
+    stats = LatencyStats(smoothing=0.5)
+    assert stats.per_entry is None
+    stats.record(0, 1)
+    assert stats.per_entry is None
+    stats.record(10, 2)
+    assert stats.per_entry == pytest.approx(0.2)
+    stats.record(10, 4)
+    assert stats.per_entry == pytest.approx(0.3)
+
+
+def test_signer_latency_shared():
+    assert signer_latency("msg_signer", "sign") is signer_latency("msg_signer", "sign")
+    assert signer_latency("msg_signer", "sign") is not signer_latency("msg_signer", "store")
+
+
+def test_adaptive_chunk_sizer_grows_without_latency():
+    sizer = AdaptiveChunkSizer([LatencyStats()], 10, max_size=50, initial_size=5)
+    assert [len(chunk) for chunk in sizer.chunks(list(range(100)))] == [5, 10, 20, 40, 25]
+
+
+def test_adaptive_chunk_sizer_follows_latency():
+    sign, store = LatencyStats(), LatencyStats()
+    sizer = AdaptiveChunkSizer([sign, store], 10, max_size=1000, initial_size=5)
+    assert sizer.next_size() == 5
+    sign.record(5, 0.5)
+    store.record(5, 0.5)
+    # 0.2s per entry, but growth is limited to double of the previous chunk
+    assert sizer.next_size() == 10
+    assert sizer.next_size() == 20
+    assert sizer.next_size() == 40
+    assert sizer.next_size() == 50
+    # signer got slower, sign latency moves to 0.37s per entry
+    sign.record(10, 10)
+    assert sizer.next_size() == 21
+
+
+def test_adaptive_chunk_sizer_max_size():
+    latency = LatencyStats()
+    latency.record(1000, 1)
+    sizer = AdaptiveChunkSizer([latency], 10, max_size=30)
+    assert [len(chunk) for chunk in sizer.chunks(list(range(70)))] == [30, 30, 10]
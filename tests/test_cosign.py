@@ -0,0 +1,244 @@
+import base64
+import hashlib
+import json
+import subprocess
+from unittest import mock
+
+import pytest
+from pytractions.base import TDict, TList
+
+from signtractions.models.quay import QuayRepo, QuayTag
+from signtractions.resources import cosign
+from signtractions.resources.cosign import NativeCosignVerifier, verify_batched
+from signtractions.resources.fake_quay_client import FakeQuayClient
+
+
+def fake_cosign(failing):
+    def run(cmd, **kwargs):
+        references = cmd[4:]
+        failed = [r for r in references if r in failing]
+        return subprocess.CompletedProcess(
+            cmd,
+            1 if failed else 0,
+            stdout="verified {0}".format(" ".join(references)),
+            stderr="failed {0}".format(" ".join(failed)),
+        )
+
+    return run
+
+
+def test_verify_batched():
+    references = ["quay.io/ns/repo:{0}".format(i) for i in range(8)]
+    with mock.patch("subprocess.run", side_effect=fake_cosign({references[5]})) as mock_run:
+        results = verify_batched("key.pub", references + references[:2], batch_size=4)
+
+    assert {r: res.verified for r, res in results.items()} == {
+        r: r != references[5] for r in references
+    }
+    assert results[references[5]].stderr == "failed quay.io/ns/repo:5"
+    # 2 batches, failing one is bisected down to the failing reference, failed half is
+    # bisected once the other half is verified
+    assert [len(c.args[0]) - 4 for c in mock_run.call_args_list] == [4, 4, 2, 2, 1, 1]
+    assert mock_run.call_args_list[0].args[0][:4] == ["cosign", "verify", "--key", "key.pub"]
+
+
+def test_verify_batched_all_failing():
+    references = ["quay.io/ns/repo:{0}".format(i) for i in range(100)]
+    with mock.patch("subprocess.run", side_effect=fake_cosign(set(references))) as mock_run:
+        results = verify_batched("key.pub", references, batch_size=50)
+
+    assert not any(result.verified for result in results.values())
+    # first batch and its halves fail, so its references are verified one by one,
+    # second batch is verified one by one right away as most references failed
+    assert [len(c.args[0]) - 4 for c in mock_run.call_args_list] == [50, 25, 25] + [1] * 100
+
+
+def test_verify_batched_all_failing_concurrent():
+    references = ["quay.io/ns/repo:{0}".format(i) for i in range(50)]
+    with mock.patch("subprocess.run", side_effect=fake_cosign(set(references))) as mock_run:
+        results = verify_batched("key.pub", references, batch_size=50, max_workers=4)
+
+    assert len(results) == 50
+    assert mock_run.call_count <= 4 + 8 + 50
+
+
+def make_quay_client():
+    return FakeQuayClient(
+        username="user",
+        password="pass",
+        host="quay.io",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+
+
+def populate_signatures(quay_client, digest, signatures):
+    """Store cosign signature manifest of the digest, signatures are (signature, annotations)."""
+    payload = json.dumps(
+        {"critical": {"image": {"docker-manifest-digest": digest}, "type": "cosign"}}
+    )
+    payload_digest = "sha256:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    quay_client.populate_blob(f"quay.io/ns/repo@{payload_digest}", payload)
+    layers = []
+    for signature, annotations in signatures:
+        annotations = dict(annotations)
+        annotations[cosign.SIGNATURE_ANNOTATION] = base64.b64encode(signature).decode()
+        layers.append({"digest": payload_digest, "annotations": annotations})
+    quay_client.populate_manifest(
+        f"quay.io/ns/repo:{cosign.signature_tag(digest)}",
+        cosign.SIGNATURE_MANIFEST_TYPE,
+        False,
+        json.dumps({"layers": layers}),
+    )
+    return payload
+
+
+@pytest.fixture
+def fake_crypto():
+    with (
+        mock.patch.object(cosign, "native_verification_available", return_value=True),
+        mock.patch.object(cosign, "load_public_key", return_value="key"),
+        mock.patch.object(
+            cosign,
+            "verify_signature",
+            side_effect=lambda key, signature, payload: signature == b"good",
+        ),
+        mock.patch.object(
+            cosign,
+            "verify_bundle",
+            side_effect=lambda rekor_key, key, bundle, signature, payload: bundle.get("valid"),
+        ),
+    ):
+        yield
+
+
+def test_native_verifier(fake_crypto):
+    quay_client = make_quay_client()
+    bundle = {cosign.BUNDLE_ANNOTATION: '{"valid": true}'}
+    invalid_bundle = {cosign.BUNDLE_ANNOTATION: '{"valid": false}'}
+    payload = populate_signatures(quay_client, "sha256:aa", [(b"bad", bundle), (b"good", bundle)])
+    populate_signatures(quay_client, "sha256:bb", [(b"bad", bundle)])
+    populate_signatures(quay_client, "sha256:cc", [(b"good", invalid_bundle)])
+    verifier = NativeCosignVerifier(quay_client, "key.pub", "rekor.pub")
+
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:aa") == (True, payload, "")
+    assert not verifier.verify("quay.io/ns/repo@sha256:bb", "sha256:bb").verified
+    # valid signature with invalid signed entry timestamp isn't verified
+    assert not verifier.verify("quay.io/ns/repo:1", "sha256:cc").verified
+
+
+def test_native_verifier_fallback(fake_crypto):
+    quay_client = make_quay_client()
+    populate_signatures(quay_client, "sha256:aa", [(b"good", {})])
+    populate_signatures(
+        quay_client,
+        "sha256:bb",
+        [(b"good", {cosign.BUNDLE_ANNOTATION: "{}", cosign.CERTIFICATE_ANNOTATION: "cert"})],
+    )
+    # unsupported kind of logged entry
+    populate_signatures(quay_client, "sha256:dd", [(b"good", {cosign.BUNDLE_ANNOTATION: "{}"})])
+    populate_signatures(quay_client, "sha256:ee", [(b"good", {cosign.BUNDLE_ANNOTATION: "{"})])
+    verifier = NativeCosignVerifier(quay_client, "key.pub", "rekor.pub")
+
+    # cosign rejects signatures without bundle, keyless signatures, missing signature
+    # manifest and malformed bundles are left for cosign too
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:aa") is None
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:bb") is None
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:cc") is None
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:dd") is None
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:ee") is None
+    with mock.patch.object(cosign, "native_verification_available", return_value=False):
+        assert verifier.verify("quay.io/ns/repo:1", "sha256:aa") is None
+    # signed entry timestamp can't be verified without rekor public key
+    populate_signatures(quay_client, "sha256:ff", [(b"good", {cosign.BUNDLE_ANNOTATION: "{}"})])
+    verifier = NativeCosignVerifier(quay_client, "key.pub", "")
+    assert verifier.verify("quay.io/ns/repo:1", "sha256:ff") is None
+
+
+def test_native_verifier_unexpected_error(fake_crypto):
+    quay_client = make_quay_client()
+    verifier = NativeCosignVerifier(quay_client, "key.pub", "rekor.pub")
+
+    with mock.patch.object(FakeQuayClient, "get_manifest", side_effect=RuntimeError("bug")):
+        with pytest.raises(RuntimeError, match="bug"):
+            verifier.verify("quay.io/ns/repo:1", "sha256:aa")
+
+
+def make_bundle(rekor_private_key, private_key, signature, payload, kind="hashedrekord"):
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    body = {
+        "apiVersion": "0.0.1",
+        "kind": kind,
+        "spec": {
+            "data": {"hash": {"algorithm": "sha256", "value": hashlib.sha256(payload).hexdigest()}},
+            "signature": {
+                "content": base64.b64encode(signature).decode(),
+                "publicKey": {"content": base64.b64encode(public_pem).decode()},
+            },
+        },
+    }
+    rekor_payload = {
+        "body": base64.b64encode(json.dumps(body).encode()).decode(),
+        "integratedTime": 1700000000,
+        "logIndex": 42,
+        "logID": "c0d23d6ad406973f9559f3ba2d1ca01f84147d8ffc5b8445c224f98b9591801d",
+    }
+    canonical = json.dumps(rekor_payload, sort_keys=True, separators=(",", ":")).encode()
+    signed_entry_timestamp = rekor_private_key.sign(canonical, ec.ECDSA(hashes.SHA256()))
+    return {
+        "SignedEntryTimestamp": base64.b64encode(signed_entry_timestamp).decode(),
+        "Payload": rekor_payload,
+    }
+
+
+def test_verify_bundle():
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    rekor_private_key = ec.generate_private_key(ec.SECP256R1())
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    other_key = ec.generate_private_key(ec.SECP256R1())
+    payload = b'{"critical": {}}'
+    signature = private_key.sign(payload, ec.ECDSA(hashes.SHA256()))
+    rekor_key, public_key = rekor_private_key.public_key(), private_key.public_key()
+    bundle = make_bundle(rekor_private_key, private_key, signature, payload)
+
+    assert cosign.verify_bundle(rekor_key, public_key, bundle, signature, payload)
+    # bundle logs other payload, signature or key
+    assert not cosign.verify_bundle(rekor_key, public_key, bundle, signature, b"other")
+    assert not cosign.verify_bundle(rekor_key, public_key, bundle, b"other", payload)
+    assert not cosign.verify_bundle(rekor_key, other_key.public_key(), bundle, signature, payload)
+    # signed entry timestamp isn't made by the transparency log
+    assert not cosign.verify_bundle(other_key.public_key(), public_key, bundle, signature, payload)
+    tampered = dict(bundle, Payload=dict(bundle["Payload"], logIndex=43))
+    assert not cosign.verify_bundle(rekor_key, public_key, tampered, signature, payload)
+    # entries of other kinds are left for cosign
+    bundle = make_bundle(rekor_private_key, private_key, signature, payload, kind="intoto")
+    assert cosign.verify_bundle(rekor_key, public_key, bundle, signature, payload) is None
+
+
+def test_verify_signature(tmp_path):
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    key_file = tmp_path / "key.pub"
+    key_file.write_bytes(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    )
+    signature = private_key.sign(b"payload", ec.ECDSA(hashes.SHA256()))
+    public_key = cosign.load_public_key(str(key_file))
+
+    assert cosign.load_public_key(str(key_file)) is public_key
+    assert cosign.verify_signature(public_key, signature, b"payload")
+    assert not cosign.verify_signature(public_key, signature, b"other")
@@ -0,0 +1,107 @@
+import shutil
+import subprocess
+from unittest import mock
+
+import pytest
+
+from signtractions.resources.gpg import (
+    BatchDecryptor,
+    DecryptedFiles,
+    DecryptionFailed,
+    decrypt_files,
+)
+
+
+def fake_decrypt_files(contents):
+    failed = b"bad" in contents
+    return DecryptedFiles(
+        2 if failed else 0,
+        [None if content == b"bad" else content.upper() for content in contents],
+        b"bad signature" if failed else b"",
+    )
+
+
+def test_batch_decryptor():
+    contents = [b"a", b"b", b"bad", b"c"]
+    decryptor = BatchDecryptor(batch_size=4, linger=5)
+    with mock.patch(
+        "signtractions.resources.gpg.decrypt_files", side_effect=fake_decrypt_files
+    ) as mock_decrypt:
+        futures = [decryptor.submit(content) for content in contents]
+        assert [f.result(timeout=5) for f in futures[:2] + futures[3:]] == [b"A", b"B", b"C"]
+        with pytest.raises(DecryptionFailed) as exc:
+            futures[2].result(timeout=5)
+
+    assert exc.value.stderr == b"bad signature"
+    # one batch, then bisection of the failed batch
+    assert [c.args[0] for c in mock_decrypt.call_args_list] == [
+        [b"a", b"b", b"bad", b"c"],
+        [b"a", b"b"],
+        [b"bad", b"c"],
+        [b"bad"],
+        [b"c"],
+    ]
+
+
+def test_batch_decryptor_cancelled():
+    decryptor = BatchDecryptor(batch_size=2, linger=5)
+    with mock.patch(
+        "signtractions.resources.gpg.decrypt_files", side_effect=fake_decrypt_files
+    ) as mock_decrypt:
+        cancelled = decryptor.submit(b"a")
+        cancelled.cancel()
+        future = decryptor.submit(b"b")
+        assert future.result(timeout=5) == b"B"
+
+    assert [c.args[0] for c in mock_decrypt.call_args_list] == [[b"b"]]
+
+
+def test_batch_decryptor_missing_output():
+    decryptor = BatchDecryptor(batch_size=2, linger=5)
+    with mock.patch(
+        "signtractions.resources.gpg.decrypt_files",
+        return_value=DecryptedFiles(0, [b"A", None], b"no output"),
+    ):
+        futures = [decryptor.submit(b"a"), decryptor.submit(b"b")]
+        assert futures[0].result(timeout=5) == b"A"
+        with pytest.raises(DecryptionFailed) as exc:
+            futures[1].result(timeout=5)
+    assert exc.value.stderr == b"no output"
+
+
+def test_batch_decryptor_close():
+    with mock.patch(
+        "signtractions.resources.gpg.decrypt_files", side_effect=fake_decrypt_files
+    ) as mock_decrypt:
+        with BatchDecryptor(batch_size=10, workers=2, linger=5) as decryptor:
+            futures = [decryptor.submit(content) for content in [b"a", b"b"]]
+            threads = list(decryptor._threads)
+        # closing doesn't wait for linger and decrypts what was submitted
+        assert [f.result(timeout=0) for f in futures] == [b"A", b"B"]
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sum(len(c.args[0]) for c in mock_decrypt.call_args_list) == 2
+    with pytest.raises(RuntimeError):
+        decryptor.submit(b"c")
+
+
+@pytest.mark.skipif(shutil.which("gpg") is None, reason="gpg is not installed")
+def test_decrypt_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("GNUPGHOME", str(tmp_path))
+    tmp_path.chmod(0o700)
+    subprocess.run(
+        ["gpg", "-q", "--batch", "--passphrase", "", "--quick-gen-key", "test", "ed25519"],
+        check=True,
+        capture_output=True,
+    )
+
+    def sign(content):
+        return subprocess.run(
+            ["gpg", "-q", "--batch", "--sign"], input=content, check=True, capture_output=True
+        ).stdout
+
+    assert decrypt_files([sign(b"first"), sign(b"second")])[:2] == (0, [b"first", b"second"])
+    result = decrypt_files([sign(b"first"), b"garbage"])
+    assert result.returncode != 0
+    assert result.outputs == [b"first", None]
+    subprocess.run(["gpgconf", "--kill", "gpg-agent"], capture_output=True)
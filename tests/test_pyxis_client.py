@@ -0,0 +1,74 @@
+import pytest
+import requests
+import requests_mock
+
+from signtractions.resources.pyxis_client import PyxisSignatureClient, get_pyxis_signature_client
+
+
+def test_get_signatures_paging():
+    client = PyxisSignatureClient("pyxis.example.com", cert_file="crt", key_file="key")
+    client.PAGE_SIZE = 2
+    pages = [
+        [{"manifest_digest": "sha256:1"}, {"manifest_digest": "sha256:2"}],
+        [{"manifest_digest": "sha256:3"}],
+    ]
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://pyxis.example.com/v1/signatures",
+            [{"json": {"data": page}} for page in pages],
+        )
+        signatures = client.get_signatures(["sha256:1", "sha256:2", "sha256:3"])
+
+    assert [sig["manifest_digest"] for sig in signatures] == ["sha256:1", "sha256:2", "sha256:3"]
+    assert [r.qs["page"] for r in m.request_history] == [["0"], ["1"]]
+    assert m.request_history[0].qs["filter"] == ["manifest_digest=in=(sha256:1,sha256:2,sha256:3)"]
+    assert client.session.cert == ("crt", "key")
+
+
+def test_get_signatures_empty():
+    client = PyxisSignatureClient("https://pyxis.example.com")
+    with requests_mock.Mocker() as m:
+        assert client.get_signatures([]) == []
+    assert not m.request_history
+
+
+def test_upload_and_delete_signatures():
+    client = PyxisSignatureClient("https://pyxis.example.com/")
+    signatures = [{"manifest_digest": "sha256:{0}".format(i)} for i in range(5)]
+    with requests_mock.Mocker() as m:
+        m.post("https://pyxis.example.com/v1/signatures", json={})
+        m.delete(requests_mock.ANY, json={})
+        client.upload_signatures(signatures, threads=3)
+        client.delete_signatures(["id1", "id2"], threads=3)
+
+    posted = sorted(r.json()["manifest_digest"] for r in m.request_history if r.method == "POST")
+    assert posted == [sig["manifest_digest"] for sig in signatures]
+    deleted = sorted(r.path for r in m.request_history if r.method == "DELETE")
+    assert deleted == ["/v1/signatures/id/id1", "/v1/signatures/id/id2"]
+
+
+def test_upload_signatures_error():
+    client = PyxisSignatureClient("https://pyxis.example.com", retries=0)
+    with requests_mock.Mocker() as m:
+        m.post("https://pyxis.example.com/v1/signatures", status_code=400)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.upload_signatures([{"manifest_digest": "sha256:1"}])
+
+
+def test_upload_signatures_not_retried_after_sent():
+    client = PyxisSignatureClient("https://pyxis.example.com")
+    retry = client.session.get_adapter("https://pyxis.example.com").max_retries
+    assert retry.is_retry("GET", 503)
+    assert retry.is_retry("DELETE", 503)
+    # upload may have been stored by the server
+    assert not retry.is_retry("POST", 503)
+    assert not retry._is_method_retryable("POST")
+    assert retry.connect == 3
+
+
+def test_get_pyxis_signature_client_shared():
+    client = get_pyxis_signature_client("pyxis.example.com", cert_file="crt", key_file="key")
+    assert (
+        get_pyxis_signature_client("pyxis.example.com", cert_file="crt", key_file="key") is client
+    )
+    assert get_pyxis_signature_client("pyxis.example.com") is not client
@@ -1,4 +1,7 @@
 import json
+import re
+import threading
+import time
 from unittest import mock
 import pytest
 import requests
@@ -638,6 +641,28 @@ def test_get_repository_tags_pagination():
         assert m.call_count == 3
 
 
+def test_iter_repository_tags_pagination():
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/tags/list",
+            json={"name": "namespace/image", "tags": ["1", "2"]},
+            headers={"Link": '</v2/namespace/image/tags/list/next-page-2>; rel="next"'},
+        )
+        m.get(
+            "https://quay.io/v2/namespace/image/tags/list/next-page-2",
+            json={"name": "namespace/image", "tags": ["3"]},
+        )
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        tags = client.iter_repository_tags("namespace/image")
+        assert m.call_count == 0
+        assert [next(tags), next(tags)] == ["1", "2"]
+        # next page is fetched only when tags of the first one are consumed
+        assert m.call_count == 1
+        assert list(tags) == ["3"]
+        assert m.call_count == 2
+
+
 def test_get_repository_tags_pagination_cannot_parse_url():
     with requests_mock.Mocker() as m:
         m.get(
@@ -737,3 +762,416 @@ def test_get_quay_repository_tag():
         tags = client.get_quay_repository_tags("repo")
         assert tags == ["t1", "t2"]
         assert m.call_count == 2
+
+
+def test_iter_quay_repository_tags():
+    with requests_mock.Mocker() as m:
+        m.get("https://quay.io/api/v1/repository/repo/tag?page=0", json={"tags": ["t1", "t2"]})
+        m.get("https://quay.io/api/v1/repository/repo/tag?page=1", json={"tags": ["t3"]})
+        m.get("https://quay.io/api/v1/repository/repo/tag?page=2", json={"tags": []})
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        tags = client.iter_quay_repository_tags("repo")
+        assert next(tags) == "t1"
+        assert m.call_count == 1
+        assert list(tags) == ["t2", "t3"]
+        assert m.call_count == 3
+
+
+def test_get_quay_repository_tag_parallel():
+    def tags_response(request, context):
+        page = int(request.qs["page"][0])
+        assert request.qs["limit"] == ["2"]
+        time.sleep(0.01 * (5 - page) if page < 5 else 0)
+        if page >= 3:
+            return {"tags": []}
+        return {"tags": ["t{0}".format(page * 2), "t{0}".format(page * 2 + 1)]}
+
+    with requests_mock.Mocker() as m:
+        m.get(re.compile("https://quay.io/api/v1/repository/repo/tag"), json=tags_response)
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", tag_page_window=4
+        )
+        tags = client.get_quay_repository_tags("repo", limit=2)
+        assert tags == ["t0", "t1", "t2", "t3", "t4", "t5"]
+        # pages after the first empty one are not requested
+        assert max(int(r.qs["page"][0]) for r in m.request_history) <= 6
+
+
+def test_get_quay_repository_tag_parallel_has_additional():
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/api/v1/repository/repo/tag?page=0",
+            json={"tags": ["t1", "t2"], "has_additional": True},
+        )
+        m.get(
+            "https://quay.io/api/v1/repository/repo/tag?page=1",
+            json={"tags": ["t3"], "has_additional": False},
+        )
+        m.get(
+            "https://quay.io/api/v1/repository/repo/tag?page=2",
+            json={"tags": ["t4"], "has_additional": True},
+        )
+        m.get("https://quay.io/api/v1/repository/repo/tag?page=3", json={"tags": []})
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        tags = client.get_quay_repository_tags("repo", window=3)
+        assert tags == ["t1", "t2", "t3"]
+
+
+def test_get_manifest_cached_digest():
+    manifest = (
+        '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json",'
+        ' "size": 429, "digest": "sha256:6d5f4d65fg4d6f54g",'
+        ' "platform": {"architecture": "arm64", "os": "linux"}}'
+    )
+    digest = "sha256:b9742c91f353022604e8ed4cf4ab1d688114fc4b133f0e11cbf7dd6272753ac8"
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/{0}".format(digest),
+            text=manifest,
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.v2+json"},
+        )
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", manifest_cache_size=10
+        )
+        ret1 = client.get_manifest("quay.io/namespace/image@{0}".format(digest), raw=True)
+        assert m.call_count == 2
+        ret2 = client.get_manifest("quay.io/namespace/image@{0}".format(digest), raw=True)
+        assert m.call_count == 2
+
+    assert ret1 == manifest
+    assert ret2 == manifest
+
+
+def test_get_manifest_cached_tag_revalidate():
+    manifest = (
+        '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json",'
+        ' "size": 429, "digest": "sha256:6d5f4d65fg4d6f54g",'
+        ' "platform": {"architecture": "arm64", "os": "linux"}}'
+    )
+    digest = "sha256:b9742c91f353022604e8ed4cf4ab1d688114fc4b133f0e11cbf7dd6272753ac8"
+    media_type = "application/vnd.docker.distribution.manifest.v2+json"
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            text=manifest,
+            headers={"Content-Type": media_type},
+        )
+        m.head(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            headers={"Content-Type": media_type, "Docker-Content-Digest": digest},
+        )
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", manifest_cache_size=10
+        )
+        client.get_manifest("quay.io/namespace/image:1", raw=True, media_type=media_type)
+        ret = client.get_manifest("quay.io/namespace/image:1", raw=True, media_type=media_type)
+        # tag which wasn't fetched before isn't revalidated
+        assert [r.method for r in m.request_history] == ["GET", "HEAD"]
+
+    assert ret == manifest
+
+
+def test_get_manifest_cached_tag_revalidate_any_type():
+    manifest = '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json"}'
+    digest = quay_client._sha256_digest(manifest)
+    media_type = "application/vnd.docker.distribution.manifest.v2+json"
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            text=manifest,
+            headers={"Content-Type": media_type},
+        )
+        m.head(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            headers={"Content-Type": media_type, "Docker-Content-Digest": digest},
+        )
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", manifest_cache_size=10
+        )
+        client.get_manifest("quay.io/namespace/image:1", raw=True)
+        m.reset_mock()
+        ret = client.get_manifest("quay.io/namespace/image:1", raw=True)
+        # first HEAD providing the digest is enough, even if its type isn't preferred one
+        assert [r.method for r in m.request_history] == ["HEAD"]
+
+    assert ret == manifest
+
+
+def test_manifest_cache_disk(tmp_path):
+    manifest = '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json"}'
+    digest = quay_client._sha256_digest(manifest)
+
+    cache = quay_client.ManifestCache(max_size=1, cache_dir=str(tmp_path))
+    cache.put("namespace/image", digest, "application/json", manifest)
+    cache.put("namespace/image", "sha256:other", "application/json", "{}")
+
+    # first entry was evicted from memory, but it's loaded from the disk
+    assert cache.get("namespace/image", digest) == ("application/json", manifest)
+    # entry not matching its digest is ignored
+    assert (
+        quay_client.ManifestCache(cache_dir=str(tmp_path)).get("namespace/image", "sha256:other")
+        is None
+    )
+    assert cache.get("namespace/other", digest) is None
+
+
+def test_manifest_cache_disk_malformed(tmp_path):
+    manifest = '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json"}'
+    digest = quay_client._sha256_digest(manifest)
+    cache = quay_client.ManifestCache(cache_dir=str(tmp_path))
+    cache.put("namespace/image", digest, "application/json", manifest)
+    path = cache._path("namespace/image", digest)
+
+    for content in ['{"manifest": "{}"}', "[]", "{broken"]:
+        with open(path, "w") as f:
+            f.write(content)
+        assert (
+            quay_client.ManifestCache(cache_dir=str(tmp_path)).get("namespace/image", digest)
+            is None
+        )
+
+
+def test_manifest_cache_disk_tags(tmp_path):
+    cache = quay_client.ManifestCache(cache_dir=str(tmp_path))
+    assert cache.get_tag("namespace/image", "1") is None
+    cache.put_tag("namespace/image", "1", "sha256:abc")
+    assert cache.get_tag("namespace/image", "1") == "sha256:abc"
+    assert quay_client.ManifestCache(cache_dir=str(tmp_path)).get_tag("namespace/image", "1") == (
+        "sha256:abc"
+    )
+
+
+def test_get_manifest_negotiation():
+    ml = {
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+        "manifests": [],
+    }
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            json=ml,
+            headers={"Content-Type": "application/vnd.docker.distribution.manifest.list.v2+json"},
+        )
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", manifest_negotiation=True
+        )
+        ret_manifest = client.get_manifest("quay.io/namespace/image:1")
+        assert m.call_count == 1
+        assert m.request_history[0].headers["Accept"] == (
+            "application/vnd.docker.distribution.manifest.list.v2+json;q=1.0, "
+            "application/vnd.docker.distribution.manifest.v2+json;q=0.9, "
+            "application/vnd.oci.image.index.v1+json;q=0.8, "
+            "application/vnd.oci.image.manifest.v1+json;q=0.7, "
+            "application/vnd.docker.distribution.manifest.v1+json;q=0.6"
+        )
+
+    assert ret_manifest == ml
+
+
+def test_get_manifest_negotiation_fallback():
+    v2s1_manifest = {"name": "hello-world", "schemaVersion": 1}
+    v2s2_manifest = {"mediaType": "application/vnd.docker.distribution.manifest.v2+json"}
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            [
+                {
+                    "headers": {
+                        "Content-Type": "application/vnd.docker.distribution.manifest.v1+json"
+                    },
+                    "json": v2s1_manifest,
+                },
+                {
+                    "headers": {
+                        "Content-Type": "application/vnd.docker.distribution.manifest.v1+json"
+                    },
+                    "json": v2s1_manifest,
+                },
+                {
+                    "headers": {
+                        "Content-Type": "application/vnd.docker.distribution.manifest.v2+json"
+                    },
+                    "json": v2s2_manifest,
+                },
+            ],
+        )
+
+        client = quay_client.QuayClient(
+            username="user", password="pass", host="quay.io", manifest_negotiation=True
+        )
+        ret_manifest = client.get_manifest("quay.io/namespace/image:1")
+        assert m.call_count == 3
+
+    assert ret_manifest == v2s2_manifest
+
+
+def test_resolve_manifest_digest_head():
+    media_type = "application/vnd.docker.distribution.manifest.v2+json"
+    with requests_mock.Mocker() as m:
+        m.head(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            headers={"Content-Type": media_type, "Docker-Content-Digest": "sha256:123456"},
+        )
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        ret = client.resolve_manifest_digest("quay.io/namespace/image:1", media_type=media_type)
+        assert m.call_count == 1
+
+    assert ret == ("sha256:123456", media_type)
+
+
+def test_resolve_manifest_digest_text_plain():
+    manifest = (
+        '{"mediaType": "application/vnd.docker.distribution.manifest.v2+json",'
+        ' "size": 429, "digest": "sha256:6d5f4d65fg4d6f54g",'
+        ' "platform": {"architecture": "arm64", "os": "linux"}}'
+    )
+    media_type = "application/vnd.docker.distribution.manifest.v1+json"
+    with requests_mock.Mocker() as m:
+        m.head(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            headers={"Content-Type": "text/plain", "Docker-Content-Digest": "sha256:123456"},
+        )
+        m.get(
+            "https://quay.io/v2/namespace/image/manifests/1",
+            text=manifest,
+            headers={"Content-Type": "text/plain"},
+        )
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        ret = client.resolve_manifest_digest("quay.io/namespace/image:1", media_type=media_type)
+        assert [r.method for r in m.request_history] == ["HEAD", "GET"]
+
+    assert ret == (
+        "sha256:b9742c91f353022604e8ed4cf4ab1d688114fc4b133f0e11cbf7dd6272753ac8",
+        "text/plain",
+    )
+
+
+def test_resolve_manifest_digest_not_found():
+    client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+    with requests_mock.Mocker() as m:
+        m.head("https://quay.io/v2/namespace/image/manifests/1", status_code=404)
+
+        with pytest.raises(exceptions.ManifestNotFoundError):
+            client.resolve_manifest_digest("quay.io/namespace/image:1")
+
+
+def test_request_quay_shared_token():
+    def registry_response(request, context):
+        if request.headers.get("Authorization") != "Bearer abcdef":
+            context.status_code = 401
+            context.headers["WWW-Authenticate"] = (
+                'Bearer realm="https://auth.quay.io/v2/auth",service="quay.io",'
+                'scope="repository:namespace/image:pull"'
+            )
+            return ""
+        return "data"
+
+    with requests_mock.Mocker() as m:
+        m.get("https://auth.quay.io/v2/auth", json={"token": "abcdef", "expires_in": 300})
+        m.get("https://quay.io/v2/namespace/image/manifests/1", text=registry_response)
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        assert client._request_quay("GET", "namespace/image/manifests/1").text == "data"
+
+        # other thread uses token obtained by the first one without hitting 401
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(
+                client._request_quay("GET", "namespace/image/manifests/1").text
+            )
+        )
+        thread.start()
+        thread.join()
+
+        assert results == ["data"]
+        assert [(r.hostname, r.headers.get("Authorization")) for r in m.request_history] == [
+            ("quay.io", None),
+            ("auth.quay.io", mock.ANY),
+            ("quay.io", "Bearer abcdef"),
+            ("quay.io", "Bearer abcdef"),
+        ]
+
+
+def test_bearer_token_cache_single_flight():
+    cache = quay_client.BearerTokenCache()
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        time.sleep(0.1)
+        return {"token": "token-{0}".format(len(fetched))}
+
+    threads = [
+        threading.Thread(target=cache.get_or_fetch, args=(("realm", "service", "scope"), fetch))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fetched) == 1
+    assert cache.get(("realm", "service", "scope")) == "token-1"
+    # rejected token is refreshed
+    assert (
+        cache.get_or_fetch(("realm", "service", "scope"), fetch, stale_token="token-1") == "token-2"
+    )
+
+
+def test_bearer_token_cache_expired():
+    cache = quay_client.BearerTokenCache(expiry_margin=10)
+    cache.get_or_fetch(("realm", "service", "scope"), lambda: {"token": "t", "expires_in": 5})
+    assert cache.get(("realm", "service", "scope")) is None
+
+
+def test_preauthorize():
+    challenge = 'Bearer realm="https://auth.quay.io/v2/auth",service="quay.io"'
+
+    def registry_response(request, context):
+        if request.headers.get("Authorization") != "Bearer abcdef":
+            context.status_code = 401
+            context.headers["WWW-Authenticate"] = challenge
+            return ""
+        return "data"
+
+    with requests_mock.Mocker() as m:
+        m.get("https://quay.io/v2/", status_code=401, headers={"WWW-Authenticate": challenge})
+        m.get("https://auth.quay.io/v2/auth", json={"token": "abcdef", "expires_in": 300})
+        m.get("https://quay.io/v2/namespace/image1/tags/list", text=registry_response)
+        m.get("https://quay.io/v2/namespace/image2/tags/list", text=registry_response)
+
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        client.preauthorize(["namespace/image1", "namespace/image2", "namespace/image3"], 2)
+
+        assert client._request_quay("GET", "namespace/image1/tags/list").text == "data"
+        assert client._request_quay("GET", "namespace/image2/tags/list").text == "data"
+        auth_requests = [r for r in m.request_history if r.hostname == "auth.quay.io"]
+        assert [r.qs["scope"] for r in auth_requests] == [
+            ["repository:namespace/image1:pull", "repository:namespace/image2:pull"],
+            ["repository:namespace/image3:pull"],
+        ]
+        # no request was rejected
+        assert m.call_count == 5
+
+
+def test_preauthorize_no_auth_required():
+    with requests_mock.Mocker() as m:
+        m.get("https://quay.io/v2/", text="{}")
+        client = quay_client.QuayClient(username="user", password="pass", host="quay.io")
+        client.preauthorize(["namespace/image1"])
+        assert m.call_count == 1
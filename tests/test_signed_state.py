@@ -0,0 +1,78 @@
+import time
+
+from signtractions.resources.signed_state import SignedStateIndex
+
+
+def test_signed_state_index_replay(tmp_path):
+    path = str(tmp_path / "signed_state.jsonl")
+    index = SignedStateIndex(path)
+    index.add_fetched(["sha256:1", "sha256:2"], [("sha256:1", "quay.io/ns/repo:1", "key")])
+    index.add_signatures([("sha256:2", "quay.io/ns/repo:2", "key")])
+    index.invalidate(["sha256:3"])
+
+    reloaded = SignedStateIndex(path)
+    assert reloaded.complete_digests(["sha256:1", "sha256:2", "sha256:3"], 60) == {
+        "sha256:1",
+        "sha256:2",
+    }
+    assert reloaded.signatures(["sha256:1", "sha256:2"]) == {
+        ("sha256:1", "quay.io/ns/repo:1", "key"),
+        ("sha256:2", "quay.io/ns/repo:2", "key"),
+    }
+
+
+def test_signed_state_index_reconcile_interval(tmp_path):
+    index = SignedStateIndex(str(tmp_path / "signed_state.jsonl"))
+    index.add_fetched(["sha256:1"], [], timestamp=time.time() - 120)
+    index.add_fetched(["sha256:2"], [])
+    assert index.complete_digests(["sha256:1", "sha256:2"], 60) == {"sha256:2"}
+
+
+def test_signed_state_index_fetch_replaces_signatures(tmp_path):
+    path = str(tmp_path / "signed_state.jsonl")
+    index = SignedStateIndex(path)
+    index.add_signatures([("sha256:1", "quay.io/ns/repo:1", "key")])
+    index.add_fetched(["sha256:1"], [("sha256:1", "quay.io/ns/repo:2", "key")])
+    index.invalidate(["sha256:2"])
+    with open(path, "a") as f:
+        f.write('{"op": "signat')
+
+    assert SignedStateIndex(path).signatures(["sha256:1"]) == {
+        ("sha256:1", "quay.io/ns/repo:2", "key")
+    }
+
+
+def test_signed_state_index_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(SignedStateIndex, "COMPACT_MIN_RECORDS", 10)
+    path = str(tmp_path / "signed_state.jsonl")
+    index = SignedStateIndex(path)
+    for n in range(4):
+        # each fetch replaces signatures of the previous one
+        index.add_fetched(["sha256:1"], [("sha256:1", f"quay.io/ns/repo:{n}", "key")])
+    with open(path) as f:
+        lines = f.readlines()
+    # 12 records written, compacted to the signature and fetched record of the last fetch
+    assert len(lines) == 2
+    assert index.signatures(["sha256:1"]) == {("sha256:1", "quay.io/ns/repo:3", "key")}
+
+    reloaded = SignedStateIndex(path)
+    assert reloaded.signatures(["sha256:1"]) == {("sha256:1", "quay.io/ns/repo:3", "key")}
+    assert reloaded.complete_digests(["sha256:1"], 60) == {"sha256:1"}
+
+
+def test_signed_state_index_open(tmp_path):
+    path = str(tmp_path / "signed_state.jsonl")
+    index = SignedStateIndex.open(path)
+    index.add_signatures([("sha256:1", "quay.io/ns/repo:1", "key")])
+    # own writes don't reload the index
+    assert SignedStateIndex.open(path) is index
+
+    other = SignedStateIndex(path)
+    time.sleep(0.01)
+    other.add_signatures([("sha256:2", "quay.io/ns/repo:2", "key")])
+    reloaded = SignedStateIndex.open(path)
+    assert reloaded is not index
+    assert reloaded.signatures(["sha256:1", "sha256:2"]) == {
+        ("sha256:1", "quay.io/ns/repo:1", "key"),
+        ("sha256:2", "quay.io/ns/repo:2", "key"),
+    }
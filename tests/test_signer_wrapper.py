@@ -1,7 +1,11 @@
+import json
+import os
 from unittest import mock
 import pytest
 
 from signtractions.resources.signing_wrapper import (
+    CosignSignerSettings,
+    CosignSignerWrapper,
     SignerWrapper,
     SignerWrapperSettings,
     SignEntry,
@@ -9,6 +13,7 @@ from signtractions.resources.signing_wrapper import (
     MsgSignerSettings,
     SigningError,
 )
+from signtractions.resources.utils import misc
 
 
 def test_signer_wrapper_run_entrypoint():
@@ -21,6 +26,40 @@ def test_signer_wrapper_run_entrypoint():
         assert sw.entry_point == m
 
 
+def test_signer_wrapper_warms_entry_points():
+    sw = CosignSignerWrapper(
+        label="cosign_signer", config_file="test", settings=CosignSignerSettings()
+    )
+    with mock.patch.object(misc.ENTRY_POINTS, "warm") as warm, mock.patch.object(
+        misc.ENTRY_POINTS, "load", return_value=len
+    ):
+        assert sw.entry_point is len
+    warm.assert_called_once_with(["modules"])
+
+
+def test_signer_wrapper_entry_points_file(tmp_path):
+    ep_file = tmp_path / "entry_points.txt"
+    ep_file.write_text("[modules]\npubtools-sign-cosign-container-sign = builtins:len\n")
+    sw = CosignSignerWrapper(
+        label="cosign_signer",
+        config_file="test",
+        entry_points_file=str(ep_file),
+        settings=CosignSignerSettings(),
+    )
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        assert sw.entry_point is len
+    mock_entry_points.assert_not_called()
+
+
+def test_signer_wrapper_close():
+    sw = SignerWrapper(config_file="", settings=SignerWrapperSettings())
+    with mock.patch(
+        "signtractions.resources.signing_wrapper.shutdown_entry_point_process_pool"
+    ) as mocked_shutdown:
+        sw.close()
+    mocked_shutdown.assert_called_once_with()
+
+
 def test_signer_wrapper_remove_signatures():
     with mock.patch(
         "signtractions.resources.signing_wrapper.SignerWrapper._run_remove_signatures"
@@ -370,3 +409,359 @@ def test_msg_signer_remove_signature():
                 )
             ]
         )
+
+
+def test_msg_signer_wrapper_filter_to_sign_signed_state_index(tmp_path):
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            signed_state_index_file=str(tmp_path / "signed_state.jsonl"),
+        ),
+    )
+    entries = [
+        SignEntry(
+            repo="containers/podman",
+            reference="quay.io/containers/podman:latest",
+            identity="quay.io/containers/podman:latest",
+            digest="sha256:123456",
+            arch="amd64",
+            signing_key="signing_key",
+        ),
+        SignEntry(
+            repo="containers/podman",
+            reference="quay.io/containers/podman:1",
+            identity="quay.io/containers/podman:1",
+            digest="sha256:123456",
+            arch="amd64",
+            signing_key="signing_key",
+        ),
+    ]
+    with mock.patch(
+        "signtractions.resources.signing_wrapper.MsgSignerWrapper._fetch_signatures"
+    ) as mocked_fetch_signatures, mock.patch(
+        "signtractions.resources.signing_wrapper.run_entrypoint"
+    ):
+        mocked_fetch_signatures.return_value = [
+            {
+                "reference": "quay.io/containers/podman:latest",
+                "manifest_digest": "sha256:123456",
+                "sig_key_id": "signing_key",
+            }
+        ]
+        assert msw._filter_to_sign(entries) == [entries[1]]
+        mocked_fetch_signatures.assert_called_once_with(["sha256:123456"])
+
+        msw._store_signed(
+            {
+                "operation": {"references": ["quay.io/containers/podman:1"]},
+                "signing_key": "signing_key",
+                "operation_results": [
+                    (
+                        {
+                            "msg": {
+                                "repo": "containers/podman",
+                                "signed_claim": "signed_claim",
+                                "manifest_digest": "sha256:123456",
+                            },
+                        },
+                        True,
+                    )
+                ],
+            }
+        )
+
+        # digest is resolved from the index without asking Pyxis again
+        mocked_fetch_signatures.reset_mock()
+        assert msw._filter_to_sign(entries) == []
+        mocked_fetch_signatures.assert_called_once_with([])
+
+
+def test_msg_signer_fetch_signatures_concurrent():
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            pyxis_search_threads=4,
+            max_manifest_digests_per_search_request=3,
+        ),
+    )
+    chunks = []
+
+    def get_signatures(args):
+        assert args[0] == "pubtools-pyxis-get-signatures"
+        with open(args[args.index("--manifest-digest") + 1][1:]) as f:
+            chunk = json.load(f)
+        chunks.append(chunk)
+        return [{"manifest_digest": digest} for digest in chunk]
+
+    digests = ["sha256:{0:02d}".format(i) for i in range(10)]
+    with mock.patch("importlib.metadata.entry_points") as mock_load_entry_point:
+        mock_load_entry_point.return_value = [
+            mock.Mock(load=mock.Mock(return_value=get_signatures))
+        ]
+        signatures = list(msw._fetch_signatures(digests + digests[:2]))
+
+    assert sorted(sig["manifest_digest"] for sig in signatures) == digests
+    assert sorted(len(chunk) for chunk in chunks) == [1, 3, 3, 3]
+
+
+def test_msg_signer_fetch_signatures_concurrent_restores_environment(monkeypatch):
+    monkeypatch.delenv("REQUESTS_CA_BUNDLE", raising=False)
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test-ca",
+            pyxis_search_threads=4,
+            max_manifest_digests_per_search_request=3,
+        ),
+    )
+
+    def get_signatures(args):
+        assert os.environ["REQUESTS_CA_BUNDLE"] == "test-ca"
+        with open(args[args.index("--manifest-digest") + 1][1:]) as f:
+            return [{"manifest_digest": digest} for digest in json.load(f)]
+
+    digests = ["sha256:{0:02d}".format(i) for i in range(10)]
+    with mock.patch("importlib.metadata.entry_points") as mock_load_entry_point:
+        mock_load_entry_point.return_value = [
+            mock.Mock(load=mock.Mock(return_value=get_signatures))
+        ]
+        signatures = []
+        for signature in msw._fetch_signatures(digests):
+            # entry point environment isn't left set while the caller consumes signatures
+            assert "REQUESTS_CA_BUNDLE" not in os.environ
+            signatures.append(signature)
+
+    assert sorted(sig["manifest_digest"] for sig in signatures) == digests
+
+
+def test_msg_signer_search_chunk_size():
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            pyxis_search_threads=4,
+        ),
+    )
+    # small sets are split between all the threads
+    assert msw._search_chunk_size(20) == 5
+    assert msw._search_chunk_size(1000) == 50
+
+
+def test_msg_signer_pyxis_direct():
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="pyxis.example.com",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            pyxis_search_threads=2,
+            max_manifest_digests_per_search_request=2,
+            pyxis_direct=True,
+        ),
+    )
+    signed_results = {
+        "signing_key": "key",
+        "operation": {"references": ["quay.io/ns/repo:1"]},
+        "operation_results": [
+            [{"msg": {"manifest_digest": "sha256:1", "repo": "ns/repo", "signed_claim": "c"}}]
+        ],
+    }
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points, mock.patch(
+        "signtractions.resources.pyxis_client.PyxisSignatureClient.get_signatures",
+        side_effect=lambda chunk: [{"manifest_digest": digest} for digest in chunk],
+    ) as mock_get, mock.patch(
+        "signtractions.resources.pyxis_client.PyxisSignatureClient.upload_signatures"
+    ) as mock_upload, mock.patch(
+        "signtractions.resources.pyxis_client.PyxisSignatureClient.delete_signatures"
+    ) as mock_delete:
+        signatures = list(msw._fetch_signatures(["sha256:1", "sha256:2", "sha256:3"]))
+        msw._run_store_signed(signed_results)
+        msw._run_remove_signatures(["id1"])
+
+    mock_entry_points.assert_not_called()
+    assert sorted(sig["manifest_digest"] for sig in signatures) == [
+        "sha256:1",
+        "sha256:2",
+        "sha256:3",
+    ]
+    assert sorted(len(call.args[0]) for call in mock_get.call_args_list) == [1, 2]
+    mock_upload.assert_called_once_with(
+        [
+            {
+                "manifest_digest": "sha256:1",
+                "reference": "quay.io/ns/repo:1",
+                "repository": "ns/repo",
+                "sig_key_id": "key",
+                "signature_data": "c",
+            }
+        ],
+        threads=7,
+    )
+    mock_delete.assert_called_once_with(["id1"], threads=7)
+
+
+def test_msg_signer_fetch_signatures_isolated():
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            pyxis_search_threads=2,
+            max_manifest_digests_per_search_request=1,
+            entry_point_processes=2,
+        ),
+    )
+    with mock.patch(
+        "signtractions.resources.signing_wrapper.run_entrypoint_isolated"
+    ) as mocked_run_isolated, mock.patch(
+        "signtractions.resources.signing_wrapper.setup_entry_point_cli"
+    ) as mocked_setup:
+        mocked_run_isolated.side_effect = lambda *args, **kwargs: [{"manifest_digest": "d"}]
+        signatures = list(msw._fetch_signatures(["digest-1", "digest-2"]))
+
+    assert signatures == [{"manifest_digest": "d"}, {"manifest_digest": "d"}]
+    mocked_setup.assert_not_called()
+    assert mocked_run_isolated.call_count == 2
+    for call in mocked_run_isolated.call_args_list:
+        assert call.args[3] == {"REQUESTS_CA_BUNDLE": "test"}
+        assert call.kwargs == {"max_workers": 2}
+
+
+def test_signer_wrapper_records_latency():
+    sw = SignerWrapper(config_file="", settings=SignerWrapperSettings(max_chunk_size=10))
+    assert sw.max_chunk_size == 10
+    entry = SignEntry(
+        repo="containers/podman",
+        reference="quay.io/containers/podman:latest",
+        identity="quay.io/containers/podman:latest",
+        digest="sha256:123456",
+        arch="amd64",
+        signing_key="signing_key",
+    )
+    with mock.patch("importlib.metadata.entry_points") as mock_load_entry_point, mock.patch(
+        "signtractions.resources.signing_wrapper.SignerWrapper._run_store_signed"
+    ), mock.patch("time.monotonic", side_effect=[0, 4, 10, 13]):
+        ep = mock.Mock(return_value={"signer_result": {"status": "ok"}})
+        mock_load_entry_point.return_value = [mock.Mock(load=mock.Mock(return_value=ep))]
+        sw._sign_entries([entry, entry])
+        sw._store_signed({"operation": {"references": ["ref1", "ref2", "ref3"]}})
+
+    assert sw.sign_latency.per_entry == 2
+    assert sw.store_latency.per_entry == 1
+
+
+def test_msg_signer_wrapper_sign_entries_multiple_keys():
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test",
+            pyxis_direct=True,
+        ),
+    )
+
+    def make_entry(tag, signing_key):
+        return SignEntry(
+            repo="namespace/repo",
+            reference=f"quay.io/namespace/repo:{tag}",
+            identity=f"quay.io/namespace/repo:{tag}",
+            digest=f"sha256:{tag}",
+            arch="amd64",
+            signing_key=signing_key,
+        )
+
+    def sign(config_file, signing_key, reference, digest, **kwargs):
+        return {
+            "signer_result": {"status": "ok"},
+            "operation": {
+                "references": reference,
+                "digests": digest,
+                "signing_key": signing_key,
+            },
+            "operation_results": [
+                [{"msg": {"manifest_digest": d, "repo": "namespace/repo", "signed_claim": "c"}}]
+                for d in digest
+            ],
+            "signing_key": signing_key,
+        }
+
+    entries = [make_entry("1", "prod"), make_entry("2", "beta"), make_entry("3", "prod")]
+    with mock.patch("importlib.metadata.entry_points") as mock_load_entry_point, mock.patch(
+        "signtractions.resources.pyxis_client.PyxisSignatureClient.upload_signatures"
+    ) as mock_upload:
+        ep = mock.Mock(side_effect=sign)
+        mock_load_entry_point.return_value = [mock.Mock(load=mock.Mock(return_value=ep))]
+        signed = msw._sign_entries(entries)
+        msw._store_signed(signed)
+
+    assert sorted((c.kwargs["signing_key"], c.kwargs["digest"]) for c in ep.call_args_list) == [
+        ("beta", ["sha256:2"]),
+        ("prod", ["sha256:1", "sha256:3"]),
+    ]
+    assert signed["operation"]["references"] == [
+        "quay.io/namespace/repo:1",
+        "quay.io/namespace/repo:3",
+        "quay.io/namespace/repo:2",
+    ]
+    assert signed["signing_keys"] == ["prod", "prod", "beta"]
+    # no single key signed all references
+    assert signed["signing_key"] is None
+    assert "signing_key" not in signed["operation"]
+    uploaded = mock_upload.call_args.args[0]
+    assert [(sig["manifest_digest"], sig["sig_key_id"]) for sig in uploaded] == [
+        ("sha256:1", "prod"),
+        ("sha256:3", "prod"),
+        ("sha256:2", "beta"),
+    ]
+
+
+def test_signer_wrapper_sign_entries_multiple_keys_error():
+    sw = SignerWrapper(config_file="", settings=SignerWrapperSettings())
+    entries = [
+        SignEntry(
+            repo="namespace/repo",
+            reference="quay.io/namespace/repo:1",
+            identity="quay.io/namespace/repo:1",
+            digest="sha256:1",
+            arch="amd64",
+            signing_key=signing_key,
+        )
+        for signing_key in ["prod", "beta"]
+    ]
+
+    def sign(signing_key, **kwargs):
+        if signing_key == "beta":
+            return {"signer_result": {"status": "error", "error_message": "beta failed"}}
+        return {"signer_result": {"status": "ok"}, "signing_key": signing_key}
+
+    with mock.patch("importlib.metadata.entry_points") as mock_load_entry_point:
+        ep = mock.Mock(side_effect=sign)
+        mock_load_entry_point.return_value = [mock.Mock(load=mock.Mock(return_value=ep))]
+        with pytest.raises(SigningError, match="beta failed"):
+            sw._sign_entries(entries)
@@ -0,0 +1,142 @@
+import json
+import threading
+from unittest import mock
+
+import pytest
+import requests
+import requests_mock
+
+from signtractions.resources.gpg import DecryptedFiles
+from signtractions.resources.sigstore import Sigstore, VerificationError
+
+URL = "https://sigstore.com/ns/repo@sha256=abc/signature-"
+
+
+def signature(reference):
+    return json.dumps(
+        {
+            "critical": {
+                "image": {"docker-manifest-digest": "sha256:abc"},
+                "type": "atomic container signature",
+                "identity": {"docker-reference": reference},
+            },
+            "optional": {},
+        }
+    ).encode("utf-8")
+
+
+def fake_gpg(cmd, **kwargs):
+    """Popen replacement which 'decrypts' content by returning it."""
+    process = mock.Mock(returncode=None)
+
+    def communicate(content):
+        process.returncode = 1 if content == b"broken" else 0
+        return content, b""
+
+    process.communicate.side_effect = communicate
+    return process
+
+
+def test_get_signatures():
+    sigstore = Sigstore(base_url="https://sigstore.com/")
+    with requests_mock.Mocker() as m, mock.patch("subprocess.Popen", side_effect=fake_gpg):
+        m.get(URL + "1", content=signature("registry.io/ns/repo:1"))
+        m.get(URL + "2", content=signature("registry.io/ns/repo:2"))
+        m.get(URL + "3", status_code=404)
+        signatures = sigstore.get_signatures("ns/repo", "sha256:abc")
+
+    assert [s.critical.identity.docker_reference for s in signatures] == [
+        "registry.io/ns/repo:1",
+        "registry.io/ns/repo:2",
+    ]
+    assert m.call_count == 3
+    # connections are reused by all calls
+    assert sigstore.session is sigstore.session
+
+
+def test_get_signatures_decrypts_while_fetching():
+    sigstore = Sigstore(base_url="https://sigstore.com/")
+    decrypting = threading.Event()
+
+    def decrypt(content):
+        decrypting.set()
+        return content
+
+    def second(request, context):
+        # decryption of the first signature has started before the second is fetched
+        assert decrypting.wait(5)
+        context.status_code = 404
+        return b""
+
+    with (
+        requests_mock.Mocker() as m,
+        mock.patch("signtractions.resources.sigstore.decrypt", side_effect=decrypt),
+    ):
+        m.get(URL + "1", content=signature("registry.io/ns/repo:1"))
+        m.get(URL + "2", content=second)
+        signatures = sigstore.get_signatures("ns/repo", "sha256:abc")
+    assert [s.critical.identity.docker_reference for s in signatures] == ["registry.io/ns/repo:1"]
+
+
+def test_get_signatures_decrypt_error():
+    sigstore = Sigstore(base_url="https://sigstore.com/")
+    with requests_mock.Mocker() as m, mock.patch("subprocess.Popen", side_effect=fake_gpg):
+        m.get(URL + "1", content=b"broken")
+        m.get(URL + "2", status_code=404)
+        with pytest.raises(VerificationError):
+            sigstore.get_signatures("ns/repo", "sha256:abc")
+
+
+def test_get_signatures_fetch_error():
+    sigstore = Sigstore(base_url="https://sigstore.com/")
+    with requests_mock.Mocker() as m, mock.patch("subprocess.Popen", side_effect=fake_gpg):
+        m.get(URL + "1", content=signature("registry.io/ns/repo:1"))
+        m.get(URL + "2", status_code=500)
+        with pytest.raises(requests.HTTPError, match="500"):
+            sigstore.get_signatures("ns/repo", "sha256:abc")
+
+
+def test_get_signatures_batched():
+    sigstore = Sigstore(base_url="https://sigstore.com/", gpg_batch_size=10, pool_size=1)
+
+    def decrypt_files(contents):
+        return DecryptedFiles(0, list(contents), b"")
+
+    with (
+        requests_mock.Mocker() as m,
+        mock.patch("signtractions.resources.gpg.decrypt_files", side_effect=decrypt_files) as df,
+    ):
+        m.get(URL + "1", content=signature("registry.io/ns/repo:1"))
+        m.get(URL + "2", content=signature("registry.io/ns/repo:2"))
+        m.get(URL + "3", status_code=404)
+        signatures = sigstore.get_signatures("ns/repo", "sha256:abc")
+
+    assert [s.critical.identity.docker_reference for s in signatures] == [
+        "registry.io/ns/repo:1",
+        "registry.io/ns/repo:2",
+    ]
+    assert df.call_count <= 2
+
+
+def test_close():
+    sigstore = Sigstore(base_url="https://sigstore.com/", gpg_batch_size=10)
+
+    def decrypt_files(contents):
+        return DecryptedFiles(0, list(contents), b"")
+
+    with (
+        requests_mock.Mocker() as m,
+        mock.patch("signtractions.resources.gpg.decrypt_files", side_effect=decrypt_files),
+    ):
+        m.get(URL + "1", content=signature("registry.io/ns/repo:1"))
+        m.get(URL + "2", status_code=404)
+        sigstore.get_signatures("ns/repo", "sha256:abc")
+        decryptor = sigstore.decryptor
+        threads = list(decryptor._threads)
+        sigstore.close()
+        assert not any(thread.is_alive() for thread in threads)
+
+        # closed sigstore starts again when used
+        assert len(sigstore.get_signatures("ns/repo", "sha256:abc")) == 1
+        assert sigstore.decryptor is not decryptor
+        sigstore.close()
@@ -0,0 +1,75 @@
+import sqlite3
+
+from signtractions.resources.tag_snapshot import TagSnapshotIndex
+
+
+def test_tag_snapshot_changed_tags(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    records = [("t1", "sha256:1", "ts1"), ("t2", "sha256:2", "ts2")]
+    with TagSnapshotIndex(path) as index:
+        assert index.changed_tags("quay.io/ns/repo", records) == records
+        index.stage("quay.io/ns/repo", records)
+        # staged tags are not part of the snapshot until committed
+        assert index.changed_tags("quay.io/ns/repo", records) == records
+        index.commit(["quay.io/ns/repo"])
+
+    with TagSnapshotIndex(path) as index:
+        assert index.changed_tags("quay.io/ns/repo", records) == []
+        assert index.changed_tags(
+            "quay.io/ns/repo",
+            [("t1", "sha256:1", "ts1"), ("t2", "sha256:3", "ts3"), ("t3", "sha256:1", "ts1")],
+        ) == [("t2", "sha256:3", "ts3"), ("t3", "sha256:1", "ts1")]
+        assert index.changed_tags("quay.io/ns/other", records) == records
+
+
+def test_tag_snapshot_commit_replaces_repository(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    with TagSnapshotIndex(path) as index:
+        index.stage("quay.io/ns/repo", [("t1", "sha256:1", ""), ("t2", "sha256:2", "")])
+        index.stage("quay.io/ns/other", [("t1", "sha256:1", "")])
+        index.commit(["quay.io/ns/repo"])
+        index.stage("quay.io/ns/repo", [("t2", "sha256:2", "")])
+        index.commit(["quay.io/ns/repo"])
+
+        # removed tag isn't in the snapshot anymore, uncommitted repository is untouched
+        assert index.changed_tags(
+            "quay.io/ns/repo", [("t1", "sha256:1", ""), ("t2", "sha256:2", "")]
+        ) == [("t1", "sha256:1", "")]
+        assert index.changed_tags("quay.io/ns/other", [("t1", "sha256:1", "")]) == [
+            ("t1", "sha256:1", "")
+        ]
+
+
+def test_tag_snapshot_fingerprint(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    records = [("t1", "sha256:1", "")]
+    key_a = TagSnapshotIndex.fingerprint(["key-a"], ["registry.io", "other.io"])
+    key_b = TagSnapshotIndex.fingerprint(["key-a", "key-b"], ["registry.io", "other.io"])
+    assert key_a == TagSnapshotIndex.fingerprint(["key-a"], ["other.io", "registry.io"])
+    assert key_a != TagSnapshotIndex.fingerprint(["key-a"], ["registry.io"])
+
+    with TagSnapshotIndex(path) as index:
+        index.stage("quay.io/ns/repo", records, key_a)
+        index.commit(["quay.io/ns/repo"])
+        assert index.changed_tags("quay.io/ns/repo", records, key_a) == []
+        # tags weren't processed with the extra key yet
+        assert index.changed_tags("quay.io/ns/repo", records, key_b) == records
+        index.stage("quay.io/ns/repo", records, key_b)
+        index.commit(["quay.io/ns/repo"])
+        assert index.changed_tags("quay.io/ns/repo", records, key_a) == []
+        assert index.changed_tags("quay.io/ns/repo", records, key_b) == []
+
+
+def test_tag_snapshot_without_fingerprints_discarded(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE tags (repo TEXT, tag TEXT, manifest_digest TEXT, last_modified TEXT)"
+    )
+    conn.execute("INSERT INTO tags VALUES ('quay.io/ns/repo', 't1', 'sha256:1', '')")
+    conn.commit()
+    conn.close()
+
+    with TagSnapshotIndex(path) as index:
+        records = [("t1", "sha256:1", "")]
+        assert index.changed_tags("quay.io/ns/repo", records) == records
@@ -1,16 +1,23 @@
+import hashlib
 import json
+import re
+import threading
 from typing import Optional
+from unittest import mock
 
+import httpx
 import pytest
 
 from pytractions.base import Port, TList, TDict
 from pytractions.executor import LoopExecutor
 
+from signtractions.resources.async_quay_client import AsyncQuayClient
 from signtractions.resources.fake_quay_client import (
     FakeQuayClient,
     ManifestNotFoundError,
 )
 from signtractions.models.quay import QuayRepo, QuayTag
+from signtractions.resources.quay_client import QuayClient
 
 from signtractions.tractions.containers import (
     ParseCotainerImageReference,
@@ -20,7 +27,9 @@ from signtractions.tractions.containers import (
     GetQuayRepositories,
     GetQuayTags,
     GetContainerImageTags,
+    BulkPopulateContainerDigest,
 )
+from signtractions.resources.tag_snapshot import TagSnapshotIndex
 
 
 def test_parse_container_image_reference_tag():
@@ -147,6 +156,44 @@ def test_populate_container_digest_manifest(fix_manifest_v2s2):
     )
 
 
+def test_populate_container_digest_manifest_resolve_head(fix_manifest_v2s2):
+    fqc = FakeQuayClient(
+        username="test",
+        password="test",
+        host="test",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    fqc.populate_manifest(
+        "quay.io/containers/podman:latest",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        {},
+        json.dumps(fix_manifest_v2s2),
+    )
+
+    t = PopulateContainerDigest(
+        uid="test",
+        i_container_parts=Port[ContainerParts](
+            data=ContainerParts(
+                registry="quay.io",
+                image="containers/podman",
+                tag="latest",
+                digests=TList[str]([]),
+                arches=TList[str]([]),
+            )
+        ),
+        r_quay_client=fqc,
+        a_resolve_digest_head=True,
+    )
+    t.run()
+    assert t.o_container_parts.tag == "latest"
+    assert t.o_container_parts.digests == TList[str](
+        ["sha256:6ef06d8c90c863ba4eb4297f1073ba8cb28c1f6570e2206cdaad2084e2a4715d"]
+    )
+    assert t.o_container_parts.arches == TList[str]([""])
+
+
 def test_populate_container_digest_manifest_list(fix_manifest_list):
     fqc = FakeQuayClient(
         username="test",
@@ -301,6 +348,37 @@ def test_get_quay_tags(fix_manifest_list):
     assert t.o_tags == TList[QuayTag]([tag])
 
 
+def test_get_quay_tags_window():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def request_quay_oauth(method, endpoint, kwargs={}, token=None):
+        page = int(re.search(r"page=(\d+)", endpoint).group(1))
+        if page < 2:
+            # first two pages are only answered when both are requested at once
+            barrier.wait()
+        tags = []
+        if page < 3:
+            tags = [
+                {
+                    "name": f"t{page}",
+                    "reversion": False,
+                    "start_ts": 0,
+                    "manifest_digest": f"sha256:{page}",
+                    "is_manifest_list": False,
+                    "size": None,
+                    "last_modified": "",
+                }
+            ]
+        return mock.Mock(json=mock.Mock(return_value={"tags": tags}))
+
+    client = QuayClient(username="user", password="pass", host="quay.io", tag_page_window=2)
+    with mock.patch.object(QuayClient, "_request_quay_oauth", side_effect=request_quay_oauth):
+        t = GetQuayTags(uid="test", i_repository="ns/repo", r_quay_client=client)
+        t.run()
+
+    assert [tag.name for tag in t.o_tags] == ["t0", "t1", "t2"]
+
+
 def test_get_container_image_tags(fix_manifest_list):
     fqc = FakeQuayClient(
         username="test",
@@ -333,3 +411,282 @@ def test_get_container_image_tags(fix_manifest_list):
         ["registry.com/test_namespace/test_repository:t1"]
     )
     assert t.o_container_identities == TList[str](["identity-registry.com/test_repository:t1"])
+
+
+def test_get_container_image_tags_signature_tags():
+    fqc = FakeQuayClient(
+        username="test",
+        password="test",
+        host="test",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    tags = [
+        QuayTag(
+            name=name,
+            reversion=False,
+            start_ts=0,
+            manifest_digest="sha256:123456",
+            is_manifest_list=False,
+            size=None,
+            last_modified="",
+            end_ts=0,
+            expiration=None,
+        )
+        for name in ("t1", "sha256-123456.sig", "sha256-123456.att")
+    ]
+    fqc.populate_tags("test_namespace", "test_repository", TList[QuayTag](tags))
+    t = GetContainerImageTags(
+        uid="test",
+        i_container_image_repo="registry.com/test_namespace/test_repository",
+        i_container_image_repo_identities=TList[str](["identity-registry.com"]),
+        r_quay_client=fqc,
+    )
+    t.run()
+    assert t.o_container_references == TList[str](
+        ["registry.com/test_namespace/test_repository:t1"]
+    )
+    assert t.o_signature_tags == TList[str](
+        ["registry.com/test_namespace/test_repository:sha256-123456.sig"]
+    )
+
+
+def test_get_container_image_tags_incremental(tmp_path):
+    fqc = FakeQuayClient(
+        username="test",
+        password="test",
+        host="test",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+
+    def make_tag(name, digest):
+        return QuayTag(
+            name=name,
+            reversion=False,
+            start_ts=0,
+            manifest_digest=digest,
+            is_manifest_list=False,
+            size=None,
+            last_modified="",
+            end_ts=0,
+            expiration=None,
+        )
+
+    def run():
+        t = GetContainerImageTags(
+            uid="test",
+            i_container_image_repo="registry.com/test_namespace/test_repository",
+            i_container_image_repo_identities=TList[str](["identity-registry.com"]),
+            r_quay_client=fqc,
+            a_tag_snapshot_file=str(tmp_path / "snapshot.db"),
+        )
+        t.run()
+        return t.o_container_references
+
+    fqc.populate_tags(
+        "test_namespace",
+        "test_repository",
+        TList[QuayTag]([make_tag("t1", "sha256:1"), make_tag("t2", "sha256:2")]),
+    )
+    assert run() == TList[str](
+        [
+            "registry.com/test_namespace/test_repository:t1",
+            "registry.com/test_namespace/test_repository:t2",
+        ]
+    )
+    with TagSnapshotIndex(str(tmp_path / "snapshot.db")) as index:
+        index.commit(["registry.com/test_namespace/test_repository"])
+
+    fqc.fake_tags["test_namespace"]["test_repository"] = TList[QuayTag](
+        [make_tag("t1", "sha256:1"), make_tag("t2", "sha256:3"), make_tag("t3", "sha256:1")]
+    )
+    assert run() == TList[str](
+        [
+            "registry.com/test_namespace/test_repository:t2",
+            "registry.com/test_namespace/test_repository:t3",
+        ]
+    )
+
+
+def test_bulk_populate_container_digest(fix_manifest_v2s2, fix_manifest_list):
+    fqc = FakeQuayClient(
+        username="test",
+        password="test",
+        host="test",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    fqc.populate_manifest(
+        "quay.io/containers/podman:latest",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        {},
+        json.dumps(fix_manifest_v2s2),
+    )
+    fqc.populate_manifest(
+        "quay.io/containers/podman:multiarch",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        {},
+        json.dumps(fix_manifest_list),
+    )
+
+    def make_parts(tag):
+        return ContainerParts(
+            registry="quay.io",
+            image="containers/podman",
+            tag=tag,
+            digests=TList[str]([]),
+            arches=TList[str]([]),
+        )
+
+    t = BulkPopulateContainerDigest(
+        uid="test",
+        i_container_parts=TList[ContainerParts](
+            [make_parts("latest"), make_parts("multiarch"), make_parts("latest")]
+        ),
+        r_quay_client=fqc,
+        a_max_workers=2,
+    )
+    with mock.patch.object(FakeQuayClient, "get_manifest", wraps=fqc.get_manifest) as get_manifest:
+        t.run()
+    # duplicate reference is fetched only once
+    assert get_manifest.call_count == 2
+    assert [parts.tag for parts in t.o_container_parts] == ["latest", "multiarch", "latest"]
+    assert t.o_container_parts[0].digests == TList[str](
+        ["sha256:6ef06d8c90c863ba4eb4297f1073ba8cb28c1f6570e2206cdaad2084e2a4715d"]
+    )
+    assert t.o_container_parts[1].arches == TList[str](
+        ["amd64", "arm64", "arm", "ppc64le", "s390x", "multiarch"]
+    )
+    assert t.o_container_parts[2].digests == t.o_container_parts[0].digests
+    # duplicate references get their own copy
+    assert t.o_container_parts[2] is not t.o_container_parts[0]
+    assert t.o_container_parts[2].digests is not t.o_container_parts[0].digests
+
+
+def test_bulk_populate_container_digest_by_digest(fix_manifest_v2s2, fix_manifest_list):
+    fqc = FakeQuayClient(
+        username="test",
+        password="test",
+        host="test",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    list_type = "application/vnd.docker.distribution.manifest.list.v2+json"
+    manifest_list = json.dumps(fix_manifest_list)
+    list_digest = "sha256:" + hashlib.sha256(manifest_list.encode("utf-8")).hexdigest()
+    # floating tags pointing to the same manifest list
+    for reference in ("1", "latest", list_digest):
+        separator = "@" if reference.startswith("sha256:") else ":"
+        fqc.populate_manifest(
+            f"quay.io/containers/podman{separator}{reference}", list_type, {}, manifest_list
+        )
+    fqc.populate_manifest(
+        "quay.io/containers/podman:single",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        {},
+        json.dumps(fix_manifest_v2s2),
+    )
+
+    def make_parts(tag):
+        return ContainerParts(
+            registry="quay.io",
+            image="containers/podman",
+            tag=tag,
+            digests=TList[str]([]),
+            arches=TList[str]([]),
+        )
+
+    t = BulkPopulateContainerDigest(
+        uid="test",
+        i_container_parts=TList[ContainerParts](
+            [make_parts("1"), make_parts("single"), make_parts("latest")]
+        ),
+        r_quay_client=fqc,
+        a_resolve_digest_head=True,
+    )
+    with mock.patch.object(FakeQuayClient, "get_manifest", wraps=fqc.get_manifest) as get_manifest:
+        t.run()
+    # manifest list is fetched once for both tags, single arch manifest isn't fetched at all
+    assert [c.args[0] for c in get_manifest.call_args_list] == [
+        f"quay.io/containers/podman@{list_digest}"
+    ]
+    assert [parts.tag for parts in t.o_container_parts] == ["1", "single", "latest"]
+    assert t.o_container_parts[0].digests[-1] == list_digest
+    assert t.o_container_parts[0].arches == TList[str](
+        ["amd64", "arm64", "arm", "ppc64le", "s390x", "multiarch"]
+    )
+    assert t.o_container_parts[2].digests == t.o_container_parts[0].digests
+    assert t.o_container_parts[1].digests == TList[str](
+        ["sha256:6ef06d8c90c863ba4eb4297f1073ba8cb28c1f6570e2206cdaad2084e2a4715d"]
+    )
+
+
+def test_bulk_populate_container_digest_async_client(fix_manifest_v2s2, fix_manifest_list):
+    list_type = "application/vnd.docker.distribution.manifest.list.v2+json"
+    single_type = "application/vnd.docker.distribution.manifest.v2+json"
+    manifest_list = json.dumps(fix_manifest_list)
+    single = json.dumps(fix_manifest_v2s2)
+    list_digest = "sha256:" + hashlib.sha256(manifest_list.encode("utf-8")).hexdigest()
+    single_digest = "sha256:" + hashlib.sha256(single.encode("utf-8")).hexdigest()
+    manifests = {
+        "1": (list_type, manifest_list, list_digest),
+        "latest": (list_type, manifest_list, list_digest),
+        list_digest: (list_type, manifest_list, list_digest),
+        "single": (single_type, single, single_digest),
+    }
+
+    def handler(request):
+        content_type, manifest, digest = manifests[request.url.path.split("/")[-1]]
+        return httpx.Response(
+            200,
+            text=manifest if request.method == "GET" else "",
+            headers={"Content-Type": content_type, "Docker-Content-Digest": digest},
+        )
+
+    client = AsyncQuayClient(username="user", password="pass", host="quay.io")
+    mock.patch.object(
+        client,
+        "_make_client",
+        return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    ).start()
+
+    def make_parts(tag):
+        return ContainerParts(
+            registry="quay.io",
+            image="containers/podman",
+            tag=tag,
+            digests=TList[str]([]),
+            arches=TList[str]([]),
+        )
+
+    t = BulkPopulateContainerDigest(
+        uid="test",
+        i_container_parts=TList[ContainerParts](
+            [make_parts("1"), make_parts("single"), make_parts("latest")]
+        ),
+        r_quay_client=client,
+        a_resolve_digest_head=True,
+    )
+    try:
+        with mock.patch.object(
+            AsyncQuayClient, "get_manifests", wraps=client.get_manifests
+        ) as get_manifests:
+            t.run()
+    finally:
+        client.close()
+
+    # all references are resolved and fetched by the async client in one call each
+    assert [c.args[0] for c in get_manifests.call_args_list] == [
+        [f"quay.io/containers/podman@{list_digest}"]
+    ]
+    assert [parts.tag for parts in t.o_container_parts] == ["1", "single", "latest"]
+    assert t.o_container_parts[0].arches == TList[str](
+        ["amd64", "arm64", "arm", "ppc64le", "s390x", "multiarch"]
+    )
+    assert t.o_container_parts[2].digests == t.o_container_parts[0].digests
+    assert t.o_container_parts[1].digests == TList[str]([single_digest])
@@ -1,15 +1,24 @@
+import os
 import pytest
+import threading
+import time
 from typing import Union, Optional
+from unittest import mock
 
 from pytractions.base import Port, TList, TDict
 
-from signtractions.resources.signing_wrapper import CosignSignerSettings
+from signtractions.resources.signing_wrapper import (
+    CosignSignerSettings,
+    MsgSignerSettings,
+    MsgSignerWrapper,
+)
 from signtractions.resources.cosign import FakeCosignClient
 from signtractions.resources.fake_signing_wrapper import FakeCosignSignerWrapper, FakeEPRunArgs
 from signtractions.tractions.signing import (
     SignEntriesFromContainerParts,
     SignEntry,
     ContainerParts,
+    PipelinedSignSignEntries,
     SignSignEntries,
     VerifyEntries,
 )
@@ -221,3 +230,175 @@ def test_verify_signature(fake_cosign_wrapper):
         i_public_key_file="test_public_key_file",
     )
     t.run()
+
+
+def _sign_entry(n):
+    return SignEntry(
+        repo="containers/podman",
+        reference="quay.io/containers/podman:{0}".format(n),
+        identity="quay.io/containers/podman:{0}".format(n),
+        digest="sha256:{0}".format(n),
+        arch="amd64",
+        signing_key="signing_key",
+    )
+
+
+def test_pipelined_sign_sign_entries(fake_cosign_wrapper):
+    chunks = TList[TList[SignEntry]]([TList[SignEntry]([_sign_entry(n)]) for n in range(3)])
+    signed_second = threading.Event()
+    stored = []
+
+    def sign_entries(entries, task_id):
+        if entries[0].digest == "sha256:1":
+            signed_second.set()
+        return {"digest": entries[0].digest}
+
+    def store_signed(signed):
+        if signed["digest"] == "sha256:0":
+            # next chunk is signed while the first one is being stored
+            assert signed_second.wait(timeout=5)
+        stored.append(signed["digest"])
+
+    with mock.patch.object(
+        FakeCosignSignerWrapper, "_sign_entries", side_effect=sign_entries
+    ), mock.patch.object(FakeCosignSignerWrapper, "_store_signed", side_effect=store_signed):
+        t = PipelinedSignSignEntries(
+            uid="test",
+            r_signer_wrapper=fake_cosign_wrapper,
+            i_task_id=1,
+            i_sign_entries=chunks,
+            a_queue_size=1,
+        )
+        t.run()
+
+    assert stored == ["sha256:0", "sha256:1", "sha256:2"]
+    assert list(t.o_failed_chunks) == []
+
+
+def test_pipelined_sign_sign_entries_entrypoint_environment(monkeypatch):
+    monkeypatch.delenv("REQUESTS_CA_BUNDLE", raising=False)
+    msw = MsgSignerWrapper(
+        label="msg_signer",
+        config_file="",
+        settings=MsgSignerSettings(
+            pyxis_server="test",
+            pyxis_ssl_crt_file="test",
+            pyxis_ssl_key_file="test",
+            pyxis_ca_file="test-ca",
+        ),
+    )
+    chunks = TList[TList[SignEntry]]([TList[SignEntry]([_sign_entry(n)]) for n in range(4)])
+    stored = []
+    upload_environ = []
+
+    def entry_point(*args, **kwargs):
+        if kwargs:
+            digest = kwargs["digest"][0]
+            return {
+                "signing_key": kwargs["signing_key"],
+                "signer_result": {"status": "ok"},
+                "operation": {"references": kwargs["reference"]},
+                "operation_results": [
+                    ({"msg": {"manifest_digest": digest, "repo": "repo", "signed_claim": ""}}, {})
+                ],
+            }
+        if args[0][0] == "pubtools-pyxis-get-signatures":
+            assert os.environ["REQUESTS_CA_BUNDLE"] == "test-ca"
+            # give the store stage time to run its entrypoint meanwhile
+            time.sleep(0.05)
+            assert os.environ["REQUESTS_CA_BUNDLE"] == "test-ca"
+            return []
+        upload_environ.append(os.environ.get("REQUESTS_CA_BUNDLE"))
+        stored.append(args[0])
+
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        mock_entry_points.return_value = [mock.Mock(load=mock.Mock(return_value=entry_point))]
+        t = PipelinedSignSignEntries(
+            uid="test",
+            r_signer_wrapper=msw,
+            i_task_id=1,
+            i_sign_entries=chunks,
+            a_queue_size=1,
+        )
+        t.run()
+
+    assert len(stored) == 4
+    assert upload_environ == [None] * 4
+    assert "REQUESTS_CA_BUNDLE" not in os.environ
+    assert list(t.o_failed_chunks) == []
+
+
+def test_pipelined_sign_sign_entries_chunk_failure(fake_cosign_wrapper):
+    chunks = TList[TList[SignEntry]]([TList[SignEntry]([_sign_entry(n)]) for n in range(3)])
+    stored = []
+
+    def sign_entries(entries, task_id):
+        if entries[0].digest == "sha256:1":
+            raise SigningError("test error")
+        return {"digest": entries[0].digest}
+
+    with mock.patch.object(
+        FakeCosignSignerWrapper, "_sign_entries", side_effect=sign_entries
+    ), mock.patch.object(
+        FakeCosignSignerWrapper, "_store_signed", side_effect=lambda s: stored.append(s["digest"])
+    ):
+        t = PipelinedSignSignEntries(
+            uid="test",
+            r_signer_wrapper=fake_cosign_wrapper,
+            i_task_id=1,
+            i_sign_entries=chunks,
+        )
+        with pytest.raises(SigningError, match="1 of 3 chunks failed: test error"):
+            t.run()
+
+    assert stored == ["sha256:0", "sha256:2"]
+    assert list(t.o_failed_chunks) == [1]
+
+
+def test_pipelined_sign_sign_entries_adaptive_chunks(fake_cosign_wrapper):
+    chunks = TList[TList[SignEntry]](
+        [TList[SignEntry]([_sign_entry(n) for n in range(i, i + 3)]) for i in range(0, 9, 3)]
+    )
+    fake_cosign_wrapper.sign_latency.record(1, 1)
+    signed_chunks = []
+
+    with mock.patch.object(
+        FakeCosignSignerWrapper,
+        "_sign_entries",
+        side_effect=lambda entries, task_id: signed_chunks.append(len(entries)) or {},
+    ), mock.patch.object(FakeCosignSignerWrapper, "_store_signed"):
+        t = PipelinedSignSignEntries(
+            uid="test",
+            r_signer_wrapper=fake_cosign_wrapper,
+            i_task_id=1,
+            i_sign_entries=chunks,
+            a_target_chunk_duration=2.0,
+        )
+        t.run()
+
+    assert signed_chunks == [2, 2, 2, 2, 1]
+
+
+def test_pipelined_sign_sign_entries_initial_chunk_size(fake_cosign_wrapper):
+    chunks = TList[TList[SignEntry]](
+        [TList[SignEntry]([_sign_entry(n) for n in range(i, i + 3)]) for i in range(0, 9, 3)]
+    )
+    signed_chunks = []
+
+    with mock.patch.object(
+        FakeCosignSignerWrapper,
+        "_sign_entries",
+        side_effect=lambda entries, task_id: signed_chunks.append(len(entries)) or {},
+    ), mock.patch.object(FakeCosignSignerWrapper, "_store_signed"):
+        t = PipelinedSignSignEntries(
+            uid="test",
+            r_signer_wrapper=fake_cosign_wrapper,
+            i_task_id=1,
+            i_sign_entries=chunks,
+            a_target_chunk_duration=2.0,
+            a_initial_chunk_size=2,
+        )
+        t.run()
+
+    # no latency is measured, chunks grow from the initial size up to the largest input chunk
+    assert signed_chunks == [2, 3, 3, 1]
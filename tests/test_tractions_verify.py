@@ -0,0 +1,245 @@
+import os
+import subprocess
+import threading
+from unittest import mock
+
+from pytractions.base import TDict, TList
+
+from signtractions.models.quay import QuayRepo, QuayTag
+from signtractions.models.signing import LegacySignature, SignEntry
+from signtractions.resources.cosign import VerificationResult
+from signtractions.resources.fake_quay_client import FakeQuayClient
+from signtractions.resources.fake_sigstore import FakeSigstore
+from signtractions.tractions.verify import (
+    VerifyEntriesCosign,
+    VerifyEntriesLegacy,
+    VerifyEntryCosign,
+)
+
+
+def make_entry(tag, arch="amd64"):
+    return SignEntry(
+        repo="ns/repo",
+        reference=f"quay.io/ns/repo:{tag}",
+        identity=f"registry.io/ns/repo:{tag}",
+        digest=f"sha256:{tag}-{arch}",
+        arch=arch,
+        signing_key="key",
+    )
+
+
+def test_verify_entries_cosign_batched():
+    entries = [make_entry("1"), make_entry("1", "arm64"), make_entry("2"), make_entry("3")]
+
+    def run(cmd, **kwargs):
+        failed = "quay.io/ns/repo@sha256:2-amd64" in cmd
+        return subprocess.CompletedProcess(cmd, int(failed), stdout="", stderr="")
+
+    with mock.patch("subprocess.run", side_effect=run) as mock_run:
+        t = VerifyEntriesCosign(
+            uid="test",
+            i_sign_entries=TList[SignEntry](entries),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+            a_max_workers=1,
+        )
+        t.run()
+
+    assert [t.o_verified[entry] for entry in entries] == [True, True, False, True]
+    # one batch of unique digests, then bisection of the failed batch
+    assert [c.args[0][4:] for c in mock_run.call_args_list] == [
+        [
+            "quay.io/ns/repo@sha256:1-amd64",
+            "quay.io/ns/repo@sha256:1-arm64",
+            "quay.io/ns/repo@sha256:2-amd64",
+            "quay.io/ns/repo@sha256:3-amd64",
+        ],
+        ["quay.io/ns/repo@sha256:1-amd64", "quay.io/ns/repo@sha256:1-arm64"],
+        ["quay.io/ns/repo@sha256:2-amd64", "quay.io/ns/repo@sha256:3-amd64"],
+        ["quay.io/ns/repo@sha256:2-amd64"],
+        ["quay.io/ns/repo@sha256:3-amd64"],
+    ]
+
+
+def test_verify_entries_cosign_moved_tag():
+    entry = make_entry("1")
+
+    def run(cmd, **kwargs):
+        # tag was moved to an unsigned image since the entry was made
+        failed = "quay.io/ns/repo:1" in cmd
+        return subprocess.CompletedProcess(cmd, int(failed), stdout="", stderr="")
+
+    with mock.patch("subprocess.run", side_effect=run) as mock_run:
+        t = VerifyEntriesCosign(
+            uid="test",
+            i_sign_entries=TList[SignEntry]([entry]),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+            a_max_workers=1,
+        )
+        t.run()
+
+    assert t.o_verified[entry]
+    assert [c.args[0][4:] for c in mock_run.call_args_list] == [["quay.io/ns/repo@sha256:1-amd64"]]
+
+
+def test_verify_entries_cosign_concurrent_env():
+    entries = [make_entry(str(n)) for n in range(6)]
+    envs = []
+
+    def run(cmd, env=None, **kwargs):
+        envs.append(env["SIGSTORE_REKOR_PUBLIC_KEY"])
+        failed = "quay.io/ns/repo@sha256:4-amd64" in cmd
+        return subprocess.CompletedProcess(cmd, int(failed), stdout=" ".join(cmd[4:]), stderr="")
+
+    with mock.patch("subprocess.run", side_effect=run) as mock_run:
+        t = VerifyEntriesCosign(
+            uid="test",
+            i_sign_entries=TList[SignEntry](entries),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+            a_max_workers=3,
+        )
+        t.run()
+
+    assert [t.o_verified[entry] for entry in entries] == [True] * 4 + [False, True]
+    # batches are split between the workers
+    assert sorted(len(c.args[0]) - 4 for c in mock_run.call_args_list) == [1, 1, 2, 2, 2]
+    assert envs == ["rekor.pub"] * 5
+    assert "SIGSTORE_REKOR_PUBLIC_KEY" not in os.environ
+
+
+def test_verify_entry_cosign_env():
+    with mock.patch(
+        "subprocess.run",
+        return_value=subprocess.CompletedProcess([], 1, stdout="out", stderr="err"),
+    ) as mock_run, mock.patch.dict(os.environ, {"SIGSTORE_REKOR_PUBLIC_KEY": "orig"}):
+        t = VerifyEntryCosign(
+            uid="test",
+            i_sign_entry=make_entry("1"),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+        )
+        t.run()
+        assert os.environ["SIGSTORE_REKOR_PUBLIC_KEY"] == "orig"
+
+    assert not t.o_verified
+    assert mock_run.call_args.args[0] == [
+        "cosign",
+        "verify",
+        "--key",
+        "key.pub",
+        "quay.io/ns/repo@sha256:1-amd64",
+    ]
+    assert mock_run.call_args.kwargs["env"]["SIGSTORE_REKOR_PUBLIC_KEY"] == "rekor.pub"
+
+
+def test_verify_entries_cosign_native():
+    entries = [make_entry("1"), make_entry("1", "arm64"), make_entry("2")]
+
+    def native_verify(reference, digest):
+        if reference == "quay.io/ns/repo:2":
+            return None
+        return VerificationResult(digest == "sha256:1-amd64", "", "")
+
+    def run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    with (
+        mock.patch(
+            "signtractions.tractions.verify.NativeCosignVerifier.verify",
+            side_effect=native_verify,
+        ),
+        mock.patch("subprocess.run", side_effect=run) as mock_run,
+    ):
+        t = VerifyEntriesCosign(
+            uid="test",
+            i_sign_entries=TList[SignEntry](entries),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+            r_quay_client=FakeQuayClient(
+                username="user",
+                password="pass",
+                host="quay.io",
+                fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+                fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+                fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+            ),
+            a_max_workers=2,
+            a_native=True,
+        )
+        t.run()
+
+    assert [t.o_verified[entry] for entry in entries] == [True, False, True]
+    # only reference which couldn't be verified natively is verified by cosign
+    assert [c.args[0][4:] for c in mock_run.call_args_list] == [["quay.io/ns/repo@sha256:2-amd64"]]
+
+
+def test_verify_entries_cosign_prefilter():
+    entries = [make_entry("1"), make_entry("1", "arm64"), make_entry("2")]
+
+    def run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    with mock.patch("subprocess.run", side_effect=run) as mock_run:
+        t = VerifyEntriesCosign(
+            uid="test",
+            i_sign_entries=TList[SignEntry](entries),
+            i_public_key_file="key.pub",
+            i_rekor_public_key_file="rekor.pub",
+            i_signature_tags=TList[str](["quay.io/ns/repo:sha256-1-amd64.sig"]),
+            a_max_workers=1,
+            a_prefilter=True,
+        )
+        t.run()
+
+    assert [t.o_verified[entry] for entry in entries] == [True, False, False]
+    assert [c.args[0][4:] for c in mock_run.call_args_list] == [["quay.io/ns/repo@sha256:1-amd64"]]
+
+
+def test_verify_entries_legacy_concurrent():
+    entries = [make_entry(str(n)) for n in range(4)] + [make_entry("0", "arm64")]
+    signatures = TDict[str, TList[LegacySignature]]({})
+    for entry in entries[:2]:
+        signatures[entry.digest] = TList[LegacySignature](
+            [
+                LegacySignature.content_from_json(
+                    {
+                        "critical": {
+                            "image": {"docker-manifest-digest": entry.digest},
+                            "identity": {"docker-reference": entry.identity},
+                        },
+                    }
+                )
+            ]
+        )
+    sigstore = FakeSigstore(
+        signatures=TDict[str, TDict[str, TList[LegacySignature]]]({"ns/repo": signatures})
+    )
+    barrier = threading.Barrier(2, timeout=5)
+    get_signatures = sigstore.get_signatures
+
+    def concurrent_get_signatures(image, digest):
+        # two entries have to be verified at the same time to pass the barrier
+        barrier.wait()
+        return get_signatures(image, digest)
+
+    with mock.patch.object(
+        FakeSigstore, "get_signatures", side_effect=concurrent_get_signatures
+    ), mock.patch.object(FakeSigstore, "close") as close:
+        t = VerifyEntriesLegacy(
+            uid="test",
+            i_sign_entries=TList[SignEntry](entries),
+            r_sigstore=sigstore,
+            a_max_workers=2,
+        )
+        t.run()
+    # sigstore connections and decryption threads are released
+    close.assert_called_once_with()
+
+    assert {entry.digest: t.o_verified[entry] for entry in t.o_verified} == {
+        "sha256:0-amd64": True,
+        "sha256:1-amd64": True,
+        "sha256:2-amd64": False,
+        "sha256:3-amd64": False,
+    }
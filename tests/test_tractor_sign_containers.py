@@ -1,11 +1,17 @@
 import json
 from typing import Union, Optional
+from unittest import mock
 
 import pytest
 from pytractions.base import TList, TDict, Port
 from pytractions.executor import LoopExecutor
 
-from signtractions.tractors.t_sign_containers import SignContainers
+from signtractions.tractors.t_sign_containers import (
+    ChunkSignEntries,
+    GroupSignEntries,
+    SelectSignChunks,
+    SignContainers,
+)
 from signtractions.resources.signing_wrapper import CosignSignerSettings
 from signtractions.models.containers import ContainerParts
 from signtractions.models.signing import SignEntry
@@ -85,6 +91,8 @@ def test_sign_containers_tags(fix_manifest_v2s2, fake_cosign_wrapper, fake_quay_
         ),
     )
     t.run()
+    assert list(t.tractions["t_pipelined_sign_entries"].i_sign_entries) == []
+    assert len(fake_cosign_wrapper.fake_entry_point_runs) == 1
     assert len(t.tractions["t_parse_container_references"].o_container_parts) == 1
     assert t.tractions["t_parse_container_references"].o_container_parts[0] == ContainerParts(
         registry="quay.io",
@@ -121,6 +129,66 @@ def test_sign_containers_tags(fix_manifest_v2s2, fake_cosign_wrapper, fake_quay_
     )
 
 
+def test_sign_containers_pipelined(fix_manifest_v2s2, fake_cosign_wrapper, fake_quay_client):
+    fake_quay_client.populate_manifest(
+        "quay.io/namespace/image:1",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        False,
+        json.dumps(fix_manifest_v2s2),
+    )
+    fake_cosign_wrapper.fake_entry_point_requests.append(
+        FakeEPRunArgs(
+            args=TList[str]([]),
+            kwargs=TDict[str, Union[str, TList[Optional[str]]]].content_from_json(
+                {
+                    "config_file": "test",
+                    "digest": TList[Optional[str]](
+                        ["sha256:6ef06d8c90c863ba4eb4297f1073ba8cb28c1f6570e2206cdaad2084e2a4715d"]
+                    ),
+                    "identity": "quay.io/namespace/image:1",
+                    "reference": TList[Optional[str]](["quay.io/namespace/image:1"]),
+                    "signing_key": "signing_key",
+                },
+            ),
+        )
+    )
+    fake_cosign_wrapper.fake_entry_point_returns.append(
+        TDict[str, TDict[str, str]].content_from_json({"signer_result": {"status": "ok"}})
+    )
+
+    t = SignContainers(
+        uid="test",
+        r_signer_wrapper=fake_cosign_wrapper,
+        a_executor=Port[LoopExecutor](data=LoopExecutor(executor_type="loop_executor")),
+        r_dst_quay_client=fake_quay_client,
+        i_task_id=Port[int](data=1),
+        a_pipelined=Port[bool](data=True),
+        i_containers_to_sign=Port[TList[ContainerSignInput]](
+            data=TList[ContainerSignInput](
+                [
+                    ContainerSignInput(
+                        reference="quay.io/namespace/image:1",
+                        identity="quay.io/namespace/image:1",
+                        signing_key="signing_key",
+                    )
+                ]
+            )
+        ),
+    )
+    with mock.patch(
+        "signtractions.resources.signing_wrapper.shutdown_entry_point_process_pool"
+    ) as mocked_shutdown:
+        t.run()
+    mocked_shutdown.assert_called_once_with()
+    assert list(t.tractions["t_sign_entries"].i_sign_entries) == []
+    assert len(t.tractions["t_pipelined_sign_entries"].i_sign_entries) == 1
+    assert len(fake_cosign_wrapper.fake_entry_point_runs) == 1
+    assert (
+        fake_cosign_wrapper.fake_entry_point_runs[0]
+        == fake_cosign_wrapper.fake_entry_point_requests[0]
+    )
+
+
 def test_sign_containers_tags_ml(fix_manifest_list, fake_cosign_wrapper, fake_quay_client):
     fake_quay_client.populate_manifest(
         "quay.io/namespace/image:1",
@@ -458,3 +526,104 @@ def test_sign_containers_digests_ml(fix_manifest_list, fake_cosign_wrapper, fake
             ),
         ]
     )
+
+
+def test_group_sign_entries():
+    def make_entry(tag, digest, signing_key="key"):
+        return SignEntry(
+            repo="namespace/image",
+            reference=f"quay.io/namespace/image:{tag}",
+            identity=f"registry.io/namespace/image:{tag}",
+            digest=digest,
+            arch="amd64",
+            signing_key=signing_key,
+        )
+
+    t = GroupSignEntries(
+        uid="test",
+        i_sign_entries=TList[SignEntry](
+            [
+                make_entry("latest", "sha256:1"),
+                make_entry("2", "sha256:2"),
+                make_entry("1", "sha256:1"),
+                make_entry("latest", "sha256:1"),
+                make_entry("1", "sha256:1", signing_key="other-key"),
+            ]
+        ),
+    )
+    t.run()
+    assert t.o_sign_entries == TList[SignEntry](
+        [
+            make_entry("latest", "sha256:1"),
+            make_entry("1", "sha256:1"),
+            make_entry("2", "sha256:2"),
+            make_entry("1", "sha256:1", signing_key="other-key"),
+        ]
+    )
+
+
+def test_chunk_sign_entries_max_chunk_size(fake_cosign_wrapper):
+    entries = TList[SignEntry](
+        [
+            SignEntry(
+                repo="namespace/image",
+                reference=f"quay.io/namespace/image:{n}",
+                identity=f"registry.io/namespace/image:{n}",
+                digest=f"sha256:{n}",
+                arch="amd64",
+                signing_key="key",
+            )
+            for n in range(50)
+        ]
+    )
+    fake_cosign_wrapper.settings.max_chunk_size = 20
+
+    t = ChunkSignEntries(
+        uid="test",
+        r_signer_wrapper=fake_cosign_wrapper,
+        i_sign_entries=entries,
+        i_chunk_size=100,
+    )
+    t.run()
+    # fixed size is capped by signer settings
+    assert [len(chunk) for chunk in t.o_chunked_sign_entries] == [20, 20, 10]
+
+
+def test_chunk_sign_entries_without_signer_wrapper():
+    entries = TList[SignEntry](
+        [
+            SignEntry(
+                repo="namespace/image",
+                reference=f"quay.io/namespace/image:{n}",
+                identity=f"registry.io/namespace/image:{n}",
+                digest=f"sha256:{n}",
+                arch="amd64",
+                signing_key="key",
+            )
+            for n in range(5)
+        ]
+    )
+    t = ChunkSignEntries(
+        uid="test",
+        i_sign_entries=entries,
+        i_chunk_size=2,
+    )
+    t.run()
+    assert [len(chunk) for chunk in t.o_chunked_sign_entries] == [2, 2, 1]
+
+
+@pytest.mark.parametrize(
+    "pipelined,target_chunk_duration,expected",
+    [(False, 0.0, False), (True, 0.0, True), (False, 10.0, True)],
+)
+def test_select_sign_chunks(pipelined, target_chunk_duration, expected):
+    chunks = TList[TList[SignEntry]]([TList[SignEntry]([]), TList[SignEntry]([])])
+    t = SelectSignChunks(
+        uid="test",
+        i_chunked_sign_entries=chunks,
+        a_pipelined=pipelined,
+        a_target_chunk_duration=target_chunk_duration,
+    )
+    t.run()
+    assert len(t.o_pipelined_sign_entries) == (2 if expected else 0)
+    assert len(t.o_chunked_sign_entries) == (0 if expected else 2)
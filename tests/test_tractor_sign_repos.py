@@ -0,0 +1,105 @@
+import json
+import sqlite3
+from unittest import mock
+
+import pytest
+from pytractions.base import TList, TDict
+from pytractions.executor import LoopExecutor
+
+from signtractions.tractors.t_sign_repos import SignRepos
+from signtractions.resources.cosign import FakeCosignClient
+from signtractions.resources.exceptions import ManifestNotFoundError
+from signtractions.resources.fake_signing_wrapper import FakeCosignSignerWrapper
+from signtractions.resources.fake_quay_client import FakeQuayClient
+from signtractions.models.quay import QuayRepo, QuayTag
+
+
+@pytest.fixture
+def fake_quay_client():
+    fqc = FakeQuayClient(
+        username="user",
+        password="pass",
+        host="quay.io",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    fqc.populate_tags(
+        "namespace",
+        "image",
+        TList[QuayTag](
+            [
+                QuayTag(
+                    name="1",
+                    reversion=False,
+                    start_ts=0,
+                    manifest_digest="sha256:123456",
+                    is_manifest_list=False,
+                    size=None,
+                    last_modified="",
+                )
+            ]
+        ),
+    )
+    return fqc
+
+
+def run_sign_repos(signer_wrapper, quay_client, snapshot_file, signing_key="signing_key"):
+    t = SignRepos(
+        uid="test",
+        r_signer_wrapper=signer_wrapper,
+        r_dst_quay_client=quay_client,
+        r_cosign_client=FakeCosignClient(),
+        i_container_image_repos=TList[str](["quay.io/namespace/image"]),
+        i_container_image_repo_identities=TList[str](["registry.io"]),
+        i_signing_key=signing_key,
+        i_task_id=1,
+        a_tag_snapshot_file=snapshot_file,
+        a_executor_2=LoopExecutor(executor_type="loop_executor"),
+        a_sign_executor=LoopExecutor(executor_type="loop_executor"),
+    )
+    t.run()
+    return sqlite3.connect(snapshot_file).execute("SELECT repo, tag FROM tags").fetchall()
+
+
+def test_sign_repos_tag_snapshot(
+    tmp_path, fix_manifest_v2s2, fake_cosign_wrapper, fake_quay_client
+):
+    fake_quay_client.populate_manifest(
+        "quay.io/namespace/image:1",
+        "application/vnd.docker.distribution.manifest.v2+json",
+        False,
+        json.dumps(fix_manifest_v2s2),
+    )
+    with mock.patch.object(
+        FakeCosignSignerWrapper, "_filter_to_sign", side_effect=lambda entries: entries
+    ), mock.patch.object(
+        FakeCosignSignerWrapper, "_sign_entries", return_value={}
+    ) as sign_entries, mock.patch.object(
+        FakeCosignSignerWrapper, "_store_signed"
+    ):
+        snapshot_file = str(tmp_path / "snapshot.db")
+        assert run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file) == [
+            ("quay.io/namespace/image", "1")
+        ]
+        assert sign_entries.call_count == 1
+
+        # nothing changed since the last run
+        run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file)
+        assert sign_entries.call_count == 1
+
+        # unchanged tags are signed with a new key, snapshot of the first key is kept
+        run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file, "other_key")
+        assert sign_entries.call_count == 2
+        assert sign_entries.call_args.args[0][0].signing_key == "other_key"
+        run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file, "other_key")
+        run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file)
+        assert sign_entries.call_count == 2
+
+
+def test_sign_repos_tag_snapshot_failed(tmp_path, fake_cosign_wrapper, fake_quay_client):
+    snapshot_file = str(tmp_path / "s.db")
+    # manifest is missing, digests can't be populated
+    with pytest.raises(ManifestNotFoundError):
+        run_sign_repos(fake_cosign_wrapper, fake_quay_client, snapshot_file)
+    assert sqlite3.connect(snapshot_file).execute("SELECT repo, tag FROM tags").fetchall() == []
@@ -0,0 +1,139 @@
+import json
+import subprocess
+from unittest import mock
+
+import pytest
+from pytractions.base import TDict, TList
+from pytractions.executor import LoopExecutor
+
+from signtractions.models.quay import QuayRepo, QuayTag
+from signtractions.models.signing import LegacySignature
+from signtractions.resources.fake_gsheets import FakeGSheets
+from signtractions.resources.fake_quay_client import FakeQuayClient
+from signtractions.resources.fake_sigstore import FakeSigstore
+from signtractions.tractors.t_verifier import Verifier, VerifyRepos
+
+LIST_DIGEST = "sha256:0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef"
+AMD64_DIGEST = "sha256:2e8f38a0a8d2a450598430fa70c7f0b53aeec991e76c3e29c63add599b4ef7ee"
+
+
+@pytest.fixture
+def fake_quay_client(fix_manifest_list):
+    fqc = FakeQuayClient(
+        username="user",
+        password="pass",
+        host="quay.io",
+        fake_manifests=TDict[str, TDict[str, str]].content_from_json({}),
+        fake_repositories=TDict[str, TDict[str, QuayRepo]].content_from_json({}),
+        fake_tags=TDict[str, TDict[str, TList[QuayTag]]].content_from_json({}),
+    )
+    for tag in ["1", "2"]:
+        fqc.populate_manifest(
+            f"quay.io/namespace/image:{tag}",
+            "application/vnd.docker.distribution.manifest.list.v2+json",
+            False,
+            json.dumps(fix_manifest_list),
+        )
+    fqc.populate_tags(
+        "namespace",
+        "image",
+        TList[QuayTag](
+            [
+                QuayTag(
+                    name=tag,
+                    reversion=False,
+                    start_ts=0,
+                    manifest_digest=LIST_DIGEST,
+                    is_manifest_list=True,
+                    size=None,
+                    last_modified="",
+                )
+                for tag in ["1", "2"]
+            ]
+        ),
+    )
+    return fqc
+
+
+@pytest.fixture
+def fake_sigstore():
+    signature = LegacySignature.content_from_json(
+        {
+            "critical": {
+                "image": {"docker-manifest-digest": AMD64_DIGEST},
+                "identity": {"docker-reference": "registry.io/namespace/image:1"},
+            },
+        }
+    )
+    return FakeSigstore(
+        signatures=TDict[str, TDict[str, TList[LegacySignature]]](
+            {
+                "namespace/image": TDict[str, TList[LegacySignature]](
+                    {AMD64_DIGEST: TList[LegacySignature]([signature])}
+                )
+            }
+        )
+    )
+
+
+def cosign_run(cmd, **kwargs):
+    return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+
+def test_verifier(fake_quay_client, fake_sigstore):
+    t = Verifier(
+        uid="test",
+        r_dst_quay_client=fake_quay_client,
+        r_sigstore=fake_sigstore,
+        r_gsheets=FakeGSheets(),
+        i_container_image_references=TList[str](
+            ["quay.io/namespace/image:1", "quay.io/namespace/image:2"]
+        ),
+        i_container_image_identities=TList[str](
+            ["registry.io/namespace/image:1", "registry.io/namespace/image:2"]
+        ),
+        i_signing_keys=TList[str](["key", "key"]),
+        i_public_key_file="key.pub",
+        i_rekor_public_key_file="rekor.pub",
+        a_executor=LoopExecutor(executor_type="loop_executor"),
+    )
+    with mock.patch("subprocess.run", side_effect=cosign_run) as mock_run:
+        t.run()
+
+    assert mock_run.call_count == 1
+    cosign_verified = t.tractions["t_verify_entries_cosign"].o_verified
+    legacy_verified = t.tractions["t_verify_entries_legacy"].o_verified
+    # every arch of both tags is verified by cosign, legacy signatures exist only for amd64
+    assert len(cosign_verified) == 10
+    assert all(cosign_verified.values())
+    assert {e.identity: v for e, v in legacy_verified.items()} == {
+        "registry.io/namespace/image:1": True,
+        "registry.io/namespace/image:2": False,
+    }
+
+
+def test_verify_repos(fake_quay_client, fake_sigstore):
+    t = VerifyRepos(
+        uid="test",
+        r_dst_quay_client=fake_quay_client,
+        r_sigstore=fake_sigstore,
+        i_container_image_repos=TList[str](["quay.io/namespace/image"]),
+        i_container_image_repo_identities=TList[str](["registry.io/namespace"]),
+        i_signing_key="key",
+        i_public_key_file="key.pub",
+        i_rekor_public_key_file="rekor.pub",
+        a_executor=LoopExecutor(executor_type="loop_executor"),
+        a_cosign_max_workers=1,
+    )
+    with mock.patch("subprocess.run", side_effect=cosign_run) as mock_run:
+        t.run()
+
+    assert mock_run.call_count == 1
+    cosign_verified = t.tractions["t_verify_entries_cosign"].o_verified
+    legacy_verified = t.tractions["t_verify_entries_legacy"].o_verified
+    assert len(cosign_verified) == 10
+    assert all(cosign_verified.values())
+    assert {e.identity: v for e, v in legacy_verified.items()} == {
+        "registry.io/namespace/image:1": True,
+        "registry.io/namespace/image:2": False,
+    }
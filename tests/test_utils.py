@@ -1,10 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
 import json
+import importlib.metadata
 import logging
 from unittest import mock
 import pytest
 import requests_mock
 import requests
 import os
+import sys
+import threading
 
 from signtractions.resources import exceptions
 from signtractions.resources.utils import misc
@@ -93,3 +97,124 @@ def test_run_entrypoint_without_args(caplog):
             "environment variable: some-password",
         ]
         compare_logs(caplog, expected_logs)
+
+
+def test_entry_point_registry_cached():
+    registry = misc.EntryPointRegistry()
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        mocked_ep = mock.Mock(load=mock.Mock(return_value=len))
+        mock_entry_points.return_value = [mocked_ep]
+        assert registry.load("console_scripts", "some-ep") is len
+        assert registry.load("console_scripts", "some-ep") is len
+    mock_entry_points.assert_called_once_with(group="console_scripts", name="some-ep")
+    mocked_ep.load.assert_called_once_with()
+
+
+def test_entry_point_registry_load_file(tmp_path):
+    ep_file = tmp_path / "entry_points.txt"
+    ep_file.write_text("[modules]\nsome-ep = os.path:join\n\n[tractions]\nOther = os:getcwd\n")
+    registry = misc.EntryPointRegistry()
+    registry.load_file(str(ep_file))
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        assert registry.load("modules", "some-ep") is os.path.join
+        assert registry.load("tractions", "Other") is os.getcwd
+    mock_entry_points.assert_not_called()
+
+
+def test_entry_point_registry_load_file_warms_groups(tmp_path):
+    ep_file = tmp_path / "entry_points.txt"
+    ep_file.write_text("[modules]\nsome-ep = os.path:join\n")
+    registry = misc.EntryPointRegistry()
+    registry.load_file(str(ep_file))
+    ep_file.write_text("[modules]\nsome-ep = os:getcwd\n")
+    registry.load_file(str(ep_file))
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        registry.warm(["modules"])
+        assert registry.load("modules", "some-ep") is os.path.join
+    mock_entry_points.assert_not_called()
+
+
+def test_entry_point_registry_load_file_missing(tmp_path, caplog):
+    registry = misc.EntryPointRegistry()
+    registry.load_file(str(tmp_path / "missing.txt"))
+    assert "can't be read" in caplog.text
+
+
+def test_entry_point_registry_warm():
+    registry = misc.EntryPointRegistry()
+    with mock.patch("importlib.metadata.entry_points") as mock_entry_points:
+        mock_entry_points.return_value = [
+            importlib.metadata.EntryPoint(name="some-ep", value="os:getcwd", group="modules")
+        ]
+        registry.warm(["modules"])
+        mock_entry_points.reset_mock()
+        assert registry.is_registered("modules", "some-ep")
+        assert not registry.is_loaded("modules", "some-ep")
+        assert registry.load("modules", "some-ep") is os.getcwd
+        assert registry.is_loaded("modules", "some-ep")
+        # group is scanned only once
+        registry.warm(["modules"])
+    mock_entry_points.assert_not_called()
+
+
+def test_setup_entry_point_cli_none_environ(monkeypatch):
+    monkeypatch.delenv("SIGNTRACTIONS_TEST_VAR", raising=False)
+    misc.ENTRY_POINTS.register("modules", "env-ep", "os:getenv")
+    with misc.setup_entry_point_cli(
+        ("signtractions", "modules", "env-ep"),
+        "env-ep",
+        [],
+        {"SIGNTRACTIONS_TEST_VAR": None, "SIGNTRACTIONS_OTHER_VAR": "set"},
+    ):
+        # None values are left unset, same as for isolated entrypoints
+        assert "SIGNTRACTIONS_TEST_VAR" not in os.environ
+        assert os.environ["SIGNTRACTIONS_OTHER_VAR"] == "set"
+    assert "SIGNTRACTIONS_OTHER_VAR" not in os.environ
+
+
+def test_capture_stdout_per_thread():
+    started = threading.Barrier(2)
+
+    def worker(text):
+        with misc.capture_stdout() as out:
+            started.wait()
+            print(text)
+        return out.getvalue()
+
+    orig_stdout = sys.stdout
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(worker, ["one", "two"])) == ["one\n", "two\n"]
+    assert sys.stdout is orig_stdout
+
+
+def isolated_entrypoint(args=None):
+    print("not in parent stdout")
+    yield args
+    yield os.environ.get("SIGNTRACTIONS_TEST_VAR")
+
+
+def test_run_entrypoint_isolated():
+    misc.ENTRY_POINTS.register("modules", "isolated-ep", "tests.test_utils:isolated_entrypoint")
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(
+                    misc.run_entrypoint_isolated,
+                    ("signtractions", "modules", "isolated-ep"),
+                    "isolated-ep",
+                    ["--value", str(i)],
+                    {"SIGNTRACTIONS_TEST_VAR": str(i)},
+                    max_workers=2,
+                )
+                for i in range(4)
+            ]
+            results = [f.result() for f in futures]
+        no_args = misc.run_entrypoint_isolated(
+            ("signtractions", "modules", "isolated-ep"), "isolated-ep", [], {}
+        )
+    finally:
+        misc.shutdown_entry_point_process_pool()
+
+    assert results == [[["isolated-ep", "--value", str(i)], str(i)] for i in range(4)]
+    assert no_args == [None, None]
+    assert "SIGNTRACTIONS_TEST_VAR" not in os.environ